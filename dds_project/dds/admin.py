@@ -1,7 +1,27 @@
 from django.contrib import admin
+from django.db.models import Count
 
 from .forms import MoneyMovementForm
-from .models import Status, OperationType, Category, Subcategory, MoneyMovement
+from .models import (
+    Status, OperationType, Category, Subcategory, MoneyMovement, MovementAuditEntry, SavedReport, Job, SlowQuery,
+)
+from .reports import refresh_report
+
+
+class RelatedSelectListFilter(admin.RelatedFieldListFilter):
+    """
+    Фильтр по связанной модели с загрузкой вариантов одним запросом
+
+    __str__ категорий и подкатегорий включает родителя, поэтому стандартный
+    фильтр выполнял отдельный запрос на каждый вариант.
+    """
+
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        queryset = field.related_model._default_manager.select_related()
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return [(obj.pk, str(obj)) for obj in queryset]
 
 
 class SubcategoryInline(admin.TabularInline):
@@ -46,10 +66,15 @@ class OperationTypeAdmin(admin.ModelAdmin):
 
     inlines = [CategoryInline]  # Inline для управления категориями
 
+    def get_queryset(self, request):
+        """Количество категорий считается в том же запросе"""
+        return super().get_queryset(request).annotate(category_count=Count("category"))
+
     def category_count(self, obj):
-        return obj.category.count()
+        return obj.category_count
 
     category_count.short_description = "Количество категорий"
+    category_count.admin_order_field = "category_count"
 
 
 @admin.register(Category)
@@ -63,14 +88,17 @@ class CategoryAdmin(admin.ModelAdmin):
     inlines = [SubcategoryInline]  # Inline для управления подкатегориями
 
     def get_queryset(self, request):
-        """Оптимизация запроса с select_related"""
-        return super().get_queryset(request).select_related("operation_type")
+        """Оптимизация запроса с select_related, количество подкатегорий - в том же запросе"""
+        return super().get_queryset(request).select_related("operation_type").annotate(
+            subcategory_count=Count("subcategory"),
+        )
 
     def subcategory_count(self, obj):
         """Отображение количества подкатегорий для категории"""
-        return obj.subcategory.count()
+        return obj.subcategory_count
 
     subcategory_count.short_description = 'Количество подкатегорий'
+    subcategory_count.admin_order_field = 'subcategory_count'
 
 
 @admin.register(Subcategory)
@@ -79,7 +107,7 @@ class SubcategoryAdmin(admin.ModelAdmin):
     Админка для управления подкатегориями
     """
     list_display = ["name", "category", "operation_type", "description"]
-    list_filter = ["category__operation_type", "category"]
+    list_filter = ["category__operation_type", ("category", RelatedSelectListFilter)]
     search_fields = ['name']
 
     def get_queryset(self, request):
@@ -109,14 +137,14 @@ class MoneyMovementAdmin(admin.ModelAdmin):
         "comment_short"
     ]
     list_filter = [
-        "created_date",
+        "created_day",
         "status",
         "operation_type",
-        "category",
-        "subcategory"
+        ("category", RelatedSelectListFilter),
+        ("subcategory", RelatedSelectListFilter)
     ]
     search_fields = ["comment", "subcategory__name", "category__name"]
-    date_hierarchy = "created_date" # Иерархическая навигация по датам
+    date_hierarchy = "created_day" # Иерархическая навигация по датам (по индексируемой колонке дня)
     list_per_page = 20 # Пагинация
 
     def comment_short(self, obj):
@@ -126,15 +154,67 @@ class MoneyMovementAdmin(admin.ModelAdmin):
     comment_short.short_description = "Комментарий"
 
     def get_queryset(self, request):
-        """Оптимизация запроса с select_related"""
+        """Оптимизация запроса с select_related (включая родителей из __str__ категории и подкатегории)"""
         return super().get_queryset(request).select_related(
             "status",
             "operation_type",
-            "category",
-            "subcategory",
+            "category__operation_type",
+            "subcategory__category__operation_type",
         )
 
     def get_changelist_form(self, request, **kwargs):
         """ Переопределение метода для использования кастомной формы в changelist"""
         kwargs["form"] = MoneyMovementForm
         return super().get_changelist_form(request, **kwargs)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Админка для просмотра фоновых задач
+    """
+    list_display = ["id", "kind", "status", "progress", "message", "created_at", "finished_at"]
+    list_filter = ["status", "kind"]
+    readonly_fields = ["status", "progress", "message", "result", "error", "started_at", "finished_at"]
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    """
+    Админка для просмотра журнала медленных запросов
+    """
+    list_display = ["sql_short", "view", "count", "total_ms", "max_ms", "last_seen"]
+    search_fields = ["sql", "view"]
+    readonly_fields = [field.name for field in SlowQuery._meta.fields]
+
+    def sql_short(self, obj):
+        """Сокращенное отображение SQL в списке"""
+        return obj.sql[:120] + "..." if len(obj.sql) > 120 else obj.sql
+
+    sql_short.short_description = "SQL"
+
+
+@admin.register(SavedReport)
+class SavedReportAdmin(admin.ModelAdmin):
+    """
+    Админка для сохраненных отчетов (фильтры и группировка задаются через API)
+    """
+    list_display = ["name", "group_by", "refreshed_at"]
+    search_fields = ["name"]
+    readonly_fields = ["filters", "group_by", "created_at", "refreshed_at"]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            refresh_report(obj, full=True)
+
+
+@admin.register(MovementAuditEntry)
+class MovementAuditEntryAdmin(admin.ModelAdmin):
+    """
+    Админка для просмотра журнала изменений операций
+    """
+    list_display = ["movement_id", "action", "rows", "username", "source", "created_at"]
+    list_filter = ["action", "source"]
+    search_fields = ["=movement_id", "username"]
+    readonly_fields = [field.name for field in MovementAuditEntry._meta.fields]
@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class DdsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dds'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+
+        # Регистрация обработчиков сигналов
+        from . import signals  # noqa: F401
+
+        # Журнал медленных запросов: обертка подключается к каждому новому соединению
+        if settings.DDS_SLOW_QUERY_MS is not None:
+            from .slowlog import install_slow_query_wrapper
+            connection_created.connect(install_slow_query_wrapper, dispatch_uid='dds_slow_query_wrapper')
+
+        from .warmup import start_warm_up, warm_up_enabled
+        if warm_up_enabled():
+            start_warm_up()
@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+
+from .models import MoneyMovement, Subcategory
+
+# Нарушения иерархии: подкатегория не из категории операции, категория не из ее типа операции
+SUBCATEGORY_MISMATCH = ~Q(subcategory__category_id=F('category_id'))
+CATEGORY_MISMATCH = ~Q(category__operation_type_id=F('operation_type_id'))
+
+VIOLATION_FIELDS = [
+    'id', 'operation_type_id', 'category_id', 'subcategory_id',
+    'subcategory_category_id', 'category_operation_type_id', 'expected_operation_type_id',
+]
+AUDIT_CHUNK_SIZE = 5000
+
+
+def hierarchy_violations(queryset=None):
+    """
+    Операции с нарушенной иерархией справочников
+
+    Один запрос с соединением подкатегории и категорий вместо вызова
+    MoneyMovement.clean() для каждой строки.
+    """
+    if queryset is None:
+        queryset = MoneyMovement.objects.all()
+    return queryset.filter(SUBCATEGORY_MISMATCH | CATEGORY_MISMATCH).annotate(
+        subcategory_category_id=F('subcategory__category_id'),
+        category_operation_type_id=F('category__operation_type_id'),
+        expected_operation_type_id=F('subcategory__category__operation_type_id'),
+    ).order_by('id')
+
+
+def iter_violations(queryset=None):
+    """Потоковый обход нарушений в виде словарей с описанием проблем"""
+    rows = hierarchy_violations(queryset).values(*VIOLATION_FIELDS).iterator(chunk_size=AUDIT_CHUNK_SIZE)
+    for row in rows:
+        problems = []
+        if row['subcategory_category_id'] != row['category_id']:
+            problems.append('subcategory_not_in_category')
+        if row['category_operation_type_id'] != row['operation_type_id']:
+            problems.append('category_not_in_operation_type')
+        row['problems'] = problems
+        yield row
+
+
+def summarize_violations(queryset=None):
+    """Количество нарушений каждого вида одним агрегирующим запросом"""
+    if queryset is None:
+        queryset = MoneyMovement.objects.all()
+    return queryset.aggregate(
+        total=Count('id', filter=SUBCATEGORY_MISMATCH | CATEGORY_MISMATCH),
+        subcategory_not_in_category=Count('id', filter=SUBCATEGORY_MISMATCH),
+        category_not_in_operation_type=Count('id', filter=CATEGORY_MISMATCH),
+    )
+
+
+def fix_violations(queryset=None):
+    """
+    Исправление нарушений одним UPDATE; возвращает число исправленных операций
+
+    Подкатегория - самый точный уровень, поэтому категория и тип операции
+    берутся от нее. update() обновляет updated_at и change_seq - исправления
+    попадают в ленту изменений и кэш фрагментов; сигналы моделей не вызываются.
+    """
+    subcategory = Subcategory.objects.filter(pk=OuterRef('subcategory_id'))
+    with transaction.atomic():
+        ids = hierarchy_violations(queryset).order_by().values('id')
+        return MoneyMovement.objects.filter(pk__in=ids).update(
+            category_id=Subquery(subcategory.values('category_id')[:1]),
+            operation_type_id=Subquery(subcategory.values('category__operation_type_id')[:1]),
+        )
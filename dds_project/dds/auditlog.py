@@ -0,0 +1,205 @@
+import atexit
+import contextvars
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .models import MoneyMovement, MovementAuditEntry, TRACKED_FIELDS
+
+logger = logging.getLogger('dds.auditlog')
+
+# Кто выполняет изменения в текущем контексте: (запрос или None, источник)
+audit_context = contextvars.ContextVar('dds_audit_context', default=(None, 'system'))
+# bulk_update() сам записывает изменения каждой операции - update() внутри него не читает прежние значения
+object_changes_recorded = contextvars.ContextVar('dds_object_changes_recorded', default=False)
+
+
+def audit_enabled(using=DEFAULT_DB_ALIAS):
+    """
+    Журнал ведется для подключений из DATABASES: временные подключения
+    одного потока (снимки, данные нагрузочного теста) поток записи не видит
+    """
+    return settings.DDS_AUDIT_ENABLED and using in connections.settings
+
+
+def tracked_values(movement):
+    return {name: getattr(movement, name) for name in TRACKED_FIELDS}
+
+
+class AuditLogBuffer:
+    """
+    Ограниченный буфер журнала изменений с фоновой записью в БД
+
+    Запрос только кладет записи в очередь (после фиксации своей транзакции);
+    поток записи сохраняет их порциями до batch_size, собирая порцию не
+    дольше flush_interval секунд. Если буфер заполнен (БД не успевает),
+    запрос сохраняет накопленное сам - записи не теряются. Буфер свой в
+    каждом процессе и сохраняется при его завершении.
+    """
+
+    def __init__(self, max_size, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def put_many(self, entries):
+        for entry in entries:
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                self.flush()
+                self._write([entry])
+        if self.flush_interval is not None:
+            self._ensure_started()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Запись всех накопленных записей в текущем потоке"""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def clear(self):
+        self._drain(None)
+
+    def _drain(self, limit):
+        batch = []
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='dds-audit-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        # Одна запись за раз: поток записи и сброс из запроса не конкурируют за блокировку SQLite
+        with self._write_lock:
+            try:
+                if threading.current_thread() is self._thread:
+                    close_old_connections()
+                by_alias = {}
+                for using, entry in batch:
+                    by_alias.setdefault(using, []).append(MovementAuditEntry(**entry))
+                for using, entries in by_alias.items():
+                    MovementAuditEntry.objects.using(using).bulk_create(entries)
+            except Exception:
+                logger.exception("Не удалось сохранить %s записей журнала изменений", len(batch))
+
+
+audit_log = AuditLogBuffer(settings.DDS_AUDIT_BUFFER_SIZE, settings.DDS_AUDIT_BATCH_SIZE,
+                           settings.DDS_AUDIT_FLUSH_INTERVAL)
+
+
+def _record(items, using):
+    """Постановка записей (ID, действие, изменения) в буфер после фиксации транзакции в БД using"""
+    if not items:
+        return
+    request, source = audit_context.get()
+    user = getattr(request, 'user', None)
+    if user is not None and not user.is_authenticated:
+        user = None
+    now = timezone.now()
+    entries = [
+        (using, {
+            'movement_id': movement_id, 'action': action, 'changes': changes,
+            'user_id': user.pk if user else None, 'username': user.get_username() if user else '',
+            'source': source, 'created_at': now,
+        })
+        for movement_id, action, changes in items
+    ]
+    transaction.on_commit(lambda: audit_log.put_many(entries), using=using)
+
+
+def record_created(movements, using=DEFAULT_DB_ALIAS):
+    if audit_enabled(using):
+        _record([
+            (movement.pk, MovementAuditEntry.Action.CREATED,
+             {name: [None, value] for name, value in tracked_values(movement).items()})
+            for movement in movements
+        ], using)
+
+
+def record_deleted(movements, using=DEFAULT_DB_ALIAS):
+    if audit_enabled(using):
+        _record([
+            (movement.pk, MovementAuditEntry.Action.DELETED,
+             {name: [value, None] for name, value in tracked_values(movement).items()})
+            for movement in movements
+        ], using)
+
+
+def record_changes(before, after, using=DEFAULT_DB_ALIAS):
+    """Изменения по значениям до и после: {ID: {поле: значение}}; записи без изменений пропускаются"""
+    if not audit_enabled(using):
+        return
+    items = []
+    for pk, new in after.items():
+        old = before.get(pk) or {}
+        changes = {name: [old.get(name), value] for name, value in new.items() if old.get(name) != value}
+        if changes:
+            items.append((pk, MovementAuditEntry.Action.UPDATED, changes))
+    _record(items, using)
+
+
+def previous_values(queryset, values):
+    """
+    Прежние значения полей журнала, которые меняет массовый UPDATE: {ID: {поле: значение}}
+
+    Читаются только изменяемые поля строк выборки, до самого UPDATE. None -
+    журнал не ведется, поля не отслеживаются или изменения записывает bulk_update().
+    """
+    if not audit_enabled(queryset.db) or object_changes_recorded.get():
+        return None
+    names = {MoneyMovement._meta.get_field(name).attname for name in values}
+    fields = [name for name in TRACKED_FIELDS if name in names]
+    return queryset.tracked_values(fields) if fields else None
+
+
+def record_bulk_update(previous, using=DEFAULT_DB_ALIAS):
+    """
+    Записи по каждой строке массового UPDATE: прежние значения из previous_values(),
+    новые читаются после UPDATE порциями по DDS_AUDIT_BATCH_SIZE
+    """
+    if not previous:
+        return
+    fields = list(next(iter(previous.values())))
+    ids = list(previous)
+    for start in range(0, len(ids), settings.DDS_AUDIT_BATCH_SIZE):
+        chunk = ids[start:start + settings.DDS_AUDIT_BATCH_SIZE]
+        after = MoneyMovement.objects.using(using).filter(pk__in=chunk).tracked_values(fields)
+        record_changes(previous, after, using)
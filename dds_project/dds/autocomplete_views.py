@@ -7,8 +7,8 @@ class CategoryAutocomplete(autocomplete.Select2QuerySetView):
 
     def get_queryset(self):
         """Основной метод для фильтрации категорий"""
-        # Начинаем с полного queryset всех категорий
-        qs = Category.objects.all()
+        # Начинаем с полного queryset всех категорий (тип операции нужен для отображения)
+        qs = Category.objects.select_related('operation_type')
 
         # Получаем ID выбранного типа операции из forwarded параметров
         operation_type = self.forwarded.get('operation_type', None)
@@ -29,8 +29,8 @@ class CategoryAutocomplete(autocomplete.Select2QuerySetView):
 class SubcategoryAutocomplete(autocomplete.Select2QuerySetView):
     """Основной метод для фильтрации подкатегорий"""
     def get_queryset(self):
-        # Начинаем с полного queryset всех подкатегорий
-        qs = Subcategory.objects.all()
+        # Начинаем с полного queryset всех подкатегорий (категория и тип операции нужны для отображения)
+        qs = Subcategory.objects.select_related('category__operation_type')
 
         # Получаем ID выбранной категории из forwarded параметров
         category = self.forwarded.get('category', None)
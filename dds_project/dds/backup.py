@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+from django.utils import timezone
+
+SNAPSHOT_PREFIX = 'dds-'
+SNAPSHOT_SUFFIX = '.sqlite3'
+
+
+class BackupError(Exception):
+    """Резервную копию или снимок БД создать или открыть не удалось"""
+
+
+@dataclass
+class BackupResult:
+    """Итог резервного копирования"""
+    path: Path
+    pages: int
+    page_size: int
+    elapsed: float
+    restarts: int
+
+    @property
+    def size(self):
+        return self.pages * self.page_size
+
+    @property
+    def throughput(self):
+        """Байт в секунду"""
+        return self.size / self.elapsed if self.elapsed else 0.0
+
+
+def backup_database(target, using=DEFAULT_DB_ALIAS, pages=None, step_delay=None, max_restarts=None, progress=None):
+    """
+    Онлайн-копирование БД SQLite в файл target через backup API
+
+    Копируется по pages страниц за шаг; между шагами - пауза step_delay
+    секунд, чтобы запись приложения не ждала копирование. В режиме WAL все
+    шаги читают один снимок в открытой транзакции чтения - она не мешает
+    записи, и копия соответствует моменту начала. В остальных режимах
+    запись другим соединением перезапускает копирование с начала - после
+    max_restarts перезапусков оно прерывается. Копия пишется во
+    временный файл и переименовывается в target, когда готова целиком:
+    читатели не видят недописанный файл. progress(скопировано, всего,
+    перезапусков) вызывается после каждого шага.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        raise BackupError(f"Копирование предназначено для SQLite, а подключение использует {connection.vendor}")
+    pages = pages or settings.DDS_BACKUP_PAGES
+    step_delay = settings.DDS_BACKUP_STEP_DELAY if step_delay is None else step_delay
+    max_restarts = settings.DDS_BACKUP_MAX_RESTARTS if max_restarts is None else max_restarts
+
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(f'.{target.name}.partial')
+    state = {'remaining': None, 'restarts': 0}
+
+    def step(status, remaining, total):
+        # Шаг не уменьшил число оставшихся страниц - источник изменился, копирование началось заново
+        if state['remaining'] is not None and remaining >= state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise BackupError(
+                    f"Копирование перезапускалось {state['restarts']} раз из-за записи в БД; "
+                    f"включите режим WAL (профиль production), увеличьте число страниц за шаг или уменьшите паузу"
+                )
+        state['remaining'] = remaining
+        if progress is not None:
+            progress(total - remaining, total, state['restarts'])
+        if remaining and step_delay:
+            time.sleep(step_delay)
+
+    # Отдельное соединение: копирование не занимает соединение приложения и видит только
+    # зафиксированные данные, даже если вызвано внутри транзакции
+    source = connection.get_new_connection(connection.get_connection_params())
+    started = time.perf_counter()
+    try:
+        if source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master')
+        destination = sqlite3.connect(partial)
+        try:
+            source.backup(destination, pages=pages, progress=step)
+            # Копия - самостоятельный файл без журнала WAL рядом: ее можно открыть только для чтения
+            destination.execute('PRAGMA journal_mode=DELETE')
+            page_count = destination.execute('PRAGMA page_count').fetchone()[0]
+            page_size = destination.execute('PRAGMA page_size').fetchone()[0]
+        finally:
+            destination.close()
+        os.replace(partial, target)
+    except sqlite3.Error as e:
+        raise BackupError(f"Не удалось скопировать БД: {e}") from e
+    finally:
+        source.close()
+        partial.unlink(missing_ok=True)
+    return BackupResult(target, page_count, page_size, time.perf_counter() - started, state['restarts'])
+
+
+def list_snapshots(directory=None):
+    """Снимки БД, новые первыми"""
+    directory = Path(directory or settings.DDS_SNAPSHOT_DIR)
+    return sorted(directory.glob(f'{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}'), reverse=True)
+
+
+def create_snapshot(directory=None, keep=None, **options):
+    """Снимок БД на текущий момент в DDS_SNAPSHOT_DIR; старые снимки сверх keep удаляются"""
+    directory = Path(directory or settings.DDS_SNAPSHOT_DIR)
+    keep = settings.DDS_SNAPSHOT_KEEP if keep is None else keep
+    name = f"{SNAPSHOT_PREFIX}{timezone.now():%Y%m%d-%H%M%S-%f}{SNAPSHOT_SUFFIX}"
+    result = backup_database(directory / name, **options)
+    for stale in list_snapshots(directory)[keep:]:
+        stale.unlink(missing_ok=True)
+    return result
+
+
+def resolve_snapshot(name='latest'):
+    """Путь к снимку по имени файла в DDS_SNAPSHOT_DIR; latest - самый новый"""
+    if name == 'latest':
+        snapshots = list_snapshots()
+        if not snapshots:
+            raise BackupError("Снимков БД нет: создайте снимок командой backup_db --snapshot")
+        return snapshots[0]
+    path = Path(settings.DDS_SNAPSHOT_DIR) / Path(name).name
+    if not path.is_file():
+        raise BackupError(f"Снимок БД не найден: {name}")
+    return path
+
+
+@contextmanager
+def snapshot_database(name='latest'):
+    """
+    Временное подключение Django к снимку БД только для чтения; возвращает алиас
+
+    Снимок после создания не меняется, поэтому открывается как immutable -
+    без блокировок файла. Запросы читают данные на момент снимка и не
+    конкурируют с записью в основную БД.
+    """
+    path = resolve_snapshot(name)
+    alias = f'snapshot_{uuid.uuid4().hex}'
+    settings_dict = {
+        **connections.settings[DEFAULT_DB_ALIAS],
+        'NAME': f'{path.resolve().as_uri()}?mode=ro&immutable=1',
+        'OPTIONS': {},
+        'CONN_MAX_AGE': 0,
+    }
+    # Подключение регистрируется только в текущем потоке, общие настройки DATABASES не меняются
+    connection = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+    connections[alias] = connection
+    try:
+        yield alias
+    finally:
+        connection.close()
+        del connections[alias]
@@ -0,0 +1,132 @@
+import asyncio
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+
+logger = logging.getLogger('dds.batch')
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _error(status_code, detail):
+    return {'status': status_code, 'body': {'detail': detail}}
+
+
+def build_subrequest(request, method, path, body):
+    """
+    Подзапрос на основе исходного запроса пакета
+
+    Заголовки, cookie и пользователь берутся из исходного запроса, поэтому
+    аутентификация и права проверяются для подзапроса как обычно.
+    """
+    url = urlsplit(path)
+    payload = b'' if body is None else json.dumps(body).encode('utf-8')
+
+    subrequest = HttpRequest()
+    subrequest.method = method
+    subrequest.path = subrequest.path_info = url.path
+    subrequest.META = {
+        **request.META,
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'HTTP_ACCEPT': 'application/json',
+    }
+    subrequest.GET = QueryDict(url.query)
+    subrequest.COOKIES = request.COOKIES
+    subrequest._stream = io.BytesIO(payload)
+    subrequest._read_started = False
+    # Пакет уже прошел проверку CSRF: подзапрос наследует ее результат вместе с пользователем
+    for attr in ('user', 'session', 'csrf_processing_done', '_dont_enforce_csrf_checks'):
+        if hasattr(request, attr):
+            setattr(subrequest, attr, getattr(request, attr))
+    return subrequest
+
+
+def execute_subrequest(request, item):
+    """Выполнение одного подзапроса в процессе, без HTTP и цепочки middleware"""
+    from .views import BatchView
+
+    path = item['path']
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return _error(404, f"Не найден путь {path}")
+    view_class = getattr(match.func, 'view_class', getattr(match.func, 'cls', None))
+    if view_class is BatchView:
+        return _error(400, "Вложенные пакетные запросы не поддерживаются")
+    if asyncio.iscoroutinefunction(match.func):
+        return _error(400, "Потоковые представления не поддерживаются в пакете")
+
+    subrequest = build_subrequest(request, item['method'], path, item.get('body'))
+    try:
+        response = match.func(subrequest, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception("Ошибка подзапроса пакета %s %s", item['method'], path)
+        return _error(500, "Внутренняя ошибка сервера")
+    if response.streaming:
+        return _error(400, "Потоковые ответы не поддерживаются в пакете")
+
+    if isinstance(response, Response):
+        # Данные отдаются внешнему ответу как есть, без повторного разбора JSON
+        data = response.data
+    elif response.get('Content-Type', '').startswith('application/json'):
+        data = json.loads(response.content or b'null')
+    else:
+        data = response.content.decode(response.charset or 'utf-8')
+    return {'status': response.status_code, 'body': data}
+
+
+def _execute_read(request, item):
+    try:
+        return execute_subrequest(request, item)
+    finally:
+        # Поток пула держал бы свои соединения открытыми
+        connections.close_all()
+
+
+def execute_batch(request, items, parallel=False, atomic=True):
+    """
+    Выполнение пакета подзапросов; возвращает (ответы в порядке подзапросов, зафиксировано ли)
+
+    Пакет только из чтений при parallel выполняется в пуле потоков (выигрыш есть,
+    когда подзапросы ждут БД, а не процессор). Пакет с
+    изменениями выполняется по порядку; при atomic - в одной транзакции,
+    которая откатывается целиком, если хотя бы один подзапрос завершился ошибкой.
+    """
+    if all(item['method'] in READ_METHODS for item in items):
+        if parallel and len(items) > 1:
+            workers = min(settings.DDS_BATCH_WORKERS, len(items))
+            user = getattr(request, 'user', None)
+            if user is not None:
+                user.is_authenticated  # Пользователь из сессии загружается один раз, до запуска потоков
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                responses = list(executor.map(lambda item: _execute_read(request, item), items))
+        else:
+            responses = [execute_subrequest(request, item) for item in items]
+        return responses, True
+
+    if not atomic:
+        return [execute_subrequest(request, item) for item in items], True
+
+    responses = []
+    with transaction.atomic():
+        for item in items:
+            responses.append(execute_subrequest(request, item))
+            if responses[-1]['status'] >= 400:
+                transaction.set_rollback(True)
+                break
+    committed = responses[-1]['status'] < 400
+    for _ in range(len(responses), len(items)):
+        responses.append(_error(424, "Не выполнен: пакет отменен из-за ошибки предыдущего подзапроса"))
+    return responses, committed
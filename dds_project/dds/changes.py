@@ -0,0 +1,114 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+from .models import MoneyMovement, MoneyMovementTombstone
+
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 5000
+
+
+class InvalidChangesToken(ValueError):
+    """Токен синхронизации поврежден или имеет неверный формат"""
+
+
+class ChangesCursor:
+    """
+    Позиция клиента в ленте изменений
+
+    Хранит номер последнего полученного изменения (change_seq) и ID последних
+    выданных записей с этим номером (отдельно для изменений и удалений): одним
+    номером помечаются все строки массового изменения, и порция может
+    закончиться посередине. Номера выделяются в пишущей транзакции в порядке
+    фиксации, поэтому изменение, зафиксированное после выдачи курсора, не
+    окажется позади него, даже если часы приложения отстают.
+    """
+
+    def __init__(self, seq=None, movement_id=0, tombstone_id=0):
+        self.seq = seq
+        self.movement_id = movement_id
+        self.tombstone_id = tombstone_id
+
+    @classmethod
+    def from_token(cls, token):
+        """Разбор токена, выданного предыдущим запросом"""
+        if not token:
+            return cls()
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            seq = int(data['s'])
+            movement_id = int(data['m'])
+            tombstone_id = int(data['d'])
+        except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+            raise InvalidChangesToken("Некорректный токен синхронизации.")
+        if seq < 0:
+            raise InvalidChangesToken("Некорректный токен синхронизации.")
+        return cls(seq, movement_id, tombstone_id)
+
+    def to_token(self):
+        if self.seq is None:
+            return None
+        data = {'s': self.seq, 'm': self.movement_id, 'd': self.tombstone_id}
+        raw = json.dumps(data, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def after(self, id_value):
+        """Условие выборки записей строго после курсора по паре (номер изменения, ID)"""
+        if self.seq is None:
+            return Q()
+        return Q(change_seq__gt=self.seq) | Q(change_seq=self.seq, id__gt=id_value)
+
+    def is_new(self, movement):
+        """Запись создана после курсора - клиент ее еще не получал"""
+        if self.seq is None:
+            return True
+        return (movement.created_seq, movement.id) > (self.seq, self.movement_id)
+
+
+def get_changes(cursor, limit=DEFAULT_CHANGES_LIMIT, queryset=None):
+    """
+    Выборка изменений после курсора в порядке их фиксации
+
+    Возвращает список пар (тип, объект), новый курсор и признак наличия
+    следующей порции. Типы: created, updated, deleted.
+    """
+    if queryset is None:
+        queryset = MoneyMovement.objects.all()
+
+    movements = list(
+        queryset.filter(cursor.after(cursor.movement_id)).order_by('change_seq', 'id')[:limit + 1]
+    )
+    tombstones = list(
+        MoneyMovementTombstone.objects.filter(cursor.after(cursor.tombstone_id))
+        .order_by('change_seq', 'id')[:limit + 1]
+    )
+
+    # Слияние двух упорядоченных потоков по номеру изменения
+    merged = sorted(
+        [(m.change_seq, 0, m.id, m) for m in movements] + [(t.change_seq, 1, t.id, t) for t in tombstones],
+        key=lambda item: item[:3],
+    )
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+
+    changes = []
+    next_cursor = ChangesCursor(cursor.seq, cursor.movement_id, cursor.tombstone_id)
+    for seq, kind, obj_id, obj in merged:
+        if seq != next_cursor.seq:
+            next_cursor = ChangesCursor(seq)
+        if kind == 0:
+            next_cursor.movement_id = obj_id
+            changes.append(('created' if cursor.is_new(obj) else 'updated', obj))
+        else:
+            next_cursor.tombstone_id = obj_id
+            changes.append(('deleted', obj))
+
+    return changes, next_cursor, has_more
+
+
+def serialize_tombstone(tombstone):
+    """Представление удаленной записи в ленте изменений"""
+    return {'id': tombstone.movement_id, 'deleted_at': tombstone.deleted_at.isoformat()}
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.db.models import Count, Min
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import MoneyMovement
+
+# Поведение при создании операции с уже существующим содержимым:
+# allow - создать, flag - создать и сообщить о дубликате,
+# reject - отказать (409), merge - вернуть существующую запись вместо новой
+DUPLICATE_POLICIES = ('allow', 'flag', 'reject', 'merge')
+DUPLICATE_HEADER = 'X-DDS-Duplicate-Of'
+
+
+class DuplicateMovement(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Операция с таким содержимым уже существует."
+    default_code = 'duplicate'
+
+    def __init__(self, duplicate_of):
+        super().__init__()
+        # ID отдается числом: APIException привел бы все значения словаря к строкам
+        self.detail = {'detail': self.detail, 'duplicate_of': duplicate_of}
+
+
+def get_duplicate_policy(value=None):
+    """Политика из параметра запроса или задачи; по умолчанию - DDS_DUPLICATE_POLICY"""
+    policy = value or settings.DDS_DUPLICATE_POLICY
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"Неизвестная политика дубликатов: {policy}. Допустимо: {', '.join(DUPLICATE_POLICIES)}")
+    return policy
+
+
+def fingerprint_of(validated_data):
+    """Отпечаток операции по проверенным данным сериализатора, до сохранения"""
+    movement = MoneyMovement(**validated_data)
+    movement.fill_fingerprint()
+    return movement.fingerprint
+
+
+def find_duplicates(fingerprints, queryset=None):
+    """
+    Существующие операции с данными отпечатками: {отпечаток: ID самой ранней}
+
+    Один запрос по индексу fingerprint на всю порцию отпечатков.
+    """
+    if queryset is None:
+        queryset = MoneyMovement.objects.all()
+    fingerprints = set(fingerprints)
+    if not fingerprints:
+        return {}
+    rows = queryset.filter(fingerprint__in=fingerprints).order_by().values('fingerprint').annotate(first_id=Min('id'))
+    return {row['fingerprint']: row['first_id'] for row in rows}
+
+
+def duplicate_clusters(queryset=None):
+    """Группы операций с одинаковым отпечатком (больше одной записи), крупные первыми"""
+    if queryset is None:
+        queryset = MoneyMovement.objects.all()
+    return queryset.order_by().values('fingerprint').annotate(
+        count=Count('id'), first_id=Min('id'),
+    ).filter(count__gt=1).order_by('-count', 'first_id')
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class MovementSubscription:
+    """
+    Подписка одного клиента на поток событий
+
+    Держит ограниченную очередь в цикле событий клиента. Если клиент не
+    успевает читать и очередь переполняется, накопленные события
+    отбрасываются, а клиенту отправляется событие reset: ему нужно
+    догрузить пропущенное через ленту изменений.
+    """
+
+    def __init__(self, loop, predicate=None, maxsize=None):
+        self.loop = loop
+        self.predicate = predicate
+        self.queue = asyncio.Queue(maxsize=maxsize or settings.DDS_STREAM_QUEUE_SIZE)
+        self.dropped = 0
+
+    def matches(self, payload):
+        return self.predicate is None or self.predicate(payload)
+
+    def deliver(self, event):
+        """Постановка события в очередь (выполняется в цикле событий клиента)"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Медленный клиент: освобождаем очередь и просим полную пересинхронизацию
+            self.dropped += self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(('reset', {'dropped': self.dropped}))
+
+
+class MovementEventBroker:
+    """Внутрипроцессная рассылка событий об изменении операций ДДС подписчикам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def has_subscribers(self):
+        return bool(self._subscriptions)
+
+    def subscribe(self, predicate=None, maxsize=None):
+        subscription = MovementSubscription(asyncio.get_running_loop(), predicate, maxsize)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, op, payload):
+        """Рассылка события всем подходящим подписчикам (потокобезопасно)"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.matches(payload):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, (op, payload))
+            except RuntimeError:
+                # Цикл событий клиента уже закрыт
+                self.unsubscribe(subscription)
+
+
+broker = MovementEventBroker()
+
+
+def format_sse(event, data):
+    """Форматирование события в формате text/event-stream"""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n"
@@ -0,0 +1,88 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django import forms
+from django.core import exceptions, validators
+from django.db import models
+
+
+class MoneyField(models.Field):
+    """
+    Денежная сумма, хранимая в БД целым числом минимальных единиц (копеек)
+
+    В Python значение - Decimal с decimal_places знаками после запятой, как
+    у DecimalField. Сравнения, сортировка и агрегаты (SUM) в БД выполняются
+    над целыми числами - точно и без преобразования каждой строки в Decimal.
+    """
+    description = "Денежная сумма в минимальных единицах"
+    default_error_messages = {
+        'invalid': '“%(value)s” должно быть десятичным числом.',
+    }
+
+    def __init__(self, *args, max_digits=15, decimal_places=2, **kwargs):
+        self.max_digits = max_digits
+        self.decimal_places = decimal_places
+        super().__init__(*args, **kwargs)
+
+    @property
+    def quantum(self):
+        return Decimal(1).scaleb(-self.decimal_places)
+
+    @property
+    def default_validators(self):
+        return [validators.DecimalValidator(self.max_digits, self.decimal_places)]
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['max_digits'] = self.max_digits
+        kwargs['decimal_places'] = self.decimal_places
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        # Не *IntegerField: иначе выражения приводили бы результат AVG к int до from_db_value
+        return 'MoneyField'
+
+    def db_type(self, connection):
+        return models.BigIntegerField().db_type(connection)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            if isinstance(value, float):
+                return Decimal(repr(value))
+            return Decimal(str(value))
+        except (InvalidOperation, ValueError):
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value},
+            )
+
+    def to_minor_units(self, value):
+        """Decimal -> целое число минимальных единиц"""
+        value = self.to_python(value)
+        if value is None:
+            return None
+        return int(value.quantize(self.quantum, rounding=ROUND_HALF_UP).scaleb(self.decimal_places))
+
+    def from_minor_units(self, value):
+        """Целое число минимальных единиц -> Decimal"""
+        if value is None:
+            return None
+        if isinstance(value, float):
+            # Результат AVG и подобных агрегатов
+            return Decimal(repr(value)).scaleb(-self.decimal_places).quantize(self.quantum, rounding=ROUND_HALF_UP)
+        return Decimal(int(value)).scaleb(-self.decimal_places)
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        return self.to_minor_units(value)
+
+    def from_db_value(self, value, expression, connection):
+        return self.from_minor_units(value)
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{
+            'form_class': forms.DecimalField,
+            'max_digits': self.max_digits,
+            'decimal_places': self.decimal_places,
+            **kwargs,
+        })
@@ -1,9 +1,12 @@
 import django_filters
-from .models import MoneyMovement
+from django.utils.dateparse import parse_datetime
+
+from .models import MoneyMovement, MovementAuditEntry
 
 
 class MoneyMovementFilter(django_filters.FilterSet):
-    created_date = django_filters.DateFromToRangeFilter()
+    # Фильтр по дате операции работает по индексируемой колонке дня, а не по DateTimeField
+    created_date = django_filters.DateFromToRangeFilter(field_name='created_day')
 
     class Meta:
         model = MoneyMovement
@@ -13,3 +16,54 @@ class MoneyMovementFilter(django_filters.FilterSet):
             'category': ['exact'],
             'subcategory': ['exact'],
         }
+
+
+class MovementAuditFilter(django_filters.FilterSet):
+    movement = django_filters.NumberFilter(field_name='movement_id')
+    created_at = django_filters.IsoDateTimeFromToRangeFilter()
+
+    class Meta:
+        model = MovementAuditEntry
+        fields = {
+            'user': ['exact'],
+            'action': ['exact'],
+            'source': ['exact'],
+        }
+
+
+def build_movement_predicate(params):
+    """
+    Построение проверки события на соответствие фильтрам MoneyMovementFilter
+
+    Используется для потоковых подписок, где фильтровать нужно отдельные
+    записи в памяти, а не queryset. Возвращает (predicate, errors).
+    """
+    filterset = MoneyMovementFilter(params, queryset=MoneyMovement.objects.none())
+    if not filterset.is_valid():
+        return None, filterset.errors
+
+    data = filterset.form.cleaned_data
+    exact = {name: data[name].pk for name in ('status', 'operation_type', 'category', 'subcategory')
+             if data.get(name) is not None}
+    date_range = data.get('created_date')
+    start = date_range.start if date_range else None
+    stop = date_range.stop if date_range else None
+
+    if not exact and start is None and stop is None:
+        return None, None
+
+    def predicate(payload):
+        for name, value in exact.items():
+            if payload.get(name) != value:
+                return False
+        if start is not None or stop is not None:
+            created = parse_datetime(payload.get('created_date') or '')
+            if created is None:
+                return False
+            if start is not None and created < start:
+                return False
+            if stop is not None and created > stop:
+                return False
+        return True
+
+    return predicate, None
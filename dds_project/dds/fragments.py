@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class FragmentCache:
+    """
+    LRU-кэш сериализованных представлений записей в памяти процесса
+
+    Ключ - (ID, версия строки, версия справочников): измененная запись
+    (новый updated_at) или переименованный справочник дают новый ключ, а
+    старые фрагменты вытесняются по LRU. Объем ограничен приблизительной
+    оценкой размера фрагментов в байтах. Фрагменты отдаются без копирования,
+    изменять их нельзя.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._keys_by_pk = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def estimate_size(data):
+        return len(repr(data))
+
+    def get_many(self, keys):
+        """Найденные фрагменты {ключ: данные}; найденные поднимаются в начало очереди LRU"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[0]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items):
+        with self._lock:
+            for key, data in items.items():
+                size = self.estimate_size(data)
+                if size > self.max_bytes:
+                    continue
+                self._remove(key)
+                self._entries[key] = (data, size)
+                self._keys_by_pk.setdefault(key[0], set()).add(key)
+                self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, pk):
+        """Удаление всех версий фрагмента записи (при сохранении и удалении)"""
+        with self._lock:
+            for key in list(self._keys_by_pk.get(pk, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_pk.clear()
+            self._size = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry[1]
+        keys = self._keys_by_pk[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_pk[key[0]]
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'hits': self.hits, 'misses': self.misses}
+
+
+movement_fragments = FragmentCache(settings.DDS_FRAGMENT_CACHE_BYTES)
+
+
+def serialize_with_fragments(rows, fetch, serialize, cache=movement_fragments):
+    """
+    Представления записей в порядке rows с использованием кэша фрагментов
+
+    rows - пары (ID, версия строки); fetch(ids) возвращает {ID: объект} только
+    для промахов, serialize(objects) - их представления. Версия справочников
+    входит в ключ: названия статусов и категорий хранятся во фрагменте.
+    """
+    from .taxonomy import get_taxonomy_version
+
+    taxonomy_version = get_taxonomy_version()
+    keys = [(pk, version, taxonomy_version) for pk, version in rows]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        objects = fetch([key[0] for key in missing])
+        present = [key for key in missing if key[0] in objects]
+        fresh = dict(zip(present, serialize([objects[key[0]] for key in present])))
+        cache.set_many(fresh)
+        found.update(fresh)
+    # Запись могла быть удалена между запросами - пропускаем ее
+    return [found[key] for key in keys if key in found]
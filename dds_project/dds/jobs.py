@@ -0,0 +1,238 @@
+import csv
+import io
+import itertools
+import tempfile
+import time
+import traceback
+
+from django.core.files.base import ContentFile, File
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, transaction
+from django.utils import timezone
+
+from .auditlog import audit_context, audit_log
+from .models import Job, MoneyMovement
+
+JOB_HANDLERS = {}
+
+# Как часто (в секундах) сохранять прогресс задачи в БД
+PROGRESS_SAVE_INTERVAL = 1.0
+
+EXPORT_FIELDS = ['id', 'created_date', 'status', 'operation_type', 'category', 'subcategory', 'amount', 'comment']
+IMPORT_BATCH_SIZE = 1000
+
+
+class JobCancelled(Exception):
+    """Задача отменена пользователем во время выполнения"""
+
+
+def register_job(kind):
+    """Регистрация обработчика фоновой задачи указанного типа"""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+class JobContext:
+    """Интерфейс обработчика к своей задаче: прогресс, отмена, сохранение результата"""
+
+    def __init__(self, job):
+        self.job = job
+        self._last_saved = 0.0
+
+    def progress(self, done, total=None, message=''):
+        """Обновление прогресса (запись в БД не чаще раза в PROGRESS_SAVE_INTERVAL)"""
+        now = time.monotonic()
+        if now - self._last_saved < PROGRESS_SAVE_INTERVAL:
+            return
+        self._last_saved = now
+        percent = min(99, int(done * 100 / total)) if total else 0
+        Job.objects.filter(pk=self.job.pk).update(progress=percent, message=message[:255])
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if Job.objects.filter(pk=self.job.pk, cancel_requested=True).exists():
+            raise JobCancelled()
+
+    def save_result(self, filename, content):
+        """content - байты или File (большой результат удобнее писать во временный файл)"""
+        if not isinstance(content, File):
+            content = ContentFile(content)
+        self.job.result.save(filename, content, save=False)
+        Job.objects.filter(pk=self.job.pk).update(result=self.job.result.name)
+
+
+def claim_job(job_id):
+    """Атомарный захват ожидающей задачи воркером; False если ее уже забрали"""
+    return Job.objects.filter(pk=job_id, status=Job.State.PENDING, cancel_requested=False).update(
+        status=Job.State.RUNNING, started_at=timezone.now(), progress=0,
+    ) == 1
+
+
+def run_job(job_id):
+    """
+    Выполнение захваченной задачи
+
+    Функция верхнего уровня, чтобы ее можно было передавать в пул процессов.
+    """
+    close_old_connections()
+    token = None
+    try:
+        job = Job.objects.get(pk=job_id)
+        handler = JOB_HANDLERS.get(job.kind)
+        token = audit_context.set((None, f'job:{job.kind}'))
+        try:
+            if handler is None:
+                raise ValueError(f"Неизвестный тип задачи: {job.kind}")
+            message = handler(job, JobContext(job)) or ''
+        except JobCancelled:
+            _finish(job_id, Job.State.CANCELLED, message="Задача отменена")
+        except Exception:
+            _finish(job_id, Job.State.FAILED, error=traceback.format_exc())
+        else:
+            _finish(job_id, Job.State.SUCCEEDED, progress=100, message=message)
+    finally:
+        if token is not None:
+            audit_context.reset(token)
+        # Процесс пула завершается без atexit - журнал задачи сохраняется сразу
+        audit_log.flush()
+        close_old_connections()
+    return job_id
+
+
+def _finish(job_id, status, **fields):
+    Job.objects.filter(pk=job_id).update(status=status, finished_at=timezone.now(), **fields)
+
+
+@register_job('export_movements')
+def export_movements(job, context):
+    """
+    Выгрузка операций ДДС в CSV с фильтрами MoneyMovementFilter из параметров задачи
+
+    params.snapshot - читать снимок БД (имя файла или latest) вместо основной БД.
+    """
+    snapshot = job.params.get('snapshot')
+    if not snapshot:
+        return _export_movements(job, context, DEFAULT_DB_ALIAS)
+    from .backup import snapshot_database
+
+    with snapshot_database(snapshot) as alias:
+        return _export_movements(job, context, alias)
+
+
+def _export_movements(job, context, using):
+    from .filters import MoneyMovementFilter
+
+    filterset = MoneyMovementFilter(job.params.get('filters', {}), queryset=MoneyMovement.objects.using(using))
+    if not filterset.is_valid():
+        raise ValueError(f"Некорректные фильтры: {dict(filterset.errors)}")
+    queryset = filterset.qs.order_by('created_date', 'id').values_list(*EXPORT_FIELDS)
+    total = queryset.count()
+
+    # Строки пишутся во временный файл по мере чтения курсора - выгрузка не держится в памяти целиком
+    with tempfile.TemporaryFile() as file:
+        text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(EXPORT_FIELDS)
+        for done, row in enumerate(queryset.iterator(chunk_size=2000), start=1):
+            writer.writerow(row)
+            context.progress(done, total, f"Выгружено {done} из {total}")
+        text.flush()
+        text.detach()
+        file.seek(0)
+        context.save_result(f"movements_{job.pk}.csv", File(file))
+    return f"Выгружено записей: {total}"
+
+
+@register_job('import_movements')
+def import_movements(job, context):
+    """
+    Загрузка операций ДДС из CSV-файла задачи
+
+    Колонки: created_date, status, operation_type, category, subcategory,
+    amount, comment (справочники указываются по ID). Строки проверяются
+    сериализатором; при любой ошибке загрузка не применяется целиком.
+    params.duplicates - политика для дубликатов (см. dds.duplicates): reject
+    считает их ошибками, merge пропускает, flag загружает и перечисляет в итоге.
+
+    Файл читается порциями по IMPORT_BATCH_SIZE строк: порция проверяется и
+    сохраняется в общей транзакции, которая откатывается, если нашлись ошибки.
+    """
+    from .duplicates import find_duplicates, get_duplicate_policy
+    from .serializers import MoneyMovementSerializer
+
+    policy = get_duplicate_policy(job.params.get('duplicates'))
+    if not job.source:
+        raise ValueError("Не передан файл для загрузки")
+
+    errors, duplicates, seen = [], [], {}
+    loaded = 0
+    with job.source.open('rb') as source, transaction.atomic():
+        text = io.TextIOWrapper(source, encoding='utf-8-sig')
+        total = max(0, sum(1 for _ in csv.reader(text)) - 1)
+        text.seek(0)
+        rows = enumerate(csv.DictReader(text), start=2)
+        while batch := list(itertools.islice(rows, IMPORT_BATCH_SIZE)):
+            movements = []
+            for line, row in batch:
+                if not row.get('created_date'):
+                    row.pop('created_date', None)
+                serializer = MoneyMovementSerializer(data=row)
+                if serializer.is_valid():
+                    movement = MoneyMovement(**serializer.validated_data)
+                    movement.fill_fingerprint()
+                    movements.append((line, movement))
+                else:
+                    errors.append(f"Строка {line}: {serializer.errors}")
+
+            if policy != 'allow':
+                # Один запрос по индексу отпечатка на порцию; строки прежних порций уже в БД,
+                # поэтому повторы внутри файла проверяются первыми
+                existing = find_duplicates(movement.fingerprint for _, movement in movements)
+                kept = []
+                for line, movement in movements:
+                    if movement.fingerprint in seen:
+                        original = f"строка {seen[movement.fingerprint]}"
+                    elif movement.fingerprint in existing:
+                        original = f"операция {existing[movement.fingerprint]}"
+                    else:
+                        original = None
+                        seen[movement.fingerprint] = line
+                    if original is not None:
+                        duplicates.append((line, original))
+                        if policy == 'reject':
+                            errors.append(f"Строка {line}: дубликат ({original})")
+                    if original is None or policy != 'merge':
+                        kept.append((line, movement))
+                movements = kept
+
+            # После первой ошибки строки только проверяются - транзакция все равно откатится
+            if not errors:
+                MoneyMovement.objects.bulk_create([movement for _, movement in movements])
+                loaded += len(movements)
+            done = batch[-1][0] - 1
+            context.progress(done, total, f"Обработано {done} из {total}")
+
+        if errors:
+            raise ValueError("\n".join(errors[:100]))
+
+    message = f"Загружено записей: {loaded}"
+    if duplicates and policy == 'merge':
+        message += f", пропущено дубликатов: {len(duplicates)}"
+    elif duplicates:
+        message += ", из них дубликаты: " + ", ".join(f"строка {line} ({original})" for line, original in duplicates[:20])
+    return message[:255]
+
+
+@register_job('refresh_reports')
+def refresh_saved_reports(job, context):
+    """
+    Пересчет сохраненных отчетов
+
+    params.reports - ID отчетов (по умолчанию все), params.full - пересчитать
+    отчеты целиком, а не только устаревшие группы.
+    """
+    from .reports import refresh_reports
+
+    refreshed = refresh_reports(job.params.get('reports'), full=bool(job.params.get('full')))
+    return f"Пересчитано групп: {refreshed}"
@@ -0,0 +1,34 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand
+
+from dds.audit import VIOLATION_FIELDS, fix_violations, iter_violations, summarize_violations
+
+
+class Command(BaseCommand):
+    help = ('Проверка иерархии справочников у всех операций ДДС (подкатегория - категория - тип операции) '
+            'запросами с соединениями; нарушения выводятся в CSV')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Исправить нарушения: категория и тип операции берутся от подкатегории')
+        parser.add_argument('--summary', action='store_true', help='Вывести только количество нарушений')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if not options['summary']:
+            writer = csv.writer(self.stdout, lineterminator='\n')
+            writer.writerow([*VIOLATION_FIELDS, 'problems'])
+            for row in iter_violations():
+                writer.writerow([*(row[field] for field in VIOLATION_FIELDS), ';'.join(row['problems'])])
+
+        summary = summarize_violations()
+        self.stderr.write(
+            f"Нарушений: {summary['total']} (подкатегория не из категории: {summary['subcategory_not_in_category']}, "
+            f"категория не из типа операции: {summary['category_not_in_operation_type']}), "
+            f"{time.perf_counter() - started:.2f} с"
+        )
+        if options['fix'] and summary['total']:
+            fixed = fix_violations()
+            self.stderr.write(self.style.SUCCESS(f"Исправлено операций: {fixed}"))
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from dds.backup import BackupError, backup_database, create_snapshot, list_snapshots
+
+# Как часто (в секундах) выводить прогресс
+PROGRESS_INTERVAL = 1.0
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = ('Онлайн-копирование БД SQLite через backup API небольшими шагами с паузами - запись '
+            'приложения не блокируется. С --snapshot создается снимок для чтения отчетами и выгрузками')
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', nargs='?', help='Файл резервной копии')
+        parser.add_argument('--snapshot', action='store_true',
+                            help='Создать снимок в DDS_SNAPSHOT_DIR (старые сверх DDS_SNAPSHOT_KEEP удаляются)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Алиас подключения')
+        parser.add_argument('--pages', type=int, default=None,
+                            help='Страниц за шаг (по умолчанию DDS_BACKUP_PAGES)')
+        parser.add_argument('--step-delay', type=float, default=None,
+                            help='Пауза между шагами в секундах (по умолчанию DDS_BACKUP_STEP_DELAY)')
+
+    def handle(self, *args, **options):
+        if bool(options['target']) == options['snapshot']:
+            raise CommandError("Укажите файл резервной копии или --snapshot")
+        self._started = self._last_report = time.perf_counter()
+        backup_options = {
+            'using': options['database'],
+            'pages': options['pages'],
+            'step_delay': options['step_delay'],
+            'progress': self.report_progress,
+        }
+        try:
+            if options['snapshot']:
+                result = create_snapshot(**backup_options)
+            else:
+                result = backup_database(options['target'], **backup_options)
+        except BackupError as e:
+            raise CommandError(str(e)) from e
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Копия {result.path}: {result.size / MB:.1f} МБ за {result.elapsed:.2f} с "
+            f"({result.throughput / MB:.1f} МБ/с), перезапусков: {result.restarts}"
+        ))
+        if options['snapshot']:
+            self.stdout.write(f"Снимков хранится: {len(list_snapshots())}")
+
+    def report_progress(self, copied, total, restarts):
+        """Прогресс не чаще раза в PROGRESS_INTERVAL"""
+        now = time.perf_counter()
+        if now - self._last_report < PROGRESS_INTERVAL or copied == total:
+            return
+        self._last_report = now
+        elapsed = now - self._started
+        self.stdout.write(
+            f"Скопировано {copied} из {total} страниц ({copied * 100 // total}%, {copied / elapsed:.0f} стр/с), "
+            f"перезапусков: {restarts}"
+        )
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dds.schema import write_schema
+
+
+class Command(BaseCommand):
+    help = 'Сборка OpenAPI-схемы в файл, который отдается по /dds/api/schema/ вместо генерации на каждый запрос'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Путь к файлу схемы (по умолчанию settings.DDS_SCHEMA_FILE)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        path, size = write_schema(options['file'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Схема записана в {path} ({size} байт) за {elapsed:.2f} с')
+        )
@@ -1,69 +1,83 @@
-from django.core.management.base import BaseCommand
-from dds.models import Status, OperationType, Category, Subcategory
+import time
 
+from django.core.management.base import BaseCommand, CommandError
 
-class Command(BaseCommand):
-    help = 'Загрузка начальных данных для системы ДДС'
+from dds.taxonomy_sync import LEVEL_TITLES, TaxonomyPlan, TaxonomySyncError, load_taxonomy_file
 
-    def handle(self, *args, **kwargs):
-        self.stdout.write('Загрузка начальных данных...')
+# Справочники по умолчанию (в том же формате, что и файл)
+DEFAULT_TAXONOMY = {
+    'statuses': [
+        {'name': 'Бизнес', 'description': 'Бизнес операции'},
+        {'name': 'Личное', 'description': 'Личные финансы'},
+        {'name': 'Налог', 'description': 'Налоговые операции'},
+    ],
+    'operation_types': [
+        {
+            'name': 'Пополнение',
+            'description': 'Поступление денежных средств',
+            'categories': [
+                {'name': 'Зарплата', 'subcategories': ['Аванс', 'Основная зарплата', 'Премия']},
+            ],
+        },
+        {
+            'name': 'Списание',
+            'description': 'Расход денежных средств',
+            'categories': [
+                {'name': 'Маркетинг', 'subcategories': ['Avito', 'Farpost', 'Яндекс.Директ']},
+                {'name': 'Инфраструктура', 'subcategories': ['VPS', 'Proxy', 'Домены']},
+            ],
+        },
+    ],
+}
 
-        statuses = [
-            {'name': 'Бизнес', 'description': 'Бизнес операции'},
-            {'name': 'Личное', 'description': 'Личные финансы'},
-            {'name': 'Налог', 'description': 'Налоговые операции'},
-        ]
 
-        for status_data in statuses:
-            status, created = Status.objects.get_or_create(**status_data)
-            if created:
-                self.stdout.write(f'Создан статус: {status.name}')
+class Command(BaseCommand):
+    help = ('Загрузка начальных данных для системы ДДС или синхронизация справочников с файлом JSON/YAML '
+            '(несколько запросов и массовые вставки/обновления в одной транзакции)')
 
-        operation_types = [
-            {'name': 'Пополнение', 'description': 'Поступление денежных средств'},
-            {'name': 'Списание', 'description': 'Расход денежных средств'},
-        ]
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?',
+                            help='Файл дерева справочников (.json, .yaml); по умолчанию - встроенные данные')
+        parser.add_argument('--prune', action='store_true',
+                            help='Удалить записи, которых нет в файле (кроме тех, на которые ссылаются операции)')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать изменения, не применяя их')
 
-        for op_type_data in operation_types:
-            op_type, created = OperationType.objects.get_or_create(**op_type_data)
-            if created:
-                self.stdout.write(f'Создан тип операции: {op_type.name}')
+    def handle(self, *args, **options):
+        self.stdout.write('Загрузка начальных данных...')
+        started = time.perf_counter()
+        try:
+            tree = load_taxonomy_file(options['source']) if options['source'] else DEFAULT_TAXONOMY
+            plan = TaxonomyPlan(tree, prune=options['prune'])
+            fixed = 0
+            if plan.has_changes and not options['dry_run']:
+                fixed = plan.apply()
+        except TaxonomySyncError as e:
+            raise CommandError(str(e)) from e
 
-        categories_data = [
-            {
-                'name': 'Маркетинг',
-                'operation_type': 'Списание',
-                'subcategories': ['Avito', 'Farpost', 'Яндекс.Директ']
-            },
-            {
-                'name': 'Инфраструктура',
-                'operation_type': 'Списание',
-                'subcategories': ['VPS', 'Proxy', 'Домены']
-            },
-            {
-                'name': 'Зарплата',
-                'operation_type': 'Пополнение',
-                'subcategories': ['Аванс', 'Основная зарплата', 'Премия']
-            },
-        ]
+        self.write_summary(plan, options['verbosity'])
+        if fixed:
+            self.stdout.write(f"Операций перенесено вслед за справочниками: {fixed}")
+        elapsed = time.perf_counter() - started
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Пробный запуск: изменения не применены ({elapsed:.2f} с)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ Начальные данные успешно загружены! ({elapsed:.2f} с)'))
 
-        for cat_data in categories_data:
-            op_type = OperationType.objects.get(name=cat_data['operation_type'])
-            category, created = Category.objects.get_or_create(
-                name=cat_data['name'],
-                operation_type=op_type
+    def write_summary(self, plan, verbosity):
+        for key, changes in plan.levels.items():
+            counts = changes.counts()
+            self.stdout.write(
+                f"{LEVEL_TITLES[key]}: создано {counts['created']}, изменено {counts['updated']}, "
+                f"удалено {counts['deleted']}"
             )
-            if created:
-                self.stdout.write(f'Создана категория: {category.name}')
-
-            for subcat_name in cat_data['subcategories']:
-                subcategory, created = Subcategory.objects.get_or_create(
-                    name=subcat_name,
-                    category=category
-                )
-                if created:
-                    self.stdout.write(f'Создана подкатегория: {subcategory.name}')
-
-        self.stdout.write(
-            self.style.SUCCESS('✅ Начальные данные успешно загружены!')
-        )
\ No newline at end of file
+            if verbosity >= 2:
+                for instance in changes.created:
+                    self.stdout.write(f"  + {instance.name}")
+                for instance in changes.updated:
+                    self.stdout.write(f"  ~ {changes.existing[instance.pk][0]} -> {instance.name}")
+                for name in changes.deleted.values():
+                    self.stdout.write(f"  - {name}")
+            if changes.protected:
+                self.stdout.write(self.style.WARNING(
+                    f"  Не удалены, есть операции: {', '.join(changes.protected.values())}"
+                ))
@@ -0,0 +1,404 @@
+import http.client
+import importlib.util
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+from django.utils import timezone
+
+from dds.models import Status, OperationType, Category, Subcategory, MoneyMovement
+from dds.stats import STATS_GROUPS
+
+LOADTEST_ALIAS = 'loadtest'
+
+SEARCH_WORDS = ['реклама', 'сервер', 'аванс', 'домен', 'налог', 'премия', 'прокси', 'оплата']
+
+DEFAULT_MIX = 'list=25,filter=20,search=15,create=10,taxonomy=10,changes=10,series=5,statistics=5'
+
+
+class Dataset:
+    """Сгенерированные справочники, из которых сценарии берут ID для запросов"""
+
+    def __init__(self, statuses, subcategories, pages):
+        self.statuses = statuses
+        # (operation_type_id, category_id, subcategory_id)
+        self.subcategories = subcategories
+        self.pages = pages
+
+
+def _random_period(rnd):
+    end = timezone.now().date() - timedelta(days=rnd.randint(0, 700))
+    start = end - timedelta(days=rnd.choice([1, 7, 30, 90]))
+    return start.isoformat(), end.isoformat()
+
+
+def scenario_list(dataset, rnd):
+    return 'GET', f'/dds/api/money_movements/?page={rnd.randint(1, dataset.pages)}', None
+
+
+def scenario_filter(dataset, rnd):
+    op_type, category, _ = rnd.choice(dataset.subcategories)
+    start, end = _random_period(rnd)
+    return 'GET', (f'/dds/api/money_movements/?category={category}&created_date_after={start}'
+                   f'&created_date_before={end}&ordering=-amount'), None
+
+
+def scenario_search(dataset, rnd):
+    return 'GET', f'/dds/api/money_movements/?search={quote(rnd.choice(SEARCH_WORDS))}', None
+
+
+def scenario_create(dataset, rnd):
+    op_type, category, subcategory = rnd.choice(dataset.subcategories)
+    body = {
+        'status': rnd.choice(dataset.statuses),
+        'operation_type': op_type,
+        'category': category,
+        'subcategory': subcategory,
+        'amount': f'{rnd.randint(100, 1000000) / 100:.2f}',
+        'comment': f'loadtest {rnd.choice(SEARCH_WORDS)}',
+    }
+    return 'POST', '/dds/api/money_movements/', body
+
+
+def scenario_taxonomy(dataset, rnd):
+    return 'GET', '/dds/api/taxonomy/', None
+
+
+def scenario_changes(dataset, rnd):
+    return 'GET', '/dds/api/money_movements/changes/?limit=100', None
+
+
+def scenario_series(dataset, rnd):
+    _, category, _ = rnd.choice(dataset.subcategories)
+    start, end = _random_period(rnd)
+    return 'GET', (f'/dds/api/money_movements/series/?category={category}&created_date_after={start}'
+                   f'&created_date_before={end}&points={rnd.choice([30, 100])}'), None
+
+
+def scenario_statistics(dataset, rnd):
+    return 'GET', f'/dds/api/money_movements/statistics/?group_by={rnd.choice(STATS_GROUPS)}', None
+
+
+SCENARIOS = {
+    'list': scenario_list,
+    'filter': scenario_filter,
+    'search': scenario_search,
+    'create': scenario_create,
+    'taxonomy': scenario_taxonomy,
+    'changes': scenario_changes,
+    'series': scenario_series,
+    'statistics': scenario_statistics,
+}
+
+
+def parse_mix(value):
+    """Разбор смеси сценариев вида list=30,create=10"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise CommandError(f"Неизвестный сценарий '{name}'. Доступные: {', '.join(SCENARIOS)}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f"Некорректный вес сценария '{part}'")
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def fmt(value):
+    return '-' if value is None else value
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочное тестирование API: поднимает WSGI- или ASGI-сервер на сгенерированных данных, '
+            'выполняет смесь запросов из нескольких потоков и сохраняет пропускную способность, '
+            'перцентили задержек и число SQL-запросов по сценариям в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi',
+                            help='wsgi - встроенный многопоточный сервер Django, asgi - uvicorn '
+                                 '(не входит в зависимости проекта, устанавливается отдельно)')
+        parser.add_argument('--concurrency', type=int, default=16, help='Количество параллельных клиентов')
+        parser.add_argument('--duration', type=float, default=30.0, help='Длительность замера в секундах')
+        parser.add_argument('--warmup', type=float, default=3.0, help='Прогрев перед замером в секундах')
+        parser.add_argument('--rows', type=int, default=10000, help='Количество сгенерированных операций')
+        parser.add_argument('--categories', type=int, default=20, help='Количество категорий')
+        parser.add_argument('--subcategories', type=int, default=5, help='Подкатегорий на категорию')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Веса сценариев (по умолчанию {DEFAULT_MIX})')
+        parser.add_argument('--port', type=int, default=0, help='Порт сервера (по умолчанию свободный)')
+        parser.add_argument('--output', default='loadtest.json', help='Файл для сохранения результатов')
+        parser.add_argument('--db-profile', choices=['default', 'production'], default='default',
+                            help='Профиль БД сервера (production - WAL, прагмы и постоянные соединения)')
+        parser.add_argument('--write-coalescing', action='store_true',
+                            help='Включить на сервере групповую фиксацию создания операций')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных данных')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        mix = parse_mix(options['mix'])
+        if options['server'] == 'asgi' and importlib.util.find_spec('uvicorn') is None:
+            raise CommandError("Для --server asgi нужен uvicorn, он не входит в зависимости проекта: "
+                               "установите его (pip install uvicorn) или используйте --server wsgi")
+
+        with tempfile.TemporaryDirectory(prefix='dds-loadtest-') as workdir:
+            db_path = Path(workdir) / 'loadtest.sqlite3'
+            self.stdout.write(f"Генерация данных: {options['rows']} операций...")
+            dataset = self.generate_dataset(db_path, options)
+
+            port = options['port'] or self.free_port()
+            server = self.start_server(options['server'], port, workdir, db_path,
+                                       options['write_coalescing'], options['db_profile'])
+            try:
+                self.wait_for_server(port, server, Path(workdir) / 'server.log')
+                self.stdout.write(f"Сервер {options['server']} запущен на порту {port}")
+                if options['warmup'] > 0:
+                    self.run_load(port, dataset, mix, options['concurrency'], options['warmup'])
+                results, elapsed = self.run_load(port, dataset, mix, options['concurrency'], options['duration'])
+            finally:
+                server.terminate()
+                try:
+                    server.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+
+        report = self.build_report(results, elapsed, options)
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        self.print_report(report)
+        self.stdout.write(self.style.SUCCESS(f"✅ Результаты сохранены в {options['output']}"))
+
+    def generate_dataset(self, db_path, options):
+        """Создание отдельной БД SQLite со справочниками и операциями"""
+        settings_dict = {**connections.settings['default'], 'NAME': str(db_path)}
+        # Подключение регистрируется только в текущем потоке, общие настройки DATABASES не меняются
+        connection = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, LOADTEST_ALIAS)
+        connections[LOADTEST_ALIAS] = connection
+        try:
+            call_command('migrate', database=LOADTEST_ALIAS, run_syncdb=True, verbosity=0)
+            db = LOADTEST_ALIAS
+
+            statuses = Status.objects.using(db).bulk_create(
+                [Status(name=name) for name in ('Бизнес', 'Личное', 'Налог')]
+            )
+            op_types = OperationType.objects.using(db).bulk_create(
+                [OperationType(name=name) for name in ('Пополнение', 'Списание')]
+            )
+            categories = Category.objects.using(db).bulk_create([
+                Category(name=f'Категория {i}', operation_type=op_types[i % len(op_types)])
+                for i in range(options['categories'])
+            ])
+            subcategories = Subcategory.objects.using(db).bulk_create([
+                Subcategory(name=f'{random.choice(SEARCH_WORDS)} {i}-{j}', category=category)
+                for i, category in enumerate(categories)
+                for j in range(options['subcategories'])
+            ])
+
+            now = timezone.now()
+            batch = []
+            for _ in range(options['rows']):
+                sub = random.choice(subcategories)
+                batch.append(MoneyMovement(
+                    created_date=now - timedelta(seconds=random.randint(0, 730 * 86400)),
+                    status=random.choice(statuses),
+                    operation_type_id=sub.category.operation_type_id,
+                    category=sub.category,
+                    subcategory=sub,
+                    amount=Decimal(random.randint(100, 10000000)) / 100,
+                    comment=f'{random.choice(SEARCH_WORDS)} {random.choice(SEARCH_WORDS)}',
+                ))
+                if len(batch) >= 5000:
+                    MoneyMovement.objects.using(db).bulk_create(batch)
+                    batch = []
+            if batch:
+                MoneyMovement.objects.using(db).bulk_create(batch)
+        finally:
+            connection.close()
+            del connections[LOADTEST_ALIAS]
+
+        page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE') or 1
+        return Dataset(
+            statuses=[s.pk for s in statuses],
+            subcategories=[(s.category.operation_type_id, s.category_id, s.pk) for s in subcategories],
+            pages=max(1, min(options['rows'] // page_size, 1000)),
+        )
+
+    def start_server(self, kind, port, workdir, db_path, write_coalescing=False, db_profile='default'):
+        """Запуск сервера в отдельном процессе с настройками, указывающими на тестовую БД"""
+        settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'dds_project.settings')
+        Path(workdir, 'loadtest_settings.py').write_text(
+            f"from {settings_module} import *  # noqa\n"
+            f"DEBUG = False\n"
+            f"ALLOWED_HOSTS = ['127.0.0.1', 'localhost']\n"
+            f"DATABASES = {{**DATABASES, 'default': {{**DATABASES['default'], 'NAME': {str(db_path)!r}}}}}\n"
+            f"DDS_QUERY_COUNT_HEADER = True\n"
+            f"DDS_WRITE_COALESCING = {write_coalescing!r}\n",
+            encoding='utf-8',
+        )
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'loadtest_settings',
+            'DDS_DB_PROFILE': db_profile,
+            'PYTHONPATH': os.pathsep.join([workdir, str(settings.BASE_DIR), os.environ.get('PYTHONPATH', '')]),
+        }
+        if kind == 'wsgi':
+            command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runserver',
+                       f'127.0.0.1:{port}', '--noreload', '--skip-checks']
+        else:
+            command = [sys.executable, '-m', 'uvicorn', 'dds_project.asgi:application',
+                       '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', '--no-access-log']
+        # Журнал сервера пишется в файл: через pipe сервер заблокировался бы на заполненном буфере
+        log = open(Path(workdir) / 'server.log', 'wb')
+        try:
+            return subprocess.Popen(command, env=env, cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+        finally:
+            log.close()
+
+    @staticmethod
+    def free_port():
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+    @staticmethod
+    def wait_for_server(port, server, log_path, timeout=30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                log = log_path.read_text(encoding='utf-8', errors='replace')
+                raise CommandError(f"Сервер завершился при запуске:\n{log}")
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.1)
+        raise CommandError("Сервер не запустился за отведенное время")
+
+    def run_load(self, port, dataset, mix, concurrency, duration):
+        """Выполнение смеси запросов из нескольких потоков в течение duration секунд"""
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        results = {name: {'latencies': [], 'queries': [], 'errors': 0, 'bytes': 0} for name in names}
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def worker(seed):
+            rnd = random.Random(seed)
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            local = {name: {'latencies': [], 'queries': [], 'errors': 0, 'bytes': 0} for name in names}
+            while time.monotonic() < deadline:
+                name = rnd.choices(names, weights)[0]
+                method, path, body = SCENARIOS[name](dataset, rnd)
+                headers = {'Accept': 'application/json'}
+                payload = None
+                if body is not None:
+                    payload = json.dumps(body).encode('utf-8')
+                    headers['Content-Type'] = 'application/json'
+                started = time.perf_counter()
+                try:
+                    conn.request(method, path, body=payload, headers=headers)
+                    response = conn.getresponse()
+                    content = response.read()
+                except (OSError, http.client.HTTPException):
+                    local[name]['errors'] += 1
+                    conn.close()
+                    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                    continue
+                latency = time.perf_counter() - started
+                stats = local[name]
+                if response.status >= 400:
+                    stats['errors'] += 1
+                    continue
+                stats['latencies'].append(latency)
+                stats['bytes'] += len(content)
+                queries = response.getheader('X-DDS-Queries')
+                if queries is not None:
+                    stats['queries'].append(int(queries))
+            conn.close()
+            with lock:
+                for name, stats in local.items():
+                    results[name]['latencies'].extend(stats['latencies'])
+                    results[name]['queries'].extend(stats['queries'])
+                    results[name]['errors'] += stats['errors']
+                    results[name]['bytes'] += stats['bytes']
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=worker, args=(random.random(),)) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.monotonic() - started
+
+    @staticmethod
+    def build_report(results, elapsed, options):
+        endpoints = {}
+        total = 0
+        for name, stats in results.items():
+            latencies = sorted(stats['latencies'])
+            total += len(latencies)
+            endpoints[name] = {
+                'requests': len(latencies),
+                'errors': stats['errors'],
+                'rps': round(len(latencies) / elapsed, 2),
+                'latency_ms': {
+                    key: round(value * 1000, 2) if value is not None else None
+                    for key, value in (
+                        ('mean', statistics.fmean(latencies) if latencies else None),
+                        ('p50', percentile(latencies, 0.50)),
+                        ('p90', percentile(latencies, 0.90)),
+                        ('p99', percentile(latencies, 0.99)),
+                        ('max', latencies[-1] if latencies else None),
+                    )
+                },
+                'sql_queries': {
+                    'mean': round(statistics.fmean(stats['queries']), 2) if stats['queries'] else None,
+                    'max': max(stats['queries']) if stats['queries'] else None,
+                },
+                'avg_response_bytes': round(stats['bytes'] / len(latencies)) if latencies else None,
+            }
+        return {
+            'started_at': timezone.now().isoformat(),
+            'config': {key: options[key] for key in
+                       ('server', 'concurrency', 'duration', 'rows', 'categories', 'subcategories', 'mix', 'seed',
+                        'db_profile', 'write_coalescing')},
+            'elapsed_seconds': round(elapsed, 2),
+            'total_requests': total,
+            'total_rps': round(total / elapsed, 2),
+            'endpoints': endpoints,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(f"{'сценарий':<10} {'запросов':>9} {'ошибок':>7} {'rps':>8} "
+                          f"{'p50 мс':>8} {'p90 мс':>8} {'p99 мс':>8} {'SQL':>6}")
+        for name, data in report['endpoints'].items():
+            latency = data['latency_ms']
+            self.stdout.write(
+                f"{name:<10} {data['requests']:>9} {data['errors']:>7} {data['rps']:>8} "
+                f"{fmt(latency['p50']):>8} {fmt(latency['p90']):>8} {fmt(latency['p99']):>8} "
+                f"{fmt(data['sql_queries']['mean']):>6}"
+            )
+        self.stdout.write(f"Всего: {report['total_requests']} запросов, {report['total_rps']} rps")
@@ -0,0 +1,75 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from dds.jobs import claim_job, run_job
+from dds.models import Job
+
+
+def _init_worker_process():
+    """Инициализация Django в дочернем процессе пула"""
+    import django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Воркер фоновых задач ДДС: забирает ожидающие задачи и выполняет их в пуле потоков или процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Количество параллельно выполняемых задач (по умолчанию - число ядер)')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='process',
+                            help='Тип пула: процессы используют все ядра, потоки легче для задач ввода-вывода')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Пауза между проверками очереди в секундах')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить имеющиеся задачи и завершиться')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        if options['pool'] == 'process':
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker_process)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+
+        self.stdout.write(f"Воркер запущен: {workers} ({options['pool']})")
+        running = {}
+        try:
+            while True:
+                close_old_connections()
+                free = workers - len(running)
+                if free > 0:
+                    pending = Job.objects.filter(
+                        status=Job.State.PENDING, cancel_requested=False,
+                    ).order_by('created_at').values_list('pk', flat=True)[:free]
+                    for job_id in pending:
+                        if claim_job(job_id):
+                            self.stdout.write(f"Запуск задачи #{job_id}")
+                            running[executor.submit(run_job, job_id)] = job_id
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        future.result()
+                        self.stdout.write(f"Задача #{job_id} завершена")
+                    except Exception as exc:
+                        # Падение процесса пула: задача не успела записать свой статус
+                        Job.objects.filter(pk=job_id, status=Job.State.RUNNING).update(
+                            status=Job.State.FAILED, finished_at=timezone.now(), error=f"Сбой воркера: {exc!r}",
+                        )
+                        self.stderr.write(f"Сбой воркера при выполнении задачи #{job_id}: {exc!r}")
+        except KeyboardInterrupt:
+            self.stdout.write("Остановка воркера, ожидание выполняющихся задач...")
+        finally:
+            executor.shutdown(wait=True)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from dds.models import SlowQuery
+from dds.slowlog import flush_slow_queries
+
+ORDERINGS = {
+    'total': '-total_ms',
+    'max': '-max_ms',
+    'count': '-count',
+    'avg': '-avg',
+}
+
+
+class Command(BaseCommand):
+    help = 'Вывод самых тяжелых запросов из журнала медленных запросов с планами выполнения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10, help='Количество выводимых запросов')
+        parser.add_argument('--order', choices=list(ORDERINGS), default='total',
+                            help='Сортировка: суммарное, максимальное, среднее время или количество')
+        parser.add_argument('--no-explain', action='store_true', help='Не выводить планы запросов')
+        parser.add_argument('--reset', action='store_true', help='Очистить журнал после вывода')
+
+    def handle(self, *args, **options):
+        flush_slow_queries()
+        queryset = SlowQuery.objects.annotate(avg=F('total_ms') / F('count')).order_by(ORDERINGS[options['order']])
+
+        for position, query in enumerate(queryset[:options['top']], start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"#{position}: {query.count} раз, всего {query.total_ms:.0f} мс, "
+                f"среднее {query.avg_ms:.1f} мс, макс. {query.max_ms:.1f} мс"
+            ))
+            self.stdout.write(f"Представление: {query.view or '-'}")
+            self.stdout.write(f"SQL: {query.sql}")
+            self.stdout.write(f"Параметры (самое медленное выполнение): {query.params}")
+            if query.explain and not options['no_explain']:
+                self.stdout.write("План:")
+                for line in query.explain.splitlines():
+                    self.stdout.write(f"    {line}")
+            self.stdout.write("")
+
+        if not queryset.exists():
+            self.stdout.write("Журнал медленных запросов пуст")
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f"✅ Журнал очищен ({deleted} записей)"))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+CHECKPOINT_MODES = ['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE']
+
+
+class Command(BaseCommand):
+    help = ('Обслуживание SQLite: PRAGMA optimize (обновление статистики планировщика) '
+            'и контрольная точка WAL (перенос журнала в файл БД)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Алиас подключения')
+        parser.add_argument('--checkpoint', choices=CHECKPOINT_MODES, default='TRUNCATE',
+                            help='Режим контрольной точки (по умолчанию TRUNCATE - журнал обрезается до нуля)')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Повторять каждые N секунд (по умолчанию - выполнить один раз)')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"Команда предназначена для SQLite, а подключение использует {connection.vendor}")
+
+        while True:
+            self.run_maintenance(connection, options['checkpoint'])
+            if options['interval'] is None:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def run_maintenance(self, connection, mode):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA optimize')
+            cursor.execute(f'PRAGMA wal_checkpoint({mode})')
+            busy, log_frames, checkpointed = cursor.fetchone()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if log_frames == -1:
+            self.stdout.write(f"PRAGMA optimize выполнен, БД не в режиме WAL ({elapsed_ms:.0f} мс)")
+        elif busy:
+            self.stdout.write(self.style.WARNING(
+                f"Контрольная точка не завершена: БД занята, перенесено {checkpointed} из {log_frames} страниц"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"PRAGMA optimize и контрольная точка {mode}: перенесено {checkpointed} из {log_frames} "
+                f"страниц журнала ({elapsed_ms:.0f} мс)"
+            ))
@@ -0,0 +1,235 @@
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+
+from .auditlog import audit_context, audit_log
+from .profiling import RequestProfiler
+from .slowlog import current_view, flush_slow_queries, logger as slowlog_logger
+
+try:
+    import brotli
+except ImportError:  # Необязательная зависимость: без нее ответы сжимаются только gzip
+    brotli = None
+
+# Сжимаются только ответы API и выгрузки: HTML-страницы с CSRF-токеном не сжимаются (атака BREACH)
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/vnd.oai.openapi', 'text/csv')
+
+
+class QueryCountMiddleware:
+    """
+    Заголовок X-DDS-Queries с числом SQL-запросов, выполненных при обработке запроса
+
+    Используется командой loadtest. Включается настройкой DDS_QUERY_COUNT_HEADER,
+    в выключенном состоянии middleware не подключается вовсе.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DDS_QUERY_COUNT_HEADER:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = {'queries': 0}
+
+        def count_queries(execute, sql, params, many, context):
+            counter['queries'] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            response = self.get_response(request)
+        response['X-DDS-Queries'] = str(counter['queries'])
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование запроса по запросу сотрудника (is_staff)
+
+    Включается параметром ?_profile=1 или заголовком X-DDS-Profile: 1 -
+    ответ возвращается как обычно, с заголовком X-DDS-Profile-Id для
+    скачивания профиля. Значение summary вместо ответа возвращает сводку.
+    Без параметра middleware только проверяет его наличие.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DDS_PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get('_profile') or request.headers.get('X-DDS-Profile')
+        if not mode or not (request.user.is_active and request.user.is_staff):
+            return self.get_response(request)
+
+        profiler = RequestProfiler()
+        response = profiler.run(self.get_response, request)
+        summary = profiler.summary(request, response)
+        profile_id = profiler.save(summary)
+
+        if mode == 'summary':
+            return JsonResponse({'profile_id': profile_id, **summary}, json_dumps_params={'ensure_ascii': False})
+        response['X-DDS-Profile-Id'] = profile_id
+        return response
+
+
+class SlowQueryMiddleware:
+    """
+    Привязка медленных SQL-запросов к представлению и сохранение журнала
+
+    Сама обертка запросов подключается к соединениям в DdsConfig.ready();
+    middleware указывает, какое представление выполняется, и после ответа
+    сохраняет накопленные записи. Отключается настройкой DDS_SLOW_QUERY_MS = None.
+    """
+
+    def __init__(self, get_response):
+        if settings.DDS_SLOW_QUERY_MS is None:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_view.set(request.path)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_view.reset(token)
+        try:
+            flush_slow_queries()
+        except Exception:
+            slowlog_logger.exception("Не удалось сохранить журнал медленных запросов")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        current_view.set(f"{match.view_name or match._func_path} ({request.method})")
+
+
+def negotiate_encoding(accept_encoding):
+    """Кодирование из Accept-Encoding с наибольшим q (при равенстве brotli лучше gzip); None - без сжатия"""
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name.strip()] = q
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best = None
+    for encoding in available:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+
+class AuditContextMiddleware:
+    """
+    Пользователь и источник (api/admin) для журнала изменений операций
+
+    Подключается после AuthenticationMiddleware; буфер сохраняет фоновый
+    поток, а при DDS_AUDIT_FLUSH_INTERVAL = None (тесты) - сам middleware после ответа.
+    Отключается настройкой DDS_AUDIT_ENABLED = False.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DDS_AUDIT_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        source = 'admin' if request.path.startswith(reverse('admin:index')) else 'api'
+        token = audit_context.set((request, source))
+        try:
+            response = self.get_response(request)
+        finally:
+            audit_context.reset(token)
+        if audit_log.flush_interval is None:
+            audit_log.flush()
+        return response
+
+
+class Compressor:
+    """Потоковое сжатие одним из поддерживаемых кодирований"""
+
+    def __init__(self, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=settings.DDS_BROTLI_QUALITY)
+            self.compress, self.finish = compressor.process, compressor.finish
+        else:
+            # wbits 16 + 15 - формат gzip
+            compressor = zlib.compressobj(settings.DDS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress, self.finish = compressor.compress, compressor.flush
+
+    def compress_all(self, data):
+        return self.compress(data) + self.finish()
+
+    def stream(self, chunks):
+        for chunk in chunks:
+            data = self.compress(chunk)
+            if data:
+                yield data
+        yield self.finish()
+
+    async def astream(self, chunks):
+        async for chunk in chunks:
+            data = self.compress(chunk)
+            if data:
+                yield data
+        yield self.finish()
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов API по Accept-Encoding: brotli (если установлен) или gzip
+
+    Обычные ответы меньше DDS_COMPRESSION_MIN_BYTES не сжимаются; потоковые
+    (NDJSON) сжимаются по мере отдачи. Server-Sent Events и HTML не
+    сжимаются. Включается настройкой DDS_COMPRESSION_MIN_BYTES (None - отключить).
+    """
+
+    def __init__(self, get_response):
+        if settings.DDS_COMPRESSION_MIN_BYTES is None:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding') or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < settings.DDS_COMPRESSION_MIN_BYTES:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressor = Compressor(encoding)
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compressor.astream(response.streaming_content)
+            else:
+                response.streaming_content = compressor.stream(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            compressed = compressor.compress_all(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # Сжатое представление не совпадает побайтно - сильный ETag становится слабым (RFC 9110)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
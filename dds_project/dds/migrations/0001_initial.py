@@ -0,0 +1,150 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:30
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoneyMovementTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_id', models.BigIntegerField(verbose_name='ID удаленной записи')),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удаленное движение денежных средств',
+                'verbose_name_plural': 'Удаленные движения денежных средств',
+                'ordering': ['deleted_at', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OperationType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Тип операции')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+            ],
+            options={
+                'verbose_name': 'Тип операции',
+                'verbose_name_plural': 'Типы операций',
+            },
+        ),
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True, verbose_name='Отпечаток')),
+                ('sql', models.TextField(verbose_name='Нормализованный SQL')),
+                ('example_sql', models.TextField(verbose_name='Пример запроса')),
+                ('params', models.TextField(blank=True, verbose_name='Параметры примера')),
+                ('view', models.CharField(blank=True, max_length=255, verbose_name='Представление')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('total_ms', models.FloatField(default=0, verbose_name='Суммарное время, мс')),
+                ('max_ms', models.FloatField(default=0, verbose_name='Максимальное время, мс')),
+                ('explain', models.TextField(blank=True, verbose_name='План запроса')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='Впервые')),
+                ('last_seen', models.DateTimeField(auto_now=True, verbose_name='Последний раз')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ['-total_ms'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Status',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Название статуса')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+            ],
+            options={
+                'verbose_name': 'Статус',
+                'verbose_name_plural': 'Статусы',
+            },
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='Тип задачи')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Параметры')),
+                ('source', models.FileField(blank=True, upload_to='jobs/sources/', verbose_name='Входной файл')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('succeeded', 'Выполнена'), ('failed', 'Ошибка'), ('cancelled', 'Отменена')], default='pending', max_length=20, verbose_name='Статус')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Прогресс, %')),
+                ('message', models.CharField(blank=True, max_length=255, verbose_name='Сообщение')),
+                ('result', models.FileField(blank=True, upload_to='jobs/results/', verbose_name='Результат')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='Запрошена отмена')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата запуска')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='dds_job_status_2caccf_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название категории')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('operation_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category', to='dds.operationtype', verbose_name='Тип операции')),
+            ],
+            options={
+                'verbose_name': 'Категория',
+                'verbose_name_plural': 'Категории',
+                'unique_together': {('name', 'operation_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Subcategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название подкатегории')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subcategory', to='dds.category', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Подкатегория',
+                'verbose_name_plural': 'Подкатегории',
+                'unique_together': {('name', 'category')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MoneyMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата создания')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15, validators=[django.core.validators.MinValueValidator(0.01)], verbose_name='Сумма')),
+                ('comment', models.TextField(blank=True, verbose_name='Комментарий')),
+                ('created_day', models.DateField(db_index=True, editable=False, verbose_name='День операции')),
+                ('created_month', models.DateField(db_index=True, editable=False, verbose_name='Месяц операции')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления записи')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения записи')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='dds.category', verbose_name='Категория')),
+                ('operation_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='dds.operationtype', verbose_name='Тип операции')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='dds.status', verbose_name='Статус')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='dds.subcategory', verbose_name='Подкатегория')),
+            ],
+            options={
+                'verbose_name': 'Движение денежных средств',
+                'verbose_name_plural': 'Движения денежных средств',
+                'ordering': ['-created_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Cast, Round
+
+import dds.fields
+
+
+def decimal_to_minor_units(apps, schema_editor):
+    """Перевод сумм в копейки одним UPDATE без загрузки строк в Python"""
+    MoneyMovement = apps.get_model('dds', 'MoneyMovement')
+    MoneyMovement.objects.using(schema_editor.connection.alias).update(
+        amount_minor=Cast(Round(F('amount') * 100), models.BigIntegerField())
+    )
+
+
+def minor_units_to_decimal(apps, schema_editor):
+    MoneyMovement = apps.get_model('dds', 'MoneyMovement')
+    # Умножение на 0.01, а не деление на 100: в SQLite целое / целое отбрасывает копейки
+    MoneyMovement.objects.using(schema_editor.connection.alias).update(
+        amount=Cast(F('amount_minor'), models.DecimalField(max_digits=15, decimal_places=2)) * Decimal('0.01')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moneymovement',
+            name='amount_minor',
+            field=models.BigIntegerField(null=True),
+        ),
+        # Старая колонка временно допускает NULL, чтобы миграцию можно было откатить
+        migrations.AlterField(
+            model_name='moneymovement',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=15, null=True, verbose_name='Сумма'),
+        ),
+        migrations.RunPython(decimal_to_minor_units, minor_units_to_decimal),
+        migrations.RemoveField(
+            model_name='moneymovement',
+            name='amount',
+        ),
+        migrations.RenameField(
+            model_name='moneymovement',
+            old_name='amount_minor',
+            new_name='amount',
+        ),
+        migrations.AlterField(
+            model_name='moneymovement',
+            name='amount',
+            field=dds.fields.MoneyField(decimal_places=2, max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Сумма'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+import hashlib
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+
+FINGERPRINT_BATCH_SIZE = 1000
+
+
+def movement_fingerprint(created_date, amount, status_id, operation_type_id, category_id, subcategory_id, comment):
+    """Копия dds.models.movement_fingerprint на момент миграции: изменения модели ее не затрагивают"""
+    if timezone.is_aware(created_date):
+        created_date = timezone.localtime(created_date, timezone.get_default_timezone())
+    normalized = [
+        created_date.date().isoformat(),
+        str(Decimal(amount).quantize(Decimal('0.01'))),
+        str(status_id), str(operation_type_id), str(category_id), str(subcategory_id),
+        ' '.join((comment or '').split()).casefold(),
+    ]
+    return hashlib.sha1('\x1f'.join(normalized).encode('utf-8')).hexdigest()
+
+
+def fill_fingerprints(apps, schema_editor):
+    """Заполнение отпечатков существующих операций пакетами"""
+    MoneyMovement = apps.get_model('dds', 'MoneyMovement')
+    movements = MoneyMovement.objects.using(schema_editor.connection.alias)
+    batch = []
+    for obj in movements.iterator(chunk_size=FINGERPRINT_BATCH_SIZE):
+        obj.fingerprint = movement_fingerprint(
+            obj.created_date, obj.amount, obj.status_id, obj.operation_type_id,
+            obj.category_id, obj.subcategory_id, obj.comment,
+        )
+        batch.append(obj)
+        if len(batch) >= FINGERPRINT_BATCH_SIZE:
+            movements.bulk_update(batch, ['fingerprint'])
+            batch = []
+    if batch:
+        movements.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0002_money_movement_amount_minor_units'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moneymovement',
+            name='fingerprint',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=40, verbose_name='Отпечаток содержимого'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+    ]
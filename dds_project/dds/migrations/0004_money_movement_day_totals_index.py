@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0003_money_movement_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moneymovement',
+            index=models.Index(fields=['created_day', 'operation_type', 'amount'], name='dds_movement_day_totals_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:56
+
+import dds.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_existing_buckets(apps, schema_editor):
+    """Сводки для существующих операций создаются устаревшими и рассчитываются при первом запросе"""
+    MoneyMovement = apps.get_model('dds', 'MoneyMovement')
+    MovementStatsBucket = apps.get_model('dds', 'MovementStatsBucket')
+    alias = schema_editor.connection.alias
+    keys = MoneyMovement.objects.using(alias).order_by().values_list(
+        'category_id', 'subcategory_id', 'created_month',
+    ).distinct()
+    MovementStatsBucket.objects.using(alias).bulk_create(
+        [MovementStatsBucket(category_id=category_id, subcategory_id=subcategory_id, month=month, dirty=True)
+         for category_id, subcategory_id, month in keys],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0004_money_movement_day_totals_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovementStatsBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Число операций')),
+                ('total', dds.fields.MoneyField(decimal_places=2, default=0, max_digits=15, verbose_name='Сумма')),
+                ('sketch', models.JSONField(default=dict, verbose_name='Эскиз квантилей')),
+                ('top', models.JSONField(default=list, verbose_name='Наибольшие суммы')),
+                ('dirty', models.BooleanField(db_index=True, default=False, verbose_name='Требует пересчета')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.category', verbose_name='Категория')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.subcategory', verbose_name='Подкатегория')),
+            ],
+            options={
+                'verbose_name': 'Сводка распределения сумм',
+                'verbose_name_plural': 'Сводки распределения сумм',
+                'constraints': [models.UniqueConstraint(fields=('category', 'subcategory', 'month'), name='dds_stats_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(mark_existing_buckets, migrations.RunPython.noop),
+    ]
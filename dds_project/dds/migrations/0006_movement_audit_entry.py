@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:04
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0005_movement_stats_bucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovementAuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_id', models.BigIntegerField(verbose_name='ID операции')),
+                ('action', models.CharField(choices=[('created', 'Создание'), ('updated', 'Изменение'), ('deleted', 'Удаление')], max_length=10, verbose_name='Действие')),
+                ('username', models.CharField(blank=True, max_length=150, verbose_name='Имя пользователя')),
+                ('source', models.CharField(max_length=50, verbose_name='Источник')),
+                ('changes', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Изменения')),
+                ('created_at', models.DateTimeField(db_index=True, verbose_name='Дата изменения')),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Изменение операции',
+                'verbose_name_plural': 'Журнал изменений операций',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['movement_id', 'id'], name='dds_movemen_movemen_9f1be7_idx'), models.Index(fields=['user', 'id'], name='dds_movemen_user_id_02cc33_idx')],
+            },
+        ),
+    ]
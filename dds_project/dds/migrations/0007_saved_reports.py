@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:14
+
+import dds.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0006_movement_audit_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Название')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('filters', models.JSONField(blank=True, default=dict, verbose_name='Фильтры')),
+                ('group_by', models.JSONField(blank=True, default=list, verbose_name='Группировка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата пересчета')),
+            ],
+            options={
+                'verbose_name': 'Сохраненный отчет',
+                'verbose_name_plural': 'Сохраненные отчеты',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SavedReportRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200, verbose_name='Ключ группы')),
+                ('month', models.DateField(blank=True, null=True, verbose_name='Месяц')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Число операций')),
+                ('total', dds.fields.MoneyField(decimal_places=2, default=0, max_digits=15, verbose_name='Сумма')),
+                ('dirty', models.BooleanField(default=False, verbose_name='Требует пересчета')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.category', verbose_name='Категория')),
+                ('operation_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.operationtype', verbose_name='Тип операции')),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='dds.savedreport', verbose_name='Отчет')),
+                ('status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.status', verbose_name='Статус')),
+                ('subcategory', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dds.subcategory', verbose_name='Подкатегория')),
+            ],
+            options={
+                'verbose_name': 'Строка сохраненного отчета',
+                'verbose_name_plural': 'Строки сохраненных отчетов',
+                'constraints': [models.UniqueConstraint(fields=('report', 'key'), name='dds_report_row_unique')],
+            },
+        ),
+    ]
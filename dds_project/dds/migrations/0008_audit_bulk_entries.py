@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0007_saved_reports'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movementauditentry',
+            name='rows',
+            field=models.PositiveIntegerField(default=1, verbose_name='Число операций'),
+        ),
+        migrations.AlterField(
+            model_name='movementauditentry',
+            name='action',
+            field=models.CharField(choices=[('created', 'Создание'), ('updated', 'Изменение'), ('deleted', 'Удаление'), ('bulk', 'Массовое изменение')], max_length=10, verbose_name='Действие'),
+        ),
+        migrations.AlterField(
+            model_name='movementauditentry',
+            name='movement_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='ID операции'),
+        ),
+    ]
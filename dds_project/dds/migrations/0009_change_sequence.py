@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    """Строка счетчика заранее: первое изменение не должно создавать ее параллельно с другим"""
+    ChangeSequence = apps.get_model('dds', 'ChangeSequence')
+    ChangeSequence.objects.using(schema_editor.connection.alias).get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds', '0008_audit_bulk_entries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Последний номер')),
+            ],
+            options={
+                'verbose_name': 'Счетчик изменений',
+                'verbose_name_plural': 'Счетчики изменений',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='moneymovementtombstone',
+            options={'ordering': ['change_seq', 'id'], 'verbose_name': 'Удаленное движение денежных средств', 'verbose_name_plural': 'Удаленные движения денежных средств'},
+        ),
+        migrations.AddField(
+            model_name='moneymovement',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Номер изменения'),
+        ),
+        migrations.AddField(
+            model_name='moneymovement',
+            name='created_seq',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Номер создания'),
+        ),
+        migrations.AddField(
+            model_name='moneymovementtombstone',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Номер изменения'),
+        ),
+        migrations.RunPython(create_sequence, migrations.RunPython.noop),
+    ]
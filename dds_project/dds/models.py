@@ -1,8 +1,16 @@
-from django.db import models
+import hashlib
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, models, router, transaction
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from .fields import MoneyField
+
 
 class Status(models.Model):
     """Модель статусов операций"""
@@ -62,6 +70,221 @@ class Subcategory(models.Model):
         return f"{self.name} ({self.category})"
 
 
+def date_buckets(value):
+    """День и первый день месяца для даты операции в часовом поясе проекта"""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value, timezone.get_default_timezone())
+    day = value.date()
+    return day, day.replace(day=1)
+
+
+# Поля, из которых строится отпечаток содержимого операции (имена полей и колонок)
+FINGERPRINT_FIELDS = ['created_date', 'amount', 'status', 'operation_type', 'category', 'subcategory', 'comment']
+FINGERPRINT_SOURCES = {*FINGERPRINT_FIELDS, 'status_id', 'operation_type_id', 'category_id', 'subcategory_id'}
+# Отметка строк, отпечаток которых пересчитывается после массового update()
+PENDING_FINGERPRINT = ''
+# Поля, от которых зависят сводки распределения сумм (MovementStatsBucket)
+STATS_SOURCES = {'created_date', 'amount', 'category', 'category_id', 'subcategory', 'subcategory_id'}
+# Измерения группировки сохраненных отчетов (SavedReport.group_by) в порядке ключа строки
+REPORT_DIMENSIONS = ['operation_type', 'category', 'subcategory', 'status', 'month']
+# Колонки операции, от которых зависит попадание в группу сохраненного отчета
+REPORT_STATE_FIELDS = ['status_id', 'operation_type_id', 'category_id', 'subcategory_id', 'created_day', 'created_month']
+# Поля операции, изменения которых попадают в журнал изменений (имена колонок)
+TRACKED_FIELDS = ['created_date', 'status_id', 'operation_type_id', 'category_id', 'subcategory_id', 'amount', 'comment']
+
+
+def movement_fingerprint(created_date, amount, status_id, operation_type_id, category_id, subcategory_id, comment):
+    """
+    Нормализованный отпечаток содержимого операции для поиска дубликатов
+
+    Дата берется с точностью до дня, сумма - с двумя знаками, в комментарии
+    не учитываются регистр и лишние пробелы: так совпадают строки одной
+    банковской выписки, загруженные повторно.
+    """
+    day, _ = date_buckets(created_date)
+    normalized = [
+        day.isoformat(),
+        str(Decimal(amount).quantize(Decimal('0.01'))),
+        str(status_id), str(operation_type_id), str(category_id), str(subcategory_id),
+        ' '.join((comment or '').split()).casefold(),
+    ]
+    return hashlib.sha1('\x1f'.join(normalized).encode('utf-8')).hexdigest()
+
+
+class MoneyMovementQuerySet(models.QuerySet):
+    """
+    QuerySet операций ДДС, поддерживающий вычисляемые колонки
+
+    Массовые операции обходят save(), поэтому created_day/created_month и
+    отпечаток содержимого (fingerprint) заполняются здесь, сводки
+    распределения сумм и группы сохраненных отчетов обновляются или
+    помечаются устаревшими, а изменения передаются в журнал изменений.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .auditlog import record_created, tracked_values
+        from .reports import mark_reports_dirty
+        from .stats import mark_dirty, record_movements, stats_key
+
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            change_seq = next_change_seq(self.db)
+            for obj in objs:
+                obj.fill_date_buckets()
+                obj.fill_fingerprint()
+                obj.change_seq = obj.created_seq = change_seq
+            created = super().bulk_create(objs, *args, **kwargs)
+        # Без ID (ignore_conflicts) неизвестно, какие строки вставлены, - сводки пересчитаются
+        record_movements([obj for obj in objs if obj.pk is not None], self.db)
+        mark_dirty((stats_key(obj) for obj in objs if obj.pk is None), self.db)
+        record_created([obj for obj in objs if obj.pk is not None], self.db)
+        mark_reports_dirty((tracked_values(obj) for obj in objs), self.db)
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        from .auditlog import audit_enabled, object_changes_recorded, record_changes
+
+        objs = list(objs)
+        if objs and 'change_seq' not in fields:
+            # Любое изменение попадает в ленту: один номер на все строки, выделенный в транзакции записи
+            now = timezone.now()
+            with transaction.atomic(using=self.db):
+                change_seq = next_change_seq(self.db)
+                for obj in objs:
+                    obj.updated_at, obj.change_seq = now, change_seq
+                fields = [*fields, *(name for name in ('updated_at', 'change_seq') if name not in fields)]
+                return self.bulk_update(objs, fields, *args, **kwargs)
+        if 'created_date' in fields:
+            for obj in objs:
+                obj.fill_date_buckets()
+            fields = [*fields, 'created_day', 'created_month']
+        if FINGERPRINT_SOURCES.intersection(fields):
+            for obj in objs:
+                obj.fill_fingerprint()
+            fields = [*fields, 'fingerprint']
+        attnames = {self.model._meta.get_field(name).attname for name in fields}
+        tracked = [name for name in TRACKED_FIELDS if name in attnames]
+        if not tracked or not audit_enabled(self.db):
+            return super().bulk_update(objs, fields, *args, **kwargs)
+
+        # Журнал по каждой операции: прежние значения читаются порциями, новые берутся из объектов.
+        # Сводки и отчеты обновляет update(), через который выполняется bulk_update()
+        updated = 0
+        token = object_changes_recorded.set(True)
+        try:
+            with transaction.atomic(using=self.db):
+                for start in range(0, len(objs), settings.DDS_AUDIT_BATCH_SIZE):
+                    chunk = objs[start:start + settings.DDS_AUDIT_BATCH_SIZE]
+                    before = self.model._default_manager.using(self.db).filter(
+                        pk__in=[obj.pk for obj in chunk]).tracked_values()
+                    updated += super().bulk_update(chunk, fields, *args, **kwargs)
+                    after = {obj.pk: {name: getattr(obj, name) for name in tracked} for obj in chunk}
+                    record_changes(before, after, self.db)
+        finally:
+            object_changes_recorded.reset(token)
+        return updated
+
+    def update(self, **kwargs):
+        if 'change_seq' not in kwargs:
+            # Любое изменение попадает в ленту: номер выделяется в той же транзакции, что и UPDATE
+            kwargs.setdefault('updated_at', timezone.now())
+            with transaction.atomic(using=self.db):
+                return self.update(change_seq=next_change_seq(self.db), **kwargs)
+        if 'created_date' in kwargs and 'created_day' not in kwargs and isinstance(kwargs['created_date'], datetime):
+            kwargs['created_day'], kwargs['created_month'] = date_buckets(kwargs['created_date'])
+        if not FINGERPRINT_SOURCES.intersection(kwargs):
+            return super().update(**kwargs)
+        # Выражения (F(), функции) и поля отпечатка: колонки пересчитываются по фактическим значениям.
+        # bulk_update() передает уже посчитанные created_day/created_month и fingerprint
+        refill_buckets = 'created_date' in kwargs and 'created_day' not in kwargs
+        refill_fingerprints = 'fingerprint' not in kwargs
+        refill_stats = bool(STATS_SOURCES.intersection(kwargs))
+        from .auditlog import previous_values, record_bulk_update
+        from .reports import mark_reports_dirty, report_definitions
+
+        with transaction.atomic(using=self.db):
+            if refill_fingerprints:
+                # Измененные строки отмечаются в том же UPDATE - их пересчет не требует списка ID
+                kwargs['fingerprint'] = PENDING_FINGERPRINT
+                changed = self.model._default_manager.using(self.db).filter(fingerprint=PENDING_FINGERPRINT)
+            else:
+                changed = self
+            # Отчетам нужны только различающиеся группы строк, а не значения каждой строки;
+            # журналу - прежние значения изменяемых полей каждой строки
+            definitions = report_definitions(self.db)
+            before = self.report_states() if definitions else None
+            stale = self.stats_keys() if refill_stats else set()
+            previous = previous_values(self, kwargs)
+            updated = super().update(**kwargs)
+            if refill_buckets:
+                changed.fill_date_buckets()
+            if refill_stats:
+                from .stats import mark_dirty
+                mark_dirty(stale | changed.stats_keys(), self.db)
+            if before is not None:
+                mark_reports_dirty([*before, *changed.report_states()], self.db, definitions)
+            record_bulk_update(previous, self.db)
+            if refill_fingerprints:
+                changed.fill_fingerprints()
+        return updated
+
+    update.alters_data = True
+
+    def _refill(self, source_fields, compute, target_fields, batch_size):
+        """
+        Пересчет вычисляемых колонок порциями по возрастанию ID
+
+        compute(*значения source_fields) возвращает значения target_fields.
+        Порция читается отдельным запросом (без списка всех ID и без записи во
+        время чтения курсора), а записывается одним executemany с UPDATE по ID:
+        CASE из bulk_update() на порцию в тысячу строк в SQLite заметно медленнее.
+        """
+        connection = connections[self.db]
+        meta = self.model._meta
+        fields = [meta.get_field(name) for name in target_fields]
+        quote = connection.ops.quote_name
+        sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+            quote(meta.db_table), ', '.join(f'{quote(field.column)} = %s' for field in fields), quote(meta.pk.column),
+        )
+        queryset = self.order_by('pk').values_list('pk', *source_fields)
+        last_pk = None
+        while True:
+            batch = list((queryset if last_pk is None else queryset.filter(pk__gt=last_pk))[:batch_size])
+            if not batch:
+                return
+            params = [
+                [*(field.get_db_prep_save(value, connection) for field, value in zip(fields, compute(*values))), pk]
+                for pk, *values in batch
+            ]
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+            last_pk = batch[-1][0]
+
+    def fill_date_buckets(self, batch_size=1000):
+        """Пересчет created_day/created_month (например, для заполнения существующих записей)"""
+        self._refill(['created_date'], date_buckets, ['created_day', 'created_month'], batch_size)
+
+    fill_date_buckets.alters_data = True
+
+    def fill_fingerprints(self, batch_size=1000):
+        """Пересчет отпечатков содержимого (например, для заполнения существующих записей)"""
+        self._refill(FINGERPRINT_FIELDS, lambda *values: [movement_fingerprint(*values)], ['fingerprint'], batch_size)
+
+    fill_fingerprints.alters_data = True
+
+    def tracked_values(self, fields=TRACKED_FIELDS):
+        """Значения полей журнала изменений для строк выборки: {ID: {поле: значение}}"""
+        return {row.pop('pk'): row for row in self.order_by().values('pk', *fields)}
+
+    def report_states(self):
+        """Различающиеся значения REPORT_STATE_FIELDS строк выборки - группы сохраненных отчетов"""
+        return list(self.order_by().values(*REPORT_STATE_FIELDS).distinct())
+
+    def stats_keys(self):
+        """Ключи сводок распределения сумм (категория, подкатегория, месяц) для строк выборки"""
+        return set(self.order_by().values_list('category_id', 'subcategory_id', 'created_month').distinct())
+
+
 class MoneyMovement(models.Model):
     """Основная модель - движение денежных средств"""
     created_date = models.DateTimeField(default=timezone.now, verbose_name="Дата создания",
@@ -84,20 +307,37 @@ class MoneyMovement(models.Model):
                                     null=False,
                                     blank=False
                                     )
-    amount = models.DecimalField(
+    # Хранится в копейках (целое число), в Python - Decimal с двумя знаками
+    amount = MoneyField(
         max_digits=15,
         decimal_places=2,
-        validators=[MinValueValidator(0.01)],  # Валидация минимальной суммы
+        validators=[MinValueValidator(Decimal('0.01'))],  # Валидация минимальной суммы
         verbose_name="Сумма",
         null=False,
         blank=False
     )
     comment = models.TextField(blank=True, verbose_name="Комментарий")
+    # Денормализованные колонки для индексируемой фильтрации и группировки по дням и месяцам
+    created_day = models.DateField(db_index=True, editable=False, verbose_name="День операции")
+    created_month = models.DateField(db_index=True, editable=False, verbose_name="Месяц операции")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата добавления записи")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Дата изменения записи")
+    # Отпечаток содержимого (дата, сумма, справочники, комментарий) для поиска дубликатов
+    fingerprint = models.CharField(max_length=40, db_index=True, editable=False, verbose_name="Отпечаток содержимого")
+    # Номера последнего изменения и создания записи для ленты изменений (см. ChangeSequence)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False, verbose_name="Номер изменения")
+    created_seq = models.BigIntegerField(default=0, editable=False, verbose_name="Номер создания")
+
+    objects = MoneyMovementQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Движение денежных средств"
         verbose_name_plural = "Движения денежных средств"
         ordering = ['-created_date']  # Сортировка по дате создания (новые сверху)
+        indexes = [
+            # Покрывающий индекс для рядов графиков: суммы по дням читаются без обращения к таблице
+            models.Index(fields=['created_day', 'operation_type', 'amount'], name='dds_movement_day_totals_idx'),
+        ]
 
     def clean(self):
         """Серверная валидация бизнес-правил"""
@@ -115,11 +355,281 @@ class MoneyMovement(models.Model):
                     'subcategory': 'Подкатегория должна принадлежать выбранной категории.'
                 })
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Значения на момент загрузки: по ним журнал изменений и сводки узнают прежнее состояние без запроса
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def loaded_values(self):
+        """Значения полей журнала изменений в БД до сохранения (из загрузки или отдельным запросом)"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is not None and all(name in loaded for name in TRACKED_FIELDS):
+            return {name: loaded[name] for name in TRACKED_FIELDS}
+        return type(self)._default_manager.db_manager(self._state.db).filter(pk=self.pk).tracked_values().get(self.pk)
+
+    def fill_date_buckets(self):
+        """Заполнение колонок created_day/created_month по дате операции"""
+        if self.created_date is not None:
+            self.created_day, self.created_month = date_buckets(self.created_date)
+
+    def fill_fingerprint(self):
+        """Заполнение отпечатка содержимого по текущим значениям полей"""
+        if self.created_date is not None and self.amount is not None:
+            self.fingerprint = movement_fingerprint(
+                self.created_date, self.amount, self.status_id, self.operation_type_id,
+                self.category_id, self.subcategory_id, self.comment,
+            )
+
     def save(self, *args, **kwargs):
         """Переопределение save для гарантии выполнения валидации"""
 
+        self.fill_date_buckets()
+        self.fill_fingerprint()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'created_date' in update_fields:
+                update_fields |= {'created_day', 'created_month'}
+            if FINGERPRINT_SOURCES.intersection(update_fields):
+                update_fields.add('fingerprint')
+            if 'updated_at' in update_fields:
+                update_fields.add('change_seq')
+            kwargs['update_fields'] = update_fields
         self.full_clean()
-        super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            if update_fields is None or 'change_seq' in update_fields:
+                self.change_seq = next_change_seq(using)
+                if self._state.adding:
+                    self.created_seq = self.change_seq
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.created_date.strftime('%d.%m.%Y')} - {self.amount} руб. - {self.status}"
+
+
+class ChangeSequence(models.Model):
+    """
+    Счетчик номеров изменений для ленты синхронизации
+
+    Номер выделяется обновлением единственной строки внутри транзакции,
+    которая пишет изменение. Блокировка строки держится до фиксации, поэтому
+    номера фиксируются строго по возрастанию - в отличие от времени
+    изменения, которое берется из часов приложения до фиксации.
+    """
+    value = models.BigIntegerField(default=0, verbose_name="Последний номер")
+
+    class Meta:
+        verbose_name = "Счетчик изменений"
+        verbose_name_plural = "Счетчики изменений"
+
+    def __str__(self):
+        return str(self.value)
+
+
+def next_change_seq(using=DEFAULT_DB_ALIAS):
+    """Следующий номер изменения; вызывается внутри транзакции, которая пишет изменение"""
+    sequence = ChangeSequence.objects.using(using)
+    if not sequence.filter(pk=1).update(value=models.F('value') + 1):
+        return sequence.create(pk=1, value=1).value
+    return sequence.values_list('value', flat=True).get(pk=1)
+
+
+class MoneyMovementTombstone(models.Model):
+    """Журнал удалений движений денежных средств для инкрементальной синхронизации"""
+    movement_id = models.BigIntegerField(verbose_name="ID удаленной записи")
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Дата удаления")
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False, verbose_name="Номер изменения")
+
+    class Meta:
+        verbose_name = "Удаленное движение денежных средств"
+        verbose_name_plural = "Удаленные движения денежных средств"
+        ordering = ['change_seq', 'id']
+
+    def __str__(self):
+        return f"#{self.movement_id} удалено {self.deleted_at.strftime('%d.%m.%Y %H:%M')}"
+
+
+class MovementStatsBucket(models.Model):
+    """
+    Сводка распределения сумм операций за месяц по подкатегории
+
+    Эскиз квантилей и наибольшие суммы обновляются при добавлении операций;
+    изменение или удаление помечает сводку устаревшей (dirty), и она
+    пересчитывается по операциям месяца при следующем запросе статистики.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+', verbose_name="Категория")
+    subcategory = models.ForeignKey(Subcategory, on_delete=models.CASCADE, related_name='+',
+                                    verbose_name="Подкатегория")
+    month = models.DateField(verbose_name="Месяц")
+    count = models.PositiveIntegerField(default=0, verbose_name="Число операций")
+    total = MoneyField(max_digits=15, decimal_places=2, default=0, verbose_name="Сумма")
+    sketch = models.JSONField(default=dict, verbose_name="Эскиз квантилей")
+    top = models.JSONField(default=list, verbose_name="Наибольшие суммы")
+    dirty = models.BooleanField(default=False, db_index=True, verbose_name="Требует пересчета")
+
+    class Meta:
+        verbose_name = "Сводка распределения сумм"
+        verbose_name_plural = "Сводки распределения сумм"
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'subcategory', 'month'], name='dds_stats_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.subcategory_id} за {self.month.strftime('%m.%Y')}: {self.count}"
+
+
+class SavedReport(models.Model):
+    """
+    Сохраненный отчет: фильтры списка операций и группировка
+
+    Результат хранится в SavedReportRow. Изменение операций в пределах
+    фильтров помечает затронутые группы устаревшими, и пересчитываются только
+    они; refreshed_at - время последнего пересчета.
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="Название")
+    description = models.TextField(blank=True, verbose_name="Описание")
+    # Очищенные параметры MoneyMovementFilter: ID справочников и границы периода (YYYY-MM-DD)
+    filters = models.JSONField(default=dict, blank=True, verbose_name="Фильтры")
+    group_by = models.JSONField(default=list, blank=True, verbose_name="Группировка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    refreshed_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата пересчета")
+
+    class Meta:
+        verbose_name = "Сохраненный отчет"
+        verbose_name_plural = "Сохраненные отчеты"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class SavedReportRow(models.Model):
+    """Строка результата сохраненного отчета: одна группа, число и сумма операций"""
+    report = models.ForeignKey(SavedReport, on_delete=models.CASCADE, related_name='rows', verbose_name="Отчет")
+    # Значения измерений группировки через "|" в порядке REPORT_DIMENSIONS
+    key = models.CharField(max_length=200, verbose_name="Ключ группы")
+    operation_type = models.ForeignKey(OperationType, on_delete=models.CASCADE, null=True, blank=True,
+                                       related_name='+', verbose_name="Тип операции")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                                 verbose_name="Категория")
+    subcategory = models.ForeignKey(Subcategory, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                                    verbose_name="Подкатегория")
+    status = models.ForeignKey(Status, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                               verbose_name="Статус")
+    month = models.DateField(null=True, blank=True, verbose_name="Месяц")
+    count = models.PositiveIntegerField(default=0, verbose_name="Число операций")
+    total = MoneyField(max_digits=15, decimal_places=2, default=0, verbose_name="Сумма")
+    dirty = models.BooleanField(default=False, verbose_name="Требует пересчета")
+
+    class Meta:
+        verbose_name = "Строка сохраненного отчета"
+        verbose_name_plural = "Строки сохраненных отчетов"
+        constraints = [
+            models.UniqueConstraint(fields=['report', 'key'], name='dds_report_row_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.report_id}: {self.key or 'итого'}"
+
+
+class MovementAuditEntry(models.Model):
+    """Запись журнала изменений операции: кто, когда и какие поля изменил"""
+
+    class Action(models.TextChoices):
+        CREATED = 'created', 'Создание'
+        UPDATED = 'updated', 'Изменение'
+        DELETED = 'deleted', 'Удаление'
+        BULK = 'bulk', 'Массовое изменение'
+
+    # Без внешнего ключа: записи об удаленных операциях сохраняются. У массового изменения (bulk) - пусто
+    movement_id = models.BigIntegerField(null=True, blank=True, verbose_name="ID операции")
+    rows = models.PositiveIntegerField(default=1, verbose_name="Число операций")
+    action = models.CharField(max_length=10, choices=Action.choices, verbose_name="Действие")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                             db_constraint=False, related_name='+', verbose_name="Пользователь")
+    username = models.CharField(max_length=150, blank=True, verbose_name="Имя пользователя")
+    source = models.CharField(max_length=50, verbose_name="Источник")
+    # {поле: [было, стало]}
+    changes = models.JSONField(encoder=DjangoJSONEncoder, verbose_name="Изменения")
+    created_at = models.DateTimeField(db_index=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Изменение операции"
+        verbose_name_plural = "Журнал изменений операций"
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['movement_id', 'id']),
+            models.Index(fields=['user', 'id']),
+        ]
+
+    def __str__(self):
+        target = f"#{self.movement_id}" if self.movement_id is not None else f"{self.rows} операций"
+        return f"{target} {self.get_action_display()} ({self.created_at.strftime('%d.%m.%Y %H:%M')})"
+
+
+class Job(models.Model):
+    """Фоновая задача (выгрузка, загрузка, пересчет), выполняемая воркером run_jobs"""
+
+    class State(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        RUNNING = 'running', 'Выполняется'
+        SUCCEEDED = 'succeeded', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+        CANCELLED = 'cancelled', 'Отменена'
+
+    kind = models.CharField(max_length=50, verbose_name="Тип задачи")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Параметры")
+    source = models.FileField(upload_to='jobs/sources/', blank=True, verbose_name="Входной файл")
+    status = models.CharField(max_length=20, choices=State.choices, default=State.PENDING,
+                              verbose_name="Статус")
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name="Прогресс, %")
+    message = models.CharField(max_length=255, blank=True, verbose_name="Сообщение")
+    result = models.FileField(upload_to='jobs/results/', blank=True, verbose_name="Результат")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    cancel_requested = models.BooleanField(default=False, verbose_name="Запрошена отмена")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата запуска")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата завершения")
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    @property
+    def is_finished(self):
+        return self.status in (self.State.SUCCEEDED, self.State.FAILED, self.State.CANCELLED)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.get_status_display()})"
+
+
+class SlowQuery(models.Model):
+    """Медленный SQL-запрос, сгруппированный по нормализованному тексту (отпечатку)"""
+    fingerprint = models.CharField(max_length=40, unique=True, verbose_name="Отпечаток")
+    sql = models.TextField(verbose_name="Нормализованный SQL")
+    example_sql = models.TextField(verbose_name="Пример запроса")
+    params = models.TextField(blank=True, verbose_name="Параметры примера")
+    view = models.CharField(max_length=255, blank=True, verbose_name="Представление")
+    count = models.PositiveIntegerField(default=0, verbose_name="Количество")
+    total_ms = models.FloatField(default=0, verbose_name="Суммарное время, мс")
+    max_ms = models.FloatField(default=0, verbose_name="Максимальное время, мс")
+    explain = models.TextField(blank=True, verbose_name="План запроса")
+    first_seen = models.DateTimeField(auto_now_add=True, verbose_name="Впервые")
+    last_seen = models.DateTimeField(auto_now=True, verbose_name="Последний раз")
+
+    class Meta:
+        verbose_name = "Медленный запрос"
+        verbose_name_plural = "Медленные запросы"
+        ordering = ['-total_ms']
+
+    @property
+    def avg_ms(self):
+        return self.total_ms / self.count if self.count else 0
+
+    def __str__(self):
+        return f"{self.sql[:80]} ({self.count} раз, макс. {self.max_ms:.0f} мс)"
@@ -0,0 +1,114 @@
+import cProfile
+import json
+import os
+import pstats
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import FileResponse, Http404, JsonResponse
+
+PROFILE_ID_LENGTH = 32
+SUMMARY_FUNCTIONS = 40
+
+
+class RequestProfiler:
+    """
+    Профилирование одного запроса: дерево вызовов Python (cProfile)
+    и все SQL-запросы с длительностями по всем подключениям к БД
+    """
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.queries = []
+        self.elapsed = 0.0
+
+    def _record_query(self, alias):
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.queries.append({
+                    'alias': alias,
+                    'sql': sql,
+                    'params': repr(params)[:500],
+                    'many': many,
+                    'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                })
+        return wrapper
+
+    def run(self, func, *args):
+        """Выполнение func(*args) под профилировщиком"""
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self._record_query(alias)))
+            started = time.perf_counter()
+            try:
+                return self.profile.runcall(func, *args)
+            finally:
+                self.elapsed = time.perf_counter() - started
+
+    def summary(self, request, response):
+        """Сводка: самые дорогие функции по суммарному времени и SQL-запросы"""
+        stats = pstats.Stats(self.profile)
+        functions = []
+        for (filename, line, name), (cc, nc, tt, ct, callers) in stats.stats.items():
+            functions.append({
+                'function': f"{name} ({filename}:{line})",
+                'calls': nc,
+                'own_ms': round(tt * 1000, 3),
+                'cumulative_ms': round(ct * 1000, 3),
+                'callers': sorted(f"{c_name} ({c_file}:{c_line})" for c_file, c_line, c_name in callers)[:5],
+            })
+        functions.sort(key=lambda item: item['cumulative_ms'], reverse=True)
+        return {
+            'path': request.get_full_path(),
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(self.elapsed * 1000, 3),
+            'sql_count': len(self.queries),
+            'sql_total_ms': round(sum(q['duration_ms'] for q in self.queries), 3),
+            'functions': functions[:SUMMARY_FUNCTIONS],
+            'queries': sorted(self.queries, key=lambda q: q['duration_ms'], reverse=True),
+        }
+
+    def save(self, summary):
+        """Сохранение профиля (.prof для pstats/snakeviz) и сводки (.json); возвращает ID"""
+        directory = Path(settings.DDS_PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        profile_id = uuid.uuid4().hex
+        self.profile.dump_stats(directory / f"{profile_id}.prof")
+        with open(directory / f"{profile_id}.json", 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        prune_profiles(directory, settings.DDS_PROFILE_KEEP)
+        return profile_id
+
+
+def prune_profiles(directory, keep):
+    """Удаление старых профилей сверх лимита хранения"""
+    files = sorted(directory.glob('*.prof'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in files[keep:]:
+        for stale in (path, path.with_suffix('.json')):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+
+@staff_member_required
+def profile_download(request, profile_id, fmt):
+    """Скачивание сохраненного профиля: .prof (дерево вызовов) или .json (сводка)"""
+    if fmt not in ('prof', 'json') or len(profile_id) != PROFILE_ID_LENGTH or not profile_id.isalnum():
+        raise Http404()
+    path = Path(settings.DDS_PROFILE_DIR) / f"{profile_id}.{fmt}"
+    if not path.exists():
+        raise Http404()
+    if fmt == 'json':
+        with open(path, encoding='utf-8') as f:
+            return JsonResponse(json.load(f), json_dumps_params={'ensure_ascii': False})
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
@@ -0,0 +1,97 @@
+import functools
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Необязательная зависимость: без нее используется стандартный json
+    orjson = None
+
+if orjson is not None:
+    # Даты и время передаются в default, чтобы формат совпадал с кодировщиками DRF и Django
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+
+@functools.lru_cache(maxsize=None)
+def stdlib_encoder(default):
+    """
+    Кодировщик стандартного json для обработчика default, создается один раз
+
+    Без проверки циклических ссылок: данные ответов - деревья из dict/list,
+    а учет каждого вложенного объекта заметно замедляет кодирование.
+    Имена полей C-кодировщик кодирует сам - предварительное кодирование
+    в Python выходит медленнее.
+    """
+    return json.JSONEncoder(
+        default=default, ensure_ascii=False, allow_nan=False, separators=(',', ':'), check_circular=False,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def encoder_default(encoder_class):
+    """Обработчик default кодировщика DRF - один на класс, чтобы переиспользовать stdlib_encoder()"""
+    return encoder_class().default
+
+
+def dumps(data, default):
+    """
+    Компактный JSON в UTF-8: через orjson, если он установлен, иначе стандартным json
+
+    default - обработчик типов, которые не кодируются напрямую (Decimal,
+    даты, ленивые строки), например JSONEncoder().default из DRF.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass  # Например, целые больше 64 бит - их кодирует стандартный json
+    return stdlib_encoder(default).encode(data).encode('utf-8')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer с быстрым кодированием: orjson, если он установлен, иначе
+    закэшированный кодировщик стандартного json без проверки циклов
+
+    Ответ совпадает с JSONRenderer (без отступов): те же правила для Decimal,
+    дат и ленивых строк - через default кодировщика DRF, и то же
+    экранирование U+2028/U+2029. Запросы с отступами (indent) обрабатываются
+    обычным JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = dumps(data, default=encoder_default(self.encoder_class))
+        # Разделители строк допустимы в JSON, но не в JavaScript - экранируются, как в DRF
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Рендерер формата NDJSON: один JSON-объект на строку
+
+    Полные выборки списка операций отдаются потоково из представления,
+    сюда попадают только обычные ответы (детали объекта, ошибки).
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(ndjson_line(row) for row in rows)
+
+
+_django_default = DjangoJSONEncoder().default
+
+
+def ndjson_line(row):
+    """Кодирование одной записи в строку NDJSON"""
+    return dumps(row, default=_django_default) + b'\n'
@@ -0,0 +1,190 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .filters import MoneyMovementFilter
+from .models import Job, MoneyMovement, SavedReport, SavedReportRow, REPORT_DIMENSIONS, date_buckets
+
+REPORT_FILTER_FIELDS = ('status', 'operation_type', 'category', 'subcategory')
+# Колонка операции для каждого измерения группировки
+DIMENSION_COLUMNS = {
+    'operation_type': 'operation_type_id',
+    'category': 'category_id',
+    'subcategory': 'subcategory_id',
+    'status': 'status_id',
+    'month': 'created_month',
+}
+
+
+def clean_report_filters(params):
+    """Проверка фильтров отчета формой MoneyMovementFilter; возвращает (фильтры для хранения, ошибки)"""
+    filterset = MoneyMovementFilter(params, queryset=MoneyMovement.objects.none())
+    if not filterset.is_valid():
+        return None, filterset.errors
+    data = filterset.form.cleaned_data
+    filters = {name: data[name].pk for name in REPORT_FILTER_FIELDS if data.get(name) is not None}
+    date_range = data.get('created_date')
+    if date_range and date_range.start:
+        filters['created_date_after'] = timezone.localtime(date_range.start).date().isoformat()
+    if date_range and date_range.stop:
+        filters['created_date_before'] = timezone.localtime(date_range.stop).date().isoformat()
+    return filters, None
+
+
+def report_dimensions(group_by):
+    """Измерения группировки в каноническом порядке (он же порядок значений в ключе строки)"""
+    return [name for name in REPORT_DIMENSIONS if name in group_by]
+
+
+def row_key(dimensions, values):
+    return '|'.join(str(values[DIMENSION_COLUMNS[name]]) for name in dimensions)
+
+
+def row_fields(dimensions, values):
+    """Поля строки отчета по значениям колонок операции"""
+    return {name if name == 'month' else f'{name}_id': values[DIMENSION_COLUMNS[name]] for name in dimensions}
+
+
+def report_queryset(report):
+    """Операции в пределах фильтров отчета - те же условия, что у списка операций, в БД отчета"""
+    movements = MoneyMovement.objects.using(report._state.db or DEFAULT_DB_ALIAS)
+    filterset = MoneyMovementFilter(report.filters, queryset=movements.all())
+    # Неверный фильтр (например, удаленная категория) иначе был бы пропущен и расширил бы отчет
+    return filterset.qs if filterset.is_valid() else movements.none()
+
+
+def report_definitions(using=DEFAULT_DB_ALIAS):
+    """
+    Определения сохраненных отчетов [(ID, фильтры, измерения)]
+
+    Читаются из БД при каждой записи одним небольшим запросом: кэш в памяти
+    процесса не видел бы отчеты, созданные или измененные другим процессом.
+    """
+    return [
+        (pk, filters, report_dimensions(group_by))
+        for pk, filters, group_by in SavedReport.objects.using(using).values_list('pk', 'filters', 'group_by')
+    ]
+
+
+def _matches(filters, state, day):
+    for name in REPORT_FILTER_FIELDS:
+        if name in filters and state[f'{name}_id'] != filters[name]:
+            return False
+    after, before = filters.get('created_date_after'), filters.get('created_date_before')
+    day = day.isoformat()
+    return (after is None or day >= after) and (before is None or day <= before)
+
+
+def mark_reports_dirty(states, using=DEFAULT_DB_ALIAS, definitions=None):
+    """
+    Пометка групп отчетов, затронутых изменением операций, одним запросом
+
+    states - значения полей операций до и после изменения: TRACKED_FIELDS
+    или report_states() массового изменения; группа помечается, только если
+    состояние попадает в фильтры отчета. Помеченные группы пересчитывает
+    задача refresh_reports, поставленная после фиксации транзакции, при
+    DDS_REPORT_REFRESH_ON_WRITE - сама запись сразу после фиксации. definitions - уже прочитанные report_definitions().
+    """
+    states = [state for state in states if state is not None]
+    if not states:
+        return
+    if definitions is None:
+        definitions = report_definitions(using)
+    if not definitions:
+        return
+
+    rows = {}
+    for state in states:
+        if 'created_day' in state:
+            day, month = state['created_day'], state['created_month']
+        else:
+            day, month = date_buckets(state['created_date'])
+        values = {**state, 'created_month': month}
+        for report_id, filters, dimensions in definitions:
+            if _matches(filters, state, day):
+                key = row_key(dimensions, values)
+                rows[report_id, key] = SavedReportRow(
+                    report_id=report_id, key=key, dirty=True, **row_fields(dimensions, values),
+                )
+    if not rows:
+        return
+    SavedReportRow.objects.using(using).bulk_create(
+        rows.values(), update_conflicts=True, unique_fields=['report', 'key'], update_fields=['dirty'],
+    )
+    if settings.DDS_REPORT_REFRESH_ON_WRITE:
+        report_ids = {report_id for report_id, _ in rows}
+        transaction.on_commit(lambda: refresh_reports(report_ids, using=using), using=using)
+    else:
+        transaction.on_commit(lambda: schedule_report_refresh(using), using=using)
+
+
+def schedule_report_refresh(using=DEFAULT_DB_ALIAS):
+    """
+    Постановка задачи refresh_reports, если ожидающей задачи еще нет
+
+    Задача без параметров пересчитывает устаревшие группы всех отчетов,
+    поэтому одна ожидающая задача покрывает все записи до ее запуска. Запись
+    после запуска задачи ставит новую.
+    """
+    jobs = Job.objects.using(using)
+    if not jobs.filter(kind='refresh_reports', status=Job.State.PENDING, params={}).exists():
+        jobs.create(kind='refresh_reports')
+
+
+def refresh_report(report, full=False):
+    """
+    Пересчет устаревших групп отчета (при full - всего отчета); возвращает число пересчитанных групп
+
+    Операции устаревших групп выбираются по значениям измерений (IN по каждой
+    колонке) и агрегируются в БД; лишние группы из этой выборки
+    отбрасываются, группы без операций удаляются.
+    """
+    dimensions = report_dimensions(report.group_by)
+    columns = [DIMENSION_COLUMNS[name] for name in dimensions]
+    using = report._state.db or DEFAULT_DB_ALIAS
+    with transaction.atomic(using=using):
+        queryset = report_queryset(report)
+        stale = None
+        if not full:
+            stale = {row.key: row for row in report.rows.select_for_update().filter(dirty=True)}
+            if not stale:
+                return 0
+            for name, column in zip(dimensions, columns):
+                field = name if name == 'month' else f'{name}_id'
+                queryset = queryset.filter(**{f'{column}__in': {getattr(row, field) for row in stale.values()}})
+
+        if columns:
+            results = queryset.order_by().values(*columns).annotate(row_count=Count('id'), row_total=Sum('amount'))
+        else:
+            results = [queryset.aggregate(row_count=Count('id'), row_total=Sum('amount'))]
+        fresh = {}
+        for values in results:
+            key = row_key(dimensions, values)
+            if values['row_count'] and (stale is None or key in stale):
+                fresh[key] = SavedReportRow(
+                    report=report, key=key, count=values['row_count'], total=values['row_total'],
+                    **row_fields(dimensions, values),
+                )
+
+        if full:
+            report.rows.all().delete()
+        else:
+            report.rows.filter(key__in=[key for key in stale if key not in fresh]).delete()
+        SavedReportRow.objects.using(using).bulk_create(
+            fresh.values(), update_conflicts=True, unique_fields=['report', 'key'],
+            update_fields=['count', 'total', 'dirty'],
+        )
+        report.refreshed_at = timezone.now()
+        SavedReport.objects.using(using).filter(pk=report.pk).update(refreshed_at=report.refreshed_at)
+    return len(fresh) if full else len(stale)
+
+
+def refresh_reports(report_ids=None, full=False, using=DEFAULT_DB_ALIAS):
+    """Пересчет отчетов (всех или с данными ID); возвращает число пересчитанных групп"""
+    reports = SavedReport.objects.using(using)
+    if report_ids is not None:
+        reports = reports.filter(pk__in=report_ids)
+    if not full:
+        reports = reports.filter(pk__in=SavedReportRow.objects.filter(dirty=True).values('report_id'))
+    return sum(refresh_report(report, full=full) for report in reports)
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+
+def generate_schema():
+    """Генерация OpenAPI-схемы интроспекцией всех представлений"""
+    return SchemaGenerator().get_schema(request=None, public=True)
+
+
+def write_schema(path=None):
+    """Сборка схемы и запись в файл; возвращает путь и размер в байтах"""
+    path = path or settings.DDS_SCHEMA_FILE
+    content = json.dumps(generate_schema(), ensure_ascii=False, sort_keys=True).encode('utf-8')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)  # Атомарная подмена, чтобы воркеры не прочитали файл наполовину
+    return path, len(content)
+
+
+class PrebuiltSchema:
+    """Схема, прочитанная из файла, с кэшем отрендеренных представлений по форматам"""
+
+    def __init__(self, data, digest, mtime):
+        self.data = data
+        self.digest = digest
+        self.mtime = mtime
+        self._rendered = {}
+
+    def render(self, renderer):
+        key = renderer.media_type
+        if key not in self._rendered:
+            self._rendered[key] = renderer.render(self.data, renderer.media_type, {})
+        return self._rendered[key]
+
+    def etag(self, renderer):
+        return f'"{self.digest}-{renderer.format}"'
+
+
+_prebuilt = None
+_prebuilt_lock = threading.Lock()
+
+
+def get_prebuilt_schema():
+    """Загрузка собранной схемы; файл перечитывается только при изменении"""
+    global _prebuilt
+    path = settings.DDS_SCHEMA_FILE
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    if _prebuilt is not None and _prebuilt.mtime == mtime:
+        return _prebuilt
+    with _prebuilt_lock:
+        if _prebuilt is None or _prebuilt.mtime != mtime:
+            with open(path, 'rb') as f:
+                content = f.read()
+            _prebuilt = PrebuiltSchema(json.loads(content), hashlib.sha256(content).hexdigest()[:32], mtime)
+    return _prebuilt
+
+
+class PrebuiltSpectacularAPIView(SpectacularAPIView):
+    """
+    Отдача OpenAPI-схемы из файла, собранного командой build_schema
+
+    Поддерживает ETag/If-None-Match. Если файл не собран, схема
+    генерируется на лету, как в SpectacularAPIView.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        prebuilt = get_prebuilt_schema()
+        if prebuilt is None or request.GET.get('lang') or request.GET.get('version'):
+            return super().get(request, *args, **kwargs)
+
+        renderer = request.accepted_renderer
+        etag = prebuilt.etag(renderer)
+        conditional = get_conditional_response(request, etag=etag)
+        if conditional is not None:
+            return conditional
+
+        response = HttpResponse(prebuilt.render(renderer), content_type=request.accepted_media_type)
+        response['ETag'] = etag
+        response['Content-Disposition'] = f'inline; filename="{self._get_filename(request, None)}"'
+        return response
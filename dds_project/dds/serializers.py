@@ -1,5 +1,18 @@
-from rest_framework import serializers
-from .models import Status, OperationType, Category, Subcategory, MoneyMovement
+from decimal import Decimal
+from operator import attrgetter
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+from .jobs import JOB_HANDLERS
+from .models import (
+    Status, OperationType, Category, Subcategory, MoneyMovement, MovementAuditEntry, SavedReport, SavedReportRow, Job,
+    REPORT_DIMENSIONS,
+)
 
 
 class StatusSerializer(serializers.ModelSerializer):
@@ -35,16 +48,114 @@ class SubcategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class MoneyMovementSerializer(serializers.ModelSerializer):
+def _generic_encoder(field):
+    """Кодирование поля как в Serializer.to_representation"""
+    def encode(instance):
+        attribute = field.get_attribute(instance)
+        check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        return None if check_for_none is None else field.to_representation(attribute)
+    return encode
+
+
+def _fast_encoder(field, model):
+    """
+    Быстрое кодирование поля известного типа без цепочки вызовов DRF
+
+    Результат совпадает с field.to_representation; для значений вне быстрого
+    пути (None, нестандартные форматы) используется обычная логика поля.
+    """
+    generic = _generic_encoder(field)
+    if field.source == '*' or type(field) not in (
+        serializers.IntegerField, serializers.CharField, serializers.DecimalField,
+        serializers.DateTimeField, serializers.PrimaryKeyRelatedField,
+    ):
+        return generic
+
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        if field.pk_field is not None or '.' in field.source:
+            return generic
+        # Значение внешнего ключа берется из колонки *_id без обращения к связанному объекту
+        get = attrgetter(model._meta.get_field(field.source).attname)
+        convert = None
+    else:
+        get = attrgetter(field.source)
+        if isinstance(field, serializers.IntegerField):
+            convert = int
+        elif isinstance(field, serializers.CharField):
+            convert = str
+        elif isinstance(field, serializers.DecimalField):
+            coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+                return generic
+            exponent = -field.decimal_places
+
+            def convert(value):
+                # Значения MoneyField уже имеют нужное число знаков - квантование не требуется
+                if not isinstance(value, Decimal) or value.as_tuple().exponent != exponent:
+                    return field.to_representation(value)
+                return f'{value:f}'
+        else:
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            if output_format is None or output_format.lower() != ISO_8601 or hasattr(field, 'timezone'):
+                return generic
+            zone = field.default_timezone()
+
+            def convert(value):
+                if zone is None or not timezone.is_aware(value):
+                    return field.to_representation(value)
+                value = value.astimezone(zone).isoformat()
+                return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    def encode(instance):
+        try:
+            value = get(instance)
+        except AttributeError:
+            # Промежуточный объект в source отсутствует - как обработает поле DRF
+            return generic(instance)
+        if value is None:
+            return generic(instance)
+        return value if convert is None else convert(value)
+    return encode
+
+
+class FastRepresentationMixin:
+    """
+    Быстрая сериализация для больших списков
+
+    План кодирования (поле -> функция) строится один раз на экземпляр
+    сериализатора; для полей известных типов значение берется и
+    преобразуется напрямую, остальные кодируются обычной логикой DRF.
+    """
+
+    def to_representation(self, instance):
+        plan = getattr(self, '_representation_plan', None)
+        if plan is None:
+            model = type(instance)
+            plan = self._representation_plan = [
+                (field.field_name, _fast_encoder(field, model)) for field in self._readable_fields
+            ]
+        ret = {}
+        for name, encode in plan:
+            try:
+                ret[name] = encode(instance)
+            except SkipField:
+                continue
+        return ret
+
+
+class MoneyMovementSerializer(FastRepresentationMixin, serializers.ModelSerializer):
     """Сериализатор для движений денежных средств с валидацией"""
     status_name = serializers.CharField(source='status.name', read_only=True)
     operation_type_name = serializers.CharField(source='operation_type.name', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
     subcategory_name = serializers.CharField(source='subcategory.name', read_only=True)
+    # Сумма хранится в копейках, в API - десятичная строка как раньше
+    amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0.01'))
 
     class Meta:
         model = MoneyMovement
-        fields = '__all__'
+        # Служебные колонки для индексов, поиска дубликатов и ленты изменений
+        exclude = ['created_day', 'created_month', 'fingerprint', 'change_seq', 'created_seq']
 
     def validate(self, data):
         """Валидация данных движения денежных средств"""
@@ -76,3 +187,106 @@ class MoneyMovementSerializer(serializers.ModelSerializer):
                 })
 
         return data
+
+
+class MovementAuditEntrySerializer(serializers.ModelSerializer):
+    """Запись журнала изменений операции (только чтение)"""
+
+    class Meta:
+        model = MovementAuditEntry
+        fields = ['id', 'movement_id', 'action', 'rows', 'user', 'username', 'source', 'changes', 'created_at']
+        read_only_fields = fields
+
+
+class SavedReportSerializer(serializers.ModelSerializer):
+    """Определение сохраненного отчета; фильтры проверяются и хранятся в очищенном виде"""
+
+    class Meta:
+        model = SavedReport
+        fields = ['id', 'name', 'description', 'filters', 'group_by', 'created_at', 'refreshed_at']
+        read_only_fields = ['created_at', 'refreshed_at']
+
+    def validate_filters(self, value):
+        from .reports import clean_report_filters
+
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Фильтры должны быть объектом.")
+        filters, errors = clean_report_filters(value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return filters
+
+    def validate_group_by(self, value):
+        if not isinstance(value, list) or not all(item in REPORT_DIMENSIONS for item in value):
+            raise serializers.ValidationError(
+                f"Ожидается список измерений из: {', '.join(REPORT_DIMENSIONS)}."
+            )
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("Измерения не должны повторяться.")
+        return value
+
+
+class SavedReportRowSerializer(serializers.ModelSerializer):
+    """Строка отчета: значения измерений группировки, число и сумма операций"""
+    total = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = SavedReportRow
+        fields = [*REPORT_DIMENSIONS, 'count', 'total']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        group_by = self.context.get('group_by')
+        if group_by is not None:
+            for name in REPORT_DIMENSIONS:
+                if name not in group_by:
+                    del data[name]
+        return data
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Сериализатор фоновых задач: при создании задаются тип, параметры и входной файл"""
+
+    class Meta:
+        model = Job
+        fields = '__all__'
+        read_only_fields = [
+            'status', 'progress', 'message', 'result', 'error',
+            'cancel_requested', 'created_at', 'started_at', 'finished_at',
+        ]
+
+    def validate_kind(self, value):
+        if value not in JOB_HANDLERS:
+            raise serializers.ValidationError(
+                f"Неизвестный тип задачи. Доступные: {', '.join(sorted(JOB_HANDLERS))}."
+            )
+        return value
+
+    def validate_params(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Параметры должны быть объектом.")
+        return value
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """Один подзапрос пакета: метод, путь API (с параметрами) и тело"""
+    method = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False, allow_null=True)
+
+    def validate_path(self, value):
+        api_root = reverse('api-root')
+        if not value.startswith(api_root):
+            raise serializers.ValidationError(f"Путь должен начинаться с {api_root}.")
+        return value
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    """Пакет подзапросов к API"""
+    requests = BatchItemSerializer(many=True, allow_empty=False, max_length=settings.DDS_BATCH_MAX_REQUESTS)
+    parallel = serializers.BooleanField(
+        default=False, help_text="Выполнять параллельно, если в пакете только GET-запросы",
+    )
+    atomic = serializers.BooleanField(
+        default=True, help_text="Выполнять изменения одной транзакцией: при ошибке откатываются все",
+    )
@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Max, Min, Q, Sum
+
+from .models import OperationType
+
+# Ширины интервалов по возрастанию: дни, затем месяцы; дальше - годы (кратно 12 месяцам)
+DAY_WIDTHS = [1, 7]
+MONTH_WIDTHS = [1, 3, 6, 12]
+
+
+@dataclass(frozen=True)
+class Bucket:
+    """Ширина интервала ряда: size дней или месяцев"""
+    unit: str
+    size: int
+
+    def index(self, value):
+        """Номер интервала, в который попадает дата; интервалы выровнены по календарю"""
+        if self.unit == 'day':
+            # Порядковый номер 1 - понедельник, поэтому недели начинаются с понедельника
+            return (value.toordinal() - 1) // self.size
+        return (value.year * 12 + value.month - 1) // self.size
+
+    def start(self, index):
+        """Первый день интервала с данным номером"""
+        if self.unit == 'day':
+            return date.fromordinal(index * self.size + 1)
+        year, month = divmod(index * self.size, 12)
+        return date(year, month + 1, 1)
+
+    def count(self, start, end):
+        return self.index(end) - self.index(start) + 1
+
+
+def choose_bucket(start, end, points):
+    """Самый узкий интервал, при котором на отрезок [start, end] приходится не больше points точек"""
+    for size in DAY_WIDTHS:
+        bucket = Bucket('day', size)
+        if bucket.count(start, end) <= points:
+            return bucket
+    for size in MONTH_WIDTHS:
+        bucket = Bucket('month', size)
+        if bucket.count(start, end) <= points:
+            return bucket
+    years = end.year - start.year + 1
+    size = 12 * -(-years // points)
+    while Bucket('month', size).count(start, end) > points:
+        size += 12
+    return Bucket('month', size)
+
+
+def data_range(queryset):
+    """Первый и последний день операций выборки (None, если она пуста)"""
+    bounds = queryset.order_by().aggregate(start=Min('created_day'), end=Max('created_day'))
+    return bounds['start'], bounds['end']
+
+
+def build_series(queryset, start, end, points):
+    """
+    Агрегированный ряд не длиннее points точек: поступления, списания, сальдо, число операций
+
+    Суммы по дням считаются в БД по покрывающему индексу (день, тип операции,
+    сумма), поэтому из БД читается не больше строки на день периода, а не
+    операции. Свертка дней в выбранные интервалы - в Python.
+    Пустые интервалы возвращаются с нулями, чтобы ось графика была сплошной.
+    """
+    bucket = choose_bucket(start, end, points)
+    income_types = OperationType.objects.filter(name__in=settings.DDS_INCOME_OPERATION_TYPES).values('id')
+    rows = queryset.filter(created_day__range=(start, end)).order_by().values('created_day').annotate(
+        income=Sum('amount', filter=Q(operation_type__in=income_types)),
+        expense=Sum('amount', filter=~Q(operation_type__in=income_types)),
+        count=Count('id'),
+    )
+
+    first = bucket.index(start)
+    zero = Decimal('0.00')
+    totals = [[zero, zero, 0] for _ in range(bucket.count(start, end))]
+    for row in rows:
+        total = totals[bucket.index(row['created_day']) - first]
+        total[0] += row['income'] or zero
+        total[1] += row['expense'] or zero
+        total[2] += row['count']
+
+    return {
+        'start': start,
+        'end': end,
+        'bucket': {'unit': bucket.unit, 'size': bucket.size},
+        'points': [
+            {
+                'start': max(bucket.start(first + offset), start),
+                # Суммы строками, как поле amount в API
+                'income': str(income),
+                'expense': str(expense),
+                'net': str(income - expense),
+                'count': count,
+            }
+            for offset, (income, expense, count) in enumerate(totals)
+        ],
+    }
@@ -0,0 +1,116 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .auditlog import record_changes, record_created, record_deleted, tracked_values
+from .events import broker
+from .fragments import movement_fragments
+from .models import (
+    Status, OperationType, Category, Subcategory, MoneyMovement, MoneyMovementTombstone,
+    FINGERPRINT_SOURCES, date_buckets, next_change_seq,
+)
+from .reports import mark_reports_dirty
+from .serializers import MoneyMovementSerializer
+from .stats import mark_dirty, record_movements, stats_key
+from .taxonomy import bump_taxonomy_version
+
+
+@receiver(post_delete, sender=MoneyMovement, dispatch_uid="dds_money_movement_tombstone")
+def create_tombstone(sender, instance, using, **kwargs):
+    """Фиксация удаления записи в журнале для ленты изменений (в транзакции удаления)"""
+    MoneyMovementTombstone.objects.using(using).create(movement_id=instance.pk, change_seq=next_change_seq(using))
+
+
+def publish_movement_event(op, instance):
+    """Отправка события подписчикам потока после фиксации транзакции"""
+    if not broker.has_subscribers():
+        return
+    payload = MoneyMovementSerializer(instance).data
+    transaction.on_commit(lambda: broker.publish(op, payload))
+
+
+@receiver(post_save, sender=MoneyMovement, dispatch_uid="dds_money_movement_stream_save")
+def stream_movement_saved(sender, instance, created, **kwargs):
+    publish_movement_event('created' if created else 'updated', instance)
+
+
+@receiver(post_delete, sender=MoneyMovement, dispatch_uid="dds_money_movement_stream_delete")
+def stream_movement_deleted(sender, instance, **kwargs):
+    publish_movement_event('deleted', instance)
+
+
+@receiver(post_save, sender=MoneyMovement, dispatch_uid="dds_money_movement_fragment_save")
+@receiver(post_delete, sender=MoneyMovement, dispatch_uid="dds_money_movement_fragment_delete")
+def discard_movement_fragment(sender, instance, **kwargs):
+    """Удаление закэшированного представления измененной записи"""
+    movement_fragments.discard(instance.pk)
+
+
+@receiver(pre_save, sender=MoneyMovement, dispatch_uid="dds_money_movement_before_save")
+def remember_movement_state(sender, instance, update_fields=None, **kwargs):
+    """Значения изменяемой записи до сохранения - для сводок и журнала изменений"""
+    instance._before_save = None
+    if instance._state.adding or (update_fields is not None and not FINGERPRINT_SOURCES.intersection(update_fields)):
+        return
+    instance._before_save = instance.loaded_values()
+
+
+@receiver(post_save, sender=MoneyMovement, dispatch_uid="dds_money_movement_stats_save")
+def update_movement_stats(sender, instance, created, using, **kwargs):
+    """Новая операция добавляется в сводку; измененная помечает старую и новую сводки устаревшими"""
+    if created:
+        record_movements([instance], using)
+        return
+    before = getattr(instance, '_before_save', None)
+    if before is None:
+        return
+    old_key = (before['category_id'], before['subcategory_id'], date_buckets(before['created_date'])[1])
+    if old_key != stats_key(instance) or before['amount'] != instance.amount:
+        mark_dirty([old_key, stats_key(instance)], using)
+
+
+@receiver(post_delete, sender=MoneyMovement, dispatch_uid="dds_money_movement_stats_delete")
+def discard_movement_stats(sender, instance, using, **kwargs):
+    mark_dirty([stats_key(instance)], using)
+
+
+@receiver(post_save, sender=MoneyMovement, dispatch_uid="dds_money_movement_reports_save")
+def mark_movement_reports(sender, instance, created, using, **kwargs):
+    """Пометка групп сохраненных отчетов, в которые операция входила до и после сохранения"""
+    before = getattr(instance, '_before_save', None)
+    if created or before is not None:
+        mark_reports_dirty([before, tracked_values(instance)], using)
+
+
+@receiver(post_delete, sender=MoneyMovement, dispatch_uid="dds_money_movement_reports_delete")
+def unmark_movement_reports(sender, instance, using, **kwargs):
+    mark_reports_dirty([tracked_values(instance)], using)
+
+
+@receiver(post_save, sender=MoneyMovement, dispatch_uid="dds_money_movement_audit_save")
+def audit_movement_saved(sender, instance, created, using, **kwargs):
+    """Передача изменений в журнал; сохраненные значения становятся исходными для следующего save()"""
+    after = tracked_values(instance)
+    if created:
+        record_created([instance], using)
+    elif getattr(instance, '_before_save', None) is not None:
+        record_changes({instance.pk: instance._before_save}, {instance.pk: after}, using)
+    instance._loaded_values = after
+
+
+@receiver(post_delete, sender=MoneyMovement, dispatch_uid="dds_money_movement_audit_delete")
+def audit_movement_deleted(sender, instance, using, **kwargs):
+    record_deleted([instance], using)
+
+
+@receiver(post_save, sender=Status, dispatch_uid="dds_taxonomy_status_save")
+@receiver(post_delete, sender=Status, dispatch_uid="dds_taxonomy_status_delete")
+@receiver(post_save, sender=OperationType, dispatch_uid="dds_taxonomy_operation_type_save")
+@receiver(post_delete, sender=OperationType, dispatch_uid="dds_taxonomy_operation_type_delete")
+@receiver(post_save, sender=Category, dispatch_uid="dds_taxonomy_category_save")
+@receiver(post_delete, sender=Category, dispatch_uid="dds_taxonomy_category_delete")
+@receiver(post_save, sender=Subcategory, dispatch_uid="dds_taxonomy_subcategory_save")
+@receiver(post_delete, sender=Subcategory, dispatch_uid="dds_taxonomy_subcategory_delete")
+def invalidate_taxonomy_tree(sender, **kwargs):
+    """Сброс кэша дерева справочников после фиксации изменений"""
+    transaction.on_commit(bump_taxonomy_version)
@@ -0,0 +1,85 @@
+import heapq
+import math
+
+
+class QuantileSketch:
+    """
+    Сливаемый эскиз распределения положительных значений (по схеме DDSketch)
+
+    Значения раскладываются по корзинам с границами gamma^i, поэтому любой
+    квантиль возвращается с относительной ошибкой не больше
+    relative_accuracy. Число корзин ограничено логарифмом диапазона значений
+    (для сумм от копейки до триллиона рублей - около 1700 при точности 1%),
+    поэтому слияние и расчет квантиля не зависят от числа значений. Счетчики
+    корзин можно уменьшать - значение удаляется из эскиза точно.
+    """
+
+    def __init__(self, relative_accuracy, bins=None):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = dict(bins or {})
+        self.count = sum(self.bins.values())
+
+    def key(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def add(self, value, count=1):
+        key = self.key(value)
+        self.bins[key] = self.bins.get(key, 0) + count
+        if not self.bins[key]:
+            del self.bins[key]
+        self.count += count
+
+    def merge(self, other):
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.count += other.count
+
+    def quantile(self, q):
+        """Значение квантиля q (0..1); None для пустого эскиза"""
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                break
+        # Середина корзины (gamma^(key-1), gamma^key] в смысле относительной ошибки
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def to_dict(self):
+        return {str(key): count for key, count in self.bins.items()}
+
+    @classmethod
+    def from_dict(cls, relative_accuracy, data):
+        return cls(relative_accuracy, {int(key): count for key, count in data.items()})
+
+
+class TopK:
+    """Наибольшие size значений с идентификаторами записей (сливаемая куча)"""
+
+    def __init__(self, size, items=None):
+        self.size = size
+        self._heap = []
+        for value, ident in items or ():
+            self.add(value, ident)
+
+    def add(self, value, ident):
+        item = (value, ident)
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, item)
+        elif item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+
+    def merge(self, other):
+        for value, ident in other._heap:
+            self.add(value, ident)
+
+    def items(self):
+        """Пары (значение, идентификатор) по убыванию значения"""
+        return sorted(self._heap, reverse=True)
+
+    def to_list(self):
+        return [list(item) for item in self.items()]
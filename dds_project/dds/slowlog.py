@@ -0,0 +1,161 @@
+import atexit
+import contextvars
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger('dds.slowlog')
+
+# Представление, выполняющее текущий запрос (выставляет SlowQueryMiddleware)
+current_view = contextvars.ContextVar('dds_current_view', default='')
+
+_buffer = deque(maxlen=10000)
+_local = threading.local()
+_flush_lock = threading.Lock()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%s|\?")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Приведение SQL к шаблону: литералы и параметры заменяются на ?, списки IN сворачиваются"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _LIST_RE.sub('(?...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint_sql(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def explain(connection, sql, params):
+    """План выполнения запроса на том же подключении (EXPLAIN QUERY PLAN для SQLite)"""
+    prefix = connection.ops.explain_query_prefix()
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {sql}", params)
+        return "\n".join(" | ".join(str(col) for col in row) for row in cursor.fetchall())
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    """Обертка выполнения запросов: фиксирует запросы дольше DDS_SLOW_QUERY_MS"""
+    if getattr(_local, 'active', False):
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+    threshold = settings.DDS_SLOW_QUERY_MS
+    if threshold is None or duration_ms < threshold:
+        return result
+
+    _local.active = True
+    try:
+        plan = ''
+        connection = context['connection']
+        if not many and sql.lstrip()[:6].upper() in ('SELECT', 'UPDATE', 'DELETE') \
+                and not connection.needs_rollback:
+            try:
+                plan = explain(connection, sql, params)
+            except Exception as exc:
+                plan = f"Не удалось получить план: {exc}"
+        _buffer.append({
+            'alias': connection.alias,
+            'sql': sql,
+            'params': repr(params)[:1000],
+            'view': current_view.get(),
+            'duration_ms': duration_ms,
+            'explain': plan,
+        })
+    finally:
+        _local.active = False
+    return result
+
+
+def install_slow_query_wrapper(sender, connection, **kwargs):
+    """Подключение обертки к новому соединению (обработчик сигнала connection_created)"""
+    if slow_query_wrapper not in connection.execute_wrappers:
+        # В начало списка: execute_wrapper() снимает обертки с конца
+        connection.execute_wrappers.insert(0, slow_query_wrapper)
+
+
+def flush_slow_queries(using='default'):
+    """Сохранение накопленных медленных запросов в журнал, сгруппированных по отпечатку"""
+    from .models import SlowQuery
+
+    if not _buffer or connections[using].in_atomic_block:
+        return 0
+    with _flush_lock:
+        entries = []
+        while _buffer:
+            entries.append(_buffer.popleft())
+    if not entries:
+        return 0
+
+    grouped = {}
+    for entry in entries:
+        normalized = normalize_sql(entry['sql'])
+        group = grouped.setdefault(fingerprint_sql(normalized), {
+            'sql': normalized, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'worst': entry,
+        })
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        if entry['duration_ms'] >= group['max_ms']:
+            group['max_ms'] = entry['duration_ms']
+            group['worst'] = entry
+
+    _local.active = True
+    try:
+        with transaction.atomic(using=using):
+            existing = SlowQuery.objects.using(using).in_bulk(list(grouped), field_name='fingerprint')
+            for fingerprint, group in grouped.items():
+                worst = group['worst']
+                example = {
+                    'example_sql': worst['sql'], 'params': worst['params'],
+                    'view': worst['view'][:255], 'explain': worst['explain'],
+                }
+                if fingerprint not in existing:
+                    SlowQuery.objects.using(using).create(
+                        fingerprint=fingerprint, sql=group['sql'], count=group['count'],
+                        total_ms=group['total_ms'], max_ms=group['max_ms'], **example,
+                    )
+                    continue
+                fields = {
+                    'count': F('count') + group['count'],
+                    'total_ms': F('total_ms') + group['total_ms'],
+                    'max_ms': Greatest('max_ms', group['max_ms']),
+                    'last_seen': timezone.now(),
+                }
+                # Пример и план храним для самого медленного выполнения
+                if group['max_ms'] >= existing[fingerprint].max_ms:
+                    fields.update(example)
+                SlowQuery.objects.using(using).filter(pk=existing[fingerprint].pk).update(**fields)
+    finally:
+        _local.active = False
+    return len(entries)
+
+
+def _flush_at_exit():
+    """Сохранение остатка буфера при завершении процесса (команды, воркеры)"""
+    if not _buffer:
+        return
+    try:
+        flush_slow_queries()
+    except Exception:
+        logger.exception("Не удалось сохранить журнал медленных запросов")
+
+
+atexit.register(_flush_at_exit)
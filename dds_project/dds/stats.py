@@ -0,0 +1,184 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import MoneyMovement, MovementStatsBucket
+from .sketches import QuantileSketch, TopK
+
+STATS_GROUPS = ('category', 'subcategory', 'month')
+
+_amount_field = MoneyMovement._meta.get_field('amount')
+
+
+def stats_key(movement):
+    return movement.category_id, movement.subcategory_id, movement.created_month
+
+
+def bucket_key(bucket):
+    return bucket.category_id, bucket.subcategory_id, bucket.month
+
+
+def load_sketch(bucket):
+    return QuantileSketch.from_dict(settings.DDS_STATS_RELATIVE_ACCURACY, bucket.sketch)
+
+
+def load_top(bucket):
+    return TopK(settings.DDS_STATS_TOP_K, [tuple(item) for item in bucket.top])
+
+
+def _store(bucket, sketch, top, total):
+    bucket.count = sketch.count
+    bucket.total = total
+    bucket.sketch = sketch.to_dict()
+    bucket.top = top.to_list()
+
+
+def _buckets(keys, using):
+    """Сводки с данными ключами одним запросом (выборка по месяцам и подкатегориям, отбор в Python)"""
+    # Блокировка строк для СУБД, которые ее поддерживают; SQLite и так выполняет записи по одной транзакции
+    queryset = MovementStatsBucket.objects.using(using).select_for_update().filter(
+        month__in={key[2] for key in keys}, subcategory_id__in={key[1] for key in keys},
+    )
+    return {bucket_key(bucket): bucket for bucket in queryset if bucket_key(bucket) in keys}
+
+
+def record_movements(movements, using=DEFAULT_DB_ALIAS):
+    """Добавление новых операций в сводки БД using: чтение затронутых сводок и запись - по одному запросу"""
+    groups = {}
+    for movement in movements:
+        groups.setdefault(stats_key(movement), []).append(movement)
+    if not groups:
+        return
+
+    with transaction.atomic(using=using):
+        existing = _buckets(groups.keys(), using)
+        created, changed = [], []
+        for key, items in groups.items():
+            bucket = existing.get(key)
+            if bucket is not None and bucket.dirty:
+                continue  # Пересчитается из БД целиком вместе с новыми операциями
+            if bucket is None:
+                bucket = MovementStatsBucket(category_id=key[0], subcategory_id=key[1], month=key[2])
+                created.append(bucket)
+            else:
+                changed.append(bucket)
+            sketch, top = load_sketch(bucket), load_top(bucket)
+            for movement in items:
+                minor = _amount_field.to_minor_units(movement.amount)
+                sketch.add(minor)
+                top.add(minor, movement.pk)
+            _store(bucket, sketch, top, bucket.total + sum(movement.amount for movement in items))
+        MovementStatsBucket.objects.using(using).bulk_create(created)
+        MovementStatsBucket.objects.using(using).bulk_update(changed, ['count', 'total', 'sketch', 'top'])
+
+
+def mark_dirty(keys, using=DEFAULT_DB_ALIAS):
+    """Пометка сводок устаревшими (после изменения или удаления операций) одним запросом"""
+    keys = {key for key in keys if None not in key}
+    if not keys:
+        return
+    MovementStatsBucket.objects.using(using).bulk_create(
+        [MovementStatsBucket(category_id=key[0], subcategory_id=key[1], month=key[2], dirty=True) for key in keys],
+        update_conflicts=True,
+        unique_fields=['category', 'subcategory', 'month'],
+        update_fields=['dirty'],
+    )
+
+
+def refresh_buckets(buckets):
+    """
+    Пересчет устаревших сводок по операциям их месяцев
+
+    Все устаревшие сводки пересчитываются за один проход по индексу месяца;
+    сводки, по которым операций не осталось, удаляются.
+    """
+    stale = {bucket_key(bucket): bucket for bucket in buckets if bucket.dirty}
+    if not stale:
+        return 0
+    state = {key: (QuantileSketch(settings.DDS_STATS_RELATIVE_ACCURACY), TopK(settings.DDS_STATS_TOP_K), [Decimal(0)])
+             for key in stale}
+    rows = MoneyMovement.objects.filter(
+        created_month__in={key[2] for key in stale}, subcategory_id__in={key[1] for key in stale},
+    ).order_by().values_list('category_id', 'subcategory_id', 'created_month', 'amount', 'id')
+    for category_id, subcategory_id, month, amount, pk in rows.iterator(chunk_size=5000):
+        entry = state.get((category_id, subcategory_id, month))
+        if entry is None:
+            continue
+        minor = _amount_field.to_minor_units(amount)
+        entry[0].add(minor)
+        entry[1].add(minor, pk)
+        entry[2][0] += amount
+
+    empty = []
+    for key, bucket in stale.items():
+        sketch, top, total = state[key]
+        _store(bucket, sketch, top, total[0])
+        if not sketch.count:
+            empty.append(bucket.pk)
+            continue
+        bucket.dirty = False
+    with transaction.atomic():
+        MovementStatsBucket.objects.filter(pk__in=empty).delete()
+        MovementStatsBucket.objects.bulk_update(
+            [bucket for bucket in stale.values() if bucket.pk not in empty],
+            ['count', 'total', 'sketch', 'top', 'dirty'],
+        )
+    return len(stale)
+
+
+def filter_buckets(data):
+    """Сводки по очищенным фильтрам MoneyMovementFilter; период округляется до целых месяцев"""
+    queryset = MovementStatsBucket.objects.all()
+    for name in ('category', 'subcategory'):
+        if data.get(name) is not None:
+            queryset = queryset.filter(**{name: data[name]})
+    if data.get('operation_type') is not None:
+        queryset = queryset.filter(category__operation_type=data['operation_type'])
+    date_range = data.get('created_date')
+    if date_range and date_range.start:
+        queryset = queryset.filter(month__gte=date_range.start.date().replace(day=1))
+    if date_range and date_range.stop:
+        queryset = queryset.filter(month__lte=date_range.stop.date())
+    return queryset
+
+
+def _money(minor):
+    return _amount_field.from_minor_units(round(minor))
+
+
+def movement_statistics(buckets, group_by=None, quantiles=(0.5, 0.9, 0.99), top=10):
+    """
+    Квантили, число, сумма и наибольшие операции по группам сводок
+
+    Сводки группы сливаются за время, пропорциональное числу сводок, а не
+    операций. Квантили приблизительные: относительная ошибка не больше
+    DDS_STATS_RELATIVE_ACCURACY.
+    """
+    buckets = list(buckets)
+    refresh_buckets(buckets)
+    groups = {}
+    for bucket in buckets:
+        if not bucket.count:
+            continue
+        key = None if group_by is None else getattr(bucket, 'month' if group_by == 'month' else f'{group_by}_id')
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = [QuantileSketch(settings.DDS_STATS_RELATIVE_ACCURACY),
+                                   TopK(settings.DDS_STATS_TOP_K), Decimal(0)]
+        group[0].merge(load_sketch(bucket))
+        group[1].merge(load_top(bucket))
+        group[2] += bucket.total
+
+    result = []
+    for key in sorted(groups, key=lambda value: (value is None, value)):
+        sketch, largest, total = groups[key]
+        entry = {group_by: key} if group_by else {}
+        entry.update({
+            'count': sketch.count,
+            'total': str(total),
+            'quantiles': {f'p{q * 100:g}': str(_money(sketch.quantile(q))) for q in quantiles},
+            'top': [{'id': pk, 'amount': str(_money(minor))} for minor, pk in largest.items()[:top]],
+        })
+        result.append(entry)
+    return result
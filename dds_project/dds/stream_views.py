@@ -0,0 +1,46 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .events import broker, format_sse
+from .filters import build_movement_predicate
+
+
+@require_GET
+async def money_movement_stream(request):
+    """
+    Поток событий об изменениях операций ДДС (Server-Sent Events)
+
+    Принимает те же параметры фильтрации, что и список операций
+    (status, operation_type, category, subcategory, created_date_after/before).
+    Рассчитан на работу под ASGI: ожидающий клиент не занимает поток.
+    """
+    # Проверка фильтров обращается к БД за справочниками
+    predicate, errors = await sync_to_async(build_movement_predicate)(request.GET)
+    if errors:
+        return JsonResponse(errors, status=400)
+
+    subscription = broker.subscribe(predicate)
+
+    async def event_stream():
+        heartbeat = settings.DDS_STREAM_HEARTBEAT
+        try:
+            # Рекомендуемая задержка переподключения для EventSource
+            yield f"retry: {heartbeat * 1000}\n\n"
+            while True:
+                try:
+                    op, payload = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(op, payload)
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Отключение буферизации на прокси nginx
+    return response
@@ -0,0 +1,72 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Status, OperationType, Category, Subcategory
+
+TAXONOMY_VERSION_KEY = 'dds:taxonomy:version'
+TAXONOMY_TREE_KEY = 'dds:taxonomy:tree:{version}'
+TAXONOMY_TREE_TIMEOUT = 60 * 60
+
+
+def build_taxonomy_tree():
+    """
+    Построение дерева справочников за постоянное число запросов
+
+    Статусы и типы операций с вложенными категориями и подкатегориями:
+    4 запроса независимо от размера справочников.
+    """
+    operation_types = OperationType.objects.order_by('name').prefetch_related(
+        Prefetch('category', queryset=Category.objects.order_by('name').prefetch_related(
+            Prefetch('subcategory', queryset=Subcategory.objects.order_by('name'))
+        ))
+    )
+    return {
+        'statuses': [{'id': s.id, 'name': s.name} for s in Status.objects.order_by('name')],
+        'operation_types': [
+            {
+                'id': op_type.id,
+                'name': op_type.name,
+                'categories': [
+                    {
+                        'id': category.id,
+                        'name': category.name,
+                        'subcategories': [{'id': sub.id, 'name': sub.name} for sub in category.subcategory.all()],
+                    }
+                    for category in op_type.category.all()
+                ],
+            }
+            for op_type in operation_types
+        ],
+    }
+
+
+def get_taxonomy_version():
+    version = cache.get(TAXONOMY_VERSION_KEY)
+    if version is None:
+        cache.add(TAXONOMY_VERSION_KEY, 1, timeout=None)
+        version = cache.get(TAXONOMY_VERSION_KEY, 1)
+    return version
+
+
+def bump_taxonomy_version():
+    """Инвалидация кэша дерева при изменении любого справочника"""
+    try:
+        cache.incr(TAXONOMY_VERSION_KEY)
+    except ValueError:
+        cache.set(TAXONOMY_VERSION_KEY, 2, timeout=None)
+
+
+def get_taxonomy_tree():
+    """Дерево справочников из кэша текущей версии; возвращает (данные, ETag)"""
+    key = TAXONOMY_TREE_KEY.format(version=get_taxonomy_version())
+    cached = cache.get(key)
+    if cached is None:
+        tree = build_taxonomy_tree()
+        # ETag считается по содержимому, чтобы не зависеть от счетчика версий в разных процессах
+        digest = hashlib.sha256(json.dumps(tree, sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:32]
+        cached = (tree, f'"{digest}"')
+        cache.set(key, cached, TAXONOMY_TREE_TIMEOUT)
+    return cached
@@ -0,0 +1,242 @@
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .audit import fix_violations
+from .models import Status, OperationType, Category, Subcategory, MoneyMovement
+from .taxonomy import bump_taxonomy_version
+
+try:
+    import yaml
+except ImportError:  # Необязательная зависимость: без нее читаются только файлы JSON
+    yaml = None
+
+PARSE_ERRORS = (ValueError, yaml.YAMLError) if yaml is not None else (ValueError,)
+
+# Уровни справочников сверху вниз: ключ в файле, модель, поле родителя
+TAXONOMY_LEVELS = [
+    ('statuses', Status, None),
+    ('operation_types', OperationType, None),
+    ('categories', Category, 'operation_type'),
+    ('subcategories', Subcategory, 'category'),
+]
+LEVEL_TITLES = {
+    'statuses': 'Статусы',
+    'operation_types': 'Типы операций',
+    'categories': 'Категории',
+    'subcategories': 'Подкатегории',
+}
+# Поле операции ДДС, ссылающееся на справочник уровня (on_delete=PROTECT)
+MOVEMENT_REFERENCES = {
+    'statuses': 'status_id',
+    'operation_types': 'operation_type_id',
+    'categories': 'category_id',
+    'subcategories': 'subcategory_id',
+}
+
+
+class TaxonomySyncError(ValueError):
+    """Файл справочников имеет неверный формат или противоречит текущим данным"""
+
+
+def load_taxonomy_file(path):
+    """Чтение дерева справочников из JSON или YAML (по расширению файла)"""
+    path = Path(path)
+    try:
+        with path.open(encoding='utf-8') as f:
+            if path.suffix.lower() in ('.yaml', '.yml'):
+                if yaml is None:
+                    raise TaxonomySyncError("Для чтения YAML нужен пакет PyYAML")
+                return yaml.safe_load(f)
+            return json.load(f)
+    except OSError as e:
+        raise TaxonomySyncError(f"Не удалось прочитать {path}: {e}") from e
+    except PARSE_ERRORS as e:
+        raise TaxonomySyncError(f"Не удалось разобрать {path}: {e}") from e
+
+
+@dataclass
+class LevelChanges:
+    """Изменения одного уровня справочников"""
+    model: type
+    parent_field: str | None
+    existing: dict = field(default_factory=dict)  # {ID: (название, ID родителя, описание)}
+    created: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    moved: list = field(default_factory=list)  # ID записей, перенесенных к другому родителю
+    deleted: dict = field(default_factory=dict)  # {ID: название}
+    protected: dict = field(default_factory=dict)  # {ID: название} - не удалены: на них ссылаются операции
+    matched: set = field(default_factory=set)
+
+    @property
+    def update_fields(self):
+        return ['name', 'description', *([self.parent_field] if self.parent_field else [])]
+
+    def counts(self):
+        return {
+            'created': len(self.created), 'updated': len(self.updated),
+            'deleted': len(self.deleted), 'protected': len(self.protected),
+        }
+
+
+class TaxonomyPlan:
+    """
+    План синхронизации справочников с деревом из файла
+
+    Дерево имеет тот же вид, что ответ /dds/api/taxonomy/: statuses и
+    operation_types с вложенными categories и subcategories. Запись - строка
+    (название) или объект с name, необязательными description и id. С id
+    запись переименовывается или переносится к другому родителю, без id
+    сопоставляется по названию в пределах родителя. Текущие справочники
+    читаются четырьмя запросами, операции для проверки ссылок - еще четырьмя.
+    """
+
+    def __init__(self, tree, prune=False):
+        if not isinstance(tree, dict):
+            raise TaxonomySyncError("Файл справочников должен содержать объект с ключами statuses и operation_types")
+        self.levels = {}
+        for key, model, parent_field in TAXONOMY_LEVELS:
+            changes = self.levels[key] = LevelChanges(model, parent_field)
+            columns = ['id', 'name', f'{parent_field}_id' if parent_field else 'id', 'description']
+            changes.existing = {
+                row[0]: (row[1], row[2] if parent_field else None, row[3])
+                for row in model.objects.order_by().values_list(*columns)
+            }
+        self._keys = {key: {} for key in self.levels}
+        self._names = {key: set() for key in self.levels}
+
+        for raw in self._list(tree, 'statuses'):
+            self._match('statuses', raw, None)
+        for raw_type in self._list(tree, 'operation_types'):
+            op_type = self._match('operation_types', raw_type, None)
+            for raw_category in self._list(raw_type, 'categories'):
+                category = self._match('categories', raw_category, op_type)
+                for raw_subcategory in self._list(raw_category, 'subcategories'):
+                    self._match('subcategories', raw_subcategory, category)
+
+        if prune:
+            # Уровни, отсутствующие в файле, не синхронизируются
+            managed = [key for key in self.levels if ('statuses' if key == 'statuses' else 'operation_types') in tree]
+            self._plan_deletes(managed)
+
+    @staticmethod
+    def _list(container, key):
+        value = container.get(key) if isinstance(container, dict) else None
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            raise TaxonomySyncError(f"{key}: ожидается список")
+        return value
+
+    def _match(self, level, raw, parent):
+        """Сопоставление записи файла с текущей строкой; возвращает экземпляр модели для вложенных записей"""
+        changes = self.levels[level]
+        entry = {'name': raw} if isinstance(raw, str) else raw
+        name = entry.get('name') if isinstance(entry, dict) else None
+        if not isinstance(name, str) or not name.strip():
+            raise TaxonomySyncError(f"{LEVEL_TITLES[level]}: у записи должно быть непустое название: {raw!r}")
+        name = name.strip()
+        parent_id = parent.pk if parent is not None else None
+
+        if entry.get('id') is not None:
+            pk = entry['id']
+            if pk not in changes.existing:
+                raise TaxonomySyncError(f"{LEVEL_TITLES[level]}: нет записи с id={pk} ({name})")
+        elif parent is None or parent_id is not None:
+            pk = self._natural_key_index(level).get((name, parent_id))
+        else:
+            pk = None  # Новый родитель - запись тоже новая
+
+        # Название уникально в пределах родителя (для статусов и типов операций - глобально)
+        name_key = (name, id(parent))
+        if pk in changes.matched or name_key in self._names[level]:
+            raise TaxonomySyncError(f"{LEVEL_TITLES[level]}: запись {name!r} встречается в файле дважды")
+        self._names[level].add(name_key)
+
+        current = changes.existing.get(pk)
+        description = entry.get('description', current[2] if current else '') or ''
+        instance = changes.model(pk=pk, name=name, description=description)
+        if changes.parent_field:
+            setattr(instance, changes.parent_field, parent)
+
+        if pk is None:
+            changes.created.append(instance)
+        else:
+            changes.matched.add(pk)
+            if parent_id != current[1]:
+                changes.moved.append(pk)
+            if (name, parent_id, description) != current:
+                changes.updated.append(instance)
+        return instance
+
+    def _natural_key_index(self, level):
+        index = self._keys[level]
+        if not index:
+            index.update({(name, parent_id): pk for pk, (name, parent_id, _) in self.levels[level].existing.items()})
+        return index
+
+    def _plan_deletes(self, managed):
+        """Удаление отсутствующих в файле записей, кроме тех, на которые ссылаются операции (PROTECT)"""
+        candidates = {
+            key: {pk for pk in self.levels[key].existing if pk not in self.levels[key].matched}
+            for key in managed
+        }
+        kept = {key: set() for key in self.levels}
+        for key, pks in candidates.items():
+            if pks:
+                referenced = MoneyMovement.objects.order_by().values_list(MOVEMENT_REFERENCES[key], flat=True)
+                kept[key] = pks.intersection(referenced.distinct())
+
+        # Оставленная запись сохраняет своего родителя (удаление родителя удалило бы ее каскадом)
+        for key, parent_key in (('subcategories', 'categories'), ('categories', 'operation_types')):
+            existing = self.levels[key].existing
+            for pk in kept[key]:
+                parent_id = existing[pk][1]
+                if parent_id in candidates.get(parent_key, ()):
+                    kept[parent_key].add(parent_id)
+
+        for key, pks in candidates.items():
+            changes = self.levels[key]
+            for pk in sorted(pks):
+                target = changes.protected if pk in kept[key] else changes.deleted
+                target[pk] = changes.existing[pk][0]
+
+    @property
+    def has_changes(self):
+        return any(changes.created or changes.updated or changes.deleted for changes in self.levels.values())
+
+    def apply(self):
+        """
+        Применение плана в одной транзакции; возвращает число операций, исправленных после переноса
+
+        Уровни обрабатываются сверху вниз (bulk_update, затем bulk_create -
+        новые записи получают ID родителей, созданных на предыдущем шаге),
+        удаление - снизу вверх. Операции перенесенных категорий и подкатегорий
+        получают тип операции и категорию по подкатегории.
+        """
+        try:
+            with transaction.atomic():
+                for key, *_ in TAXONOMY_LEVELS:
+                    changes = self.levels[key]
+                    if changes.updated:
+                        changes.model.objects.bulk_update(changes.updated, changes.update_fields)
+                    if changes.created:
+                        changes.model.objects.bulk_create(changes.created)
+                for key, *_ in reversed(TAXONOMY_LEVELS):
+                    changes = self.levels[key]
+                    if changes.deleted:
+                        changes.model.objects.filter(pk__in=list(changes.deleted)).delete()
+
+                moved = Q(category_id__in=self.levels['categories'].moved) | Q(
+                    subcategory_id__in=self.levels['subcategories'].moved)
+                fixed = 0
+                if self.levels['categories'].moved or self.levels['subcategories'].moved:
+                    fixed = fix_violations(MoneyMovement.objects.filter(moved))
+                # Массовые операции не вызывают сигналы моделей - кэш дерева сбрасывается здесь
+                transaction.on_commit(bump_taxonomy_version)
+        except IntegrityError as e:
+            raise TaxonomySyncError(f"Изменения нарушают уникальность названий: {e}") from e
+        return fixed
@@ -1,3 +1,2172 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import io
+import json
+import os
+import pstats
+import queue
+import runpy
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import ConnectionDoesNotExist, load_backend
+from django.db.models import Avg, F, Sum, Value
+from django.db.models.functions import Concat
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+
+from .admin import (
+    StatusAdmin, OperationTypeAdmin, CategoryAdmin, SubcategoryAdmin, MoneyMovementAdmin, MovementAuditEntryAdmin,
+    SavedReportAdmin, JobAdmin, SlowQueryAdmin,
+)
+from .audit import summarize_violations
+from .auditlog import audit_log
+from .management.commands import loadtest
+from .backup import BackupError, backup_database, list_snapshots, snapshot_database
+from .autocomplete_views import CategoryAutocomplete, SubcategoryAutocomplete
+from .events import broker
+from .fragments import FragmentCache, movement_fragments
+from . import renderers
+from . import batch, slowlog
+from .jobs import EXPORT_FIELDS, JOB_HANDLERS, JobContext, claim_job, import_movements
+from .middleware import negotiate_encoding
+from .models import (
+    Status, OperationType, Category, Subcategory, MoneyMovement, MovementAuditEntry, MovementStatsBucket, SavedReport,
+    Job, SlowQuery, PENDING_FINGERPRINT, date_buckets,
+)
+from .renderers import FastJSONRenderer
+from .reports import refresh_report
+from .series import Bucket, choose_bucket
+from .schema import get_prebuilt_schema
+from .taxonomy import get_taxonomy_tree, get_taxonomy_version
+from .warmup import warm_up, warm_up_enabled
+from .serializers import MoneyMovementSerializer
+from .writequeue import WriteCoalescer, coalesced_write
+
+# Размеры данных и страниц: число запросов не должно зависеть ни от одного из них
+DATASET_SIZES = [10, 120]
+PAGE_SIZES = [5, 25, 100]
+
+# Бюджеты задержки (медиана, мс) на сгенерированных данных;
+# DDS_LATENCY_BUDGET_SCALE увеличивает их для медленных машин сборки
+LATENCY_DATASET_SIZE = 3000
+LATENCY_BUDGET_SCALE = float(os.environ.get('DDS_LATENCY_BUDGET_SCALE', '1'))
+LATENCY_REPEATS = 7
+
+
+def create_taxonomy():
+    """Справочники: 2 статуса, 2 типа операций по 3 категории, по 2 подкатегории в каждой"""
+    statuses = [Status.objects.create(name=name) for name in ('Бизнес', 'Личное')]
+    subcategories = []
+    for op_name in ('Пополнение', 'Списание'):
+        op_type = OperationType.objects.create(name=op_name)
+        for i in range(3):
+            category = Category.objects.create(name=f'{op_name} {i}', operation_type=op_type)
+            for j in range(2):
+                subcategories.append(Subcategory.objects.create(name=f'{category.name}.{j}', category=category))
+    return statuses, subcategories
+
+
+def create_movements(count, statuses, subcategories):
+    """Массовое создание операций с равномерно распределенными справочниками и датами"""
+    now = timezone.now()
+    MoneyMovement.objects.bulk_create([
+        MoneyMovement(
+            created_date=now - timedelta(hours=i),
+            status=statuses[i % len(statuses)],
+            operation_type=subcategories[i % len(subcategories)].category.operation_type,
+            category=subcategories[i % len(subcategories)].category,
+            subcategory=subcategories[i % len(subcategories)],
+            amount=Decimal(100 + i) / 100,
+            comment=f'Операция {i}',
+        )
+        for i in range(count)
+    ])
+
+
+class CleanStateMixin:
+    """Пустые кэши и буфер журнала изменений перед каждым тестом"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        movement_fragments.clear()
+        audit_log.clear()
+        # Буфер журнала не должен пережить тест: при выходе он сохранился бы в основную БД
+        self.addCleanup(audit_log.clear)
+
+
+@override_settings(DDS_SLOW_QUERY_MS=None, DDS_QUERY_COUNT_HEADER=False, DDS_PROFILING_ENABLED=False)
+class PerformanceTestCase(CleanStateMixin, TestCase):
+    """Общая подготовка: справочники, сотрудник для админки, пустые кэши"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.statuses, cls.subcategories = create_taxonomy()
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def grow_dataset(self, size):
+        """Доведение числа записей каждой модели (справочники, операции, задачи, журнал) до size"""
+        Status.objects.bulk_create([Status(name=f'Статус {i}') for i in range(Status.objects.count(), size)])
+        OperationType.objects.bulk_create([
+            OperationType(name=f'Тип {i}') for i in range(OperationType.objects.count(), size)
+        ])
+        op_types = list(OperationType.objects.all())
+        Category.objects.bulk_create([
+            Category(name=f'Категория {i}', operation_type=op_types[i % len(op_types)])
+            for i in range(Category.objects.count(), size)
+        ])
+        categories = list(Category.objects.all())
+        Subcategory.objects.bulk_create([
+            Subcategory(name=f'Подкатегория {i}', category=categories[i % len(categories)])
+            for i in range(Subcategory.objects.count(), size)
+        ])
+        create_movements(size - MoneyMovement.objects.count(), self.statuses, self.subcategories)
+        Job.objects.bulk_create([Job(kind='export_movements') for _ in range(size - Job.objects.count())])
+        SlowQuery.objects.bulk_create([
+            SlowQuery(fingerprint=f'{i:040x}', sql=f'SELECT {i}')
+            for i in range(SlowQuery.objects.count(), size)
+        ])
+        MovementAuditEntry.objects.bulk_create([
+            MovementAuditEntry(movement_id=i, action='updated', source='api', changes={}, created_at=timezone.now())
+            for i in range(MovementAuditEntry.objects.count(), size)
+        ])
+        SavedReport.objects.bulk_create([
+            SavedReport(name=f'Отчет {i}', group_by=['category']) for i in range(SavedReport.objects.count(), size)
+        ])
+
+    def get(self, url, **extra):
+        response = self.client.get(url, **extra)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, url)
+        return response
+
+
+class QueryCountTests(PerformanceTestCase):
+    """
+    Точное число SQL-запросов для каждого представления
+
+    Число не должно расти ни с объемом данных, ни с размером страницы:
+    рост означает N+1 (например, новое поле сериализатора или колонку админки
+    без select_related/prefetch_related). В число входят запросы сессии и
+    пользователя, выполняемые middleware.
+    """
+
+    def assertQueriesConstant(self, url, expected, page_size_patch=None):
+        for size in DATASET_SIZES:
+            self.grow_dataset(size)
+            for page_size in PAGE_SIZES:
+                with self.subTest(url=url, rows=size, page_size=page_size):
+                    with mock.patch.object(*page_size_patch, page_size) if page_size_patch else nullcontext():
+                        cache.clear()
+                        movement_fragments.clear()
+                        with self.assertNumQueries(expected):
+                            self.get(url)
+
+    def assertApiQueries(self, url, expected):
+        self.assertQueriesConstant(url, expected, (PageNumberPagination, 'page_size'))
+
+    def test_statuses(self):
+        self.assertApiQueries('/dds/api/statuses/', 4)
+
+    def test_operation_types(self):
+        self.assertApiQueries('/dds/api/operation_types/', 4)
+
+    def test_categories(self):
+        self.assertApiQueries('/dds/api/categories/', 4)
+
+    def test_subcategories(self):
+        self.assertApiQueries('/dds/api/subcategories/', 4)
+
+    def test_money_movements_list(self):
+        self.assertApiQueries('/dds/api/money_movements/', 5)
+
+    def test_money_movements_list_filtered(self):
+        category = self.subcategories[0].category
+        self.assertApiQueries(f'/dds/api/money_movements/?category={category.pk}&search=Операция&ordering=amount', 6)
+
+    def test_money_movements_list_cached_fragments(self):
+        """Повторный запрос страницы: записи берутся из кэша фрагментов"""
+        for size in DATASET_SIZES:
+            self.grow_dataset(size)
+            for page_size in PAGE_SIZES:
+                with self.subTest(rows=size, page_size=page_size), \
+                        mock.patch.object(PageNumberPagination, 'page_size', page_size):
+                    self.get('/dds/api/money_movements/')
+                    with self.assertNumQueries(4):
+                        self.get('/dds/api/money_movements/')
+
+    def test_money_movements_ndjson(self):
+        self.assertQueriesConstant('/dds/api/money_movements/?format=ndjson', 3)
+
+    def test_money_movement_detail(self):
+        self.grow_dataset(DATASET_SIZES[0])
+        movement = MoneyMovement.objects.first()
+        with self.assertNumQueries(3):
+            self.get(f'/dds/api/money_movements/{movement.pk}/')
+
+    def test_money_movement_changes(self):
+        self.assertQueriesConstant('/dds/api/money_movements/changes/?limit=50', 4)
+
+    def test_taxonomy(self):
+        self.assertQueriesConstant('/dds/api/taxonomy/', 6)
+
+    def test_taxonomy_cached(self):
+        """Повторный запрос дерева справочников не обращается к таблицам справочников"""
+        self.grow_dataset(DATASET_SIZES[-1])
+        self.get('/dds/api/taxonomy/')
+        with self.assertNumQueries(2):
+            self.get('/dds/api/taxonomy/')
+
+    def test_jobs(self):
+        self.assertApiQueries('/dds/api/jobs/', 4)
+
+    def test_category_autocomplete(self):
+        op_type = self.subcategories[0].category.operation_type
+        self.assertQueriesConstant(
+            f'/dds/category-autocomplete/?forward={{"operation_type": "{op_type.pk}"}}', 2,
+            (CategoryAutocomplete, 'paginate_by'),
+        )
+
+    def test_subcategory_autocomplete(self):
+        category = self.subcategories[0].category
+        self.assertQueriesConstant(
+            f'/dds/subcategory-autocomplete/?forward={{"category": "{category.pk}"}}&q=.', 2,
+            (SubcategoryAutocomplete, 'paginate_by'),
+        )
+
+
+class AdminQueryCountTests(PerformanceTestCase):
+    """Число SQL-запросов страниц списков админки при разном объеме данных и размере страницы"""
+
+    def assertChangelistQueries(self, url, admin_class, expected):
+        for size in DATASET_SIZES:
+            self.grow_dataset(size)
+            for page_size in PAGE_SIZES:
+                with self.subTest(url=url, rows=size, page_size=page_size), \
+                        mock.patch.object(admin_class, 'list_per_page', page_size):
+                    with self.assertNumQueries(expected):
+                        self.get(url)
+
+    def test_status_changelist(self):
+        self.assertChangelistQueries('/admin/dds/status/', StatusAdmin, 5)
+
+    def test_operation_type_changelist(self):
+        self.assertChangelistQueries('/admin/dds/operationtype/', OperationTypeAdmin, 5)
+
+    def test_category_changelist(self):
+        self.assertChangelistQueries('/admin/dds/category/', CategoryAdmin, 6)
+
+    def test_subcategory_changelist(self):
+        self.assertChangelistQueries('/admin/dds/subcategory/', SubcategoryAdmin, 7)
+
+    def test_money_movement_changelist(self):
+        self.assertChangelistQueries('/admin/dds/moneymovement/', MoneyMovementAdmin, 11)
+
+    def test_job_changelist(self):
+        self.assertChangelistQueries('/admin/dds/job/', JobAdmin, 6)
+
+    def test_slow_query_changelist(self):
+        self.assertChangelistQueries('/admin/dds/slowquery/', SlowQueryAdmin, 5)
+
+    def test_saved_report_changelist(self):
+        self.assertChangelistQueries('/admin/dds/savedreport/', SavedReportAdmin, 5)
+
+    def test_movement_audit_entry_changelist(self):
+        self.assertChangelistQueries('/admin/dds/movementauditentry/', MovementAuditEntryAdmin, 6)
+
+
+class LatencyBudgetTests(PerformanceTestCase):
+    """
+    Бюджеты задержки на сгенерированных данных
+
+    Медиана нескольких запросов сравнивается с бюджетом; первый запрос
+    прогревает кэши процесса и не учитывается.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_movements(LATENCY_DATASET_SIZE, cls.statuses, cls.subcategories)
+
+    def assertLatency(self, url, budget_ms):
+        self.get(url)
+        timings = []
+        for _ in range(LATENCY_REPEATS):
+            started = time.perf_counter()
+            self.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        median = statistics.median(timings)
+        limit = budget_ms * LATENCY_BUDGET_SCALE
+        self.assertLessEqual(median, limit, f"{url}: медиана {median:.1f} мс при бюджете {limit:.0f} мс")
+
+    def test_money_movements_list(self):
+        self.assertLatency('/dds/api/money_movements/', 25)
+
+    def test_money_movements_last_page(self):
+        last_page = -(-LATENCY_DATASET_SIZE // PageNumberPagination.page_size)
+        self.assertLatency(f'/dds/api/money_movements/?page={last_page}', 30)
+
+    def test_money_movements_filtered(self):
+        category = self.subcategories[0].category
+        today = timezone.localdate()
+        self.assertLatency(
+            f'/dds/api/money_movements/?category={category.pk}&created_date_after={today - timedelta(days=30)}'
+            f'&created_date_before={today}&ordering=-amount', 40,
+        )
+
+    def test_money_movements_search(self):
+        self.assertLatency('/dds/api/money_movements/?search=Операция 29', 50)
+
+    def test_money_movements_changes(self):
+        self.assertLatency('/dds/api/money_movements/changes/?limit=500', 200)
+
+    def test_taxonomy(self):
+        self.assertLatency('/dds/api/taxonomy/', 15)
+
+    def test_money_movement_changelist(self):
+        self.assertLatency('/admin/dds/moneymovement/', 200)
+
+
+class HierarchyAuditTests(PerformanceTestCase):
+    """Проверка и исправление иерархии справочников операций запросами с соединениями"""
+
+    def setUp(self):
+        super().setUp()
+        self.grow_dataset(DATASET_SIZES[0])
+        movements = list(MoneyMovement.objects.order_by('id'))
+        foreign = next(sub for sub in self.subcategories if sub.category_id != movements[0].category_id)
+        # Нарушения, которые MoneyMovement.save() не пропустил бы
+        MoneyMovement.objects.filter(pk=movements[0].pk).update(subcategory=foreign)
+        other_type = OperationType.objects.exclude(pk=movements[1].operation_type_id).first()
+        MoneyMovement.objects.filter(pk=movements[1].pk).update(operation_type=other_type)
+        self.broken = [movements[0].pk, movements[1].pk]
+
+    def test_audit_endpoint_streams_violations(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/dds/api/money_movements/audit/')
+            content = b''.join(response.streaming_content)
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['id'] for row in rows], self.broken)
+        self.assertEqual(rows[0]['problems'], ['subcategory_not_in_category'])
+        self.assertEqual(rows[1]['problems'], ['category_not_in_operation_type'])
+
+    def test_audit_fix(self):
+        response = self.client.post('/dds/api/money_movements/audit/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 2)
+        self.assertEqual(response.json()['fixed'], 2)
+        for movement in MoneyMovement.objects.filter(pk__in=self.broken):
+            movement.full_clean()
+        self.assertEqual(summarize_violations()['total'], 0)
+
+    def test_audit_requires_staff(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/dds/api/money_movements/audit/').status_code, 403)
+        self.assertEqual(self.client.post('/dds/api/money_movements/audit/').status_code, 403)
+
+    def test_audit_command(self):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('audit_movements', '--fix', stdout=stdout, stderr=stderr)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 1 + len(self.broken))
+        self.assertIn('Исправлено операций: 2', stderr.getvalue())
+        self.assertEqual(summarize_violations()['total'], 0)
+
+
+class DuplicateTests(PerformanceTestCase):
+    """Поиск дубликатов по индексированному отпечатку содержимого"""
+
+    def setUp(self):
+        super().setUp()
+        self.subcategory = self.subcategories[0]
+        self.movement = MoneyMovement.objects.create(
+            status=self.statuses[0], operation_type=self.subcategory.category.operation_type,
+            category=self.subcategory.category, subcategory=self.subcategory,
+            amount=Decimal('1500.00'), comment='Оплата  рекламы',
+        )
+        self.payload = {
+            'created_date': self.movement.created_date.isoformat(),
+            'status': self.statuses[0].pk,
+            'operation_type': self.subcategory.category.operation_type_id,
+            'category': self.subcategory.category_id,
+            'subcategory': self.subcategory.pk,
+            'amount': '1500.0',
+            'comment': ' оплата рекламы ',
+        }
+
+    def post(self, policy):
+        return self.client.post(f'/dds/api/money_movements/?duplicates={policy}', self.payload,
+                                content_type='application/json')
+
+    def test_fingerprint_maintained(self):
+        fingerprint = self.movement.fingerprint
+        self.assertEqual(len(fingerprint), 40)
+        MoneyMovement.objects.filter(pk=self.movement.pk).update(comment='Другая')
+        self.movement.refresh_from_db()
+        self.assertNotEqual(self.movement.fingerprint, fingerprint)
+        self.movement.comment = 'ОПЛАТА рекламы'
+        MoneyMovement.objects.bulk_update([self.movement], ['comment'])
+        self.movement.refresh_from_db()
+        self.assertEqual(self.movement.fingerprint, fingerprint)
+
+    def test_bulk_update_binds_bounded_params(self):
+        create_movements(2500, self.statuses, self.subcategories)
+        largest = []
+
+        def record_params(execute, sql, params, many, context):
+            largest.append(max(map(len, params)) if many else len(params or ()))
+            return execute(sql, params, many, context)
+
+        # Пересчет отпечатков не подставляет в запрос список всех измененных ID
+        with connection.execute_wrapper(record_params):
+            updated = MoneyMovement.objects.filter(operation_type=self.subcategory.category.operation_type).update(
+                comment=Concat('comment', Value(' ')),
+            )
+        self.assertGreater(updated, 999)
+        self.assertLessEqual(max(largest), 999)
+        self.assertFalse(MoneyMovement.objects.filter(fingerprint=PENDING_FINGERPRINT).exists())
+        for movement in MoneyMovement.objects.filter(comment__endswith=' ')[:5]:
+            expected = movement.fingerprint
+            movement.fill_fingerprint()
+            self.assertEqual(movement.fingerprint, expected)
+
+    def test_create_policies(self):
+        response = self.post('reject')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['duplicate_of'], self.movement.pk)
+
+        response = self.post('merge')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.movement.pk)
+        self.assertEqual(MoneyMovement.objects.count(), 1)
+
+        response = self.post('flag')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['X-DDS-Duplicate-Of'], str(self.movement.pk))
+        self.assertEqual(self.post('allow').status_code, 201)
+        self.assertEqual(self.post('unknown').status_code, 400)
+        self.assertEqual(MoneyMovement.objects.filter(fingerprint=self.movement.fingerprint).count(), 3)
+
+    def test_duplicates_report(self):
+        self.post('allow')
+        create_movements(30, self.statuses, self.subcategories)
+        create_movements(30, self.statuses, self.subcategories)
+        with self.assertNumQueries(5):
+            response = self.get('/dds/api/money_movements/duplicates/')
+        data = response.json()
+        self.assertEqual(data['count'], 31)
+        self.assertEqual(data['results'][0]['count'], 2)
+        self.assertEqual(len(data['results'][0]['movements']), 2)
+
+    def test_import_policies(self):
+        fields = ['created_date', 'status', 'operation_type', 'category', 'subcategory', 'amount', 'comment']
+        unique = {**self.payload, 'comment': 'Новая'}
+        content = '\n'.join(
+            [','.join(fields)] + [','.join(str(row[field]) for field in fields) for row in (self.payload, unique, unique)]
+        ).encode('utf-8')
+
+        def run(policy):
+            job = mock.Mock(params={'duplicates': policy}, source=ContentFile(content))
+            return import_movements(job, mock.Mock())
+
+        with self.assertRaisesMessage(ValueError, 'Строка 2: дубликат'):
+            run('reject')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIn('пропущено дубликатов: 2', run('merge'))
+        lookups = [query for query in queries if '"fingerprint" IN' in query['sql']]
+        self.assertEqual(len(lookups), 1)  # Одна проверка на порцию строк, а не на строку
+        self.assertEqual(MoneyMovement.objects.count(), 2)
+
+    @mock.patch('dds.jobs.IMPORT_BATCH_SIZE', 2)
+    def test_import_in_batches(self):
+        fields = ['created_date', 'status', 'operation_type', 'category', 'subcategory', 'amount', 'comment']
+        rows = [{**self.payload, 'comment': f'Порция {i}'} for i in range(4)]
+
+        def run(rows, policy='merge'):
+            content = '\n'.join(
+                [','.join(fields)] + [','.join(str(row[field]) for field in fields) for row in rows]
+            ).encode('utf-8')
+            job = mock.Mock(params={'duplicates': policy}, source=ContentFile(content))
+            return import_movements(job, mock.Mock())
+
+        count = MoneyMovement.objects.count()
+        # Ошибка в последней порции откатывает уже сохраненные
+        with self.assertRaisesMessage(ValueError, 'Строка 6'):
+            run([*rows, {**self.payload, 'amount': 'abc'}])
+        self.assertEqual(MoneyMovement.objects.count(), count)
+
+        # Повтор строки из прежней порции - дубликат строки файла, а не сохраненной операции
+        self.assertEqual(run([*rows, rows[0]], 'flag'),
+                         'Загружено записей: 5, из них дубликаты: строка 6 (строка 2)')
+        self.assertEqual(MoneyMovement.objects.count(), count + 5)
+
+
+class SeriesTests(PerformanceTestCase):
+    """Ряд для графиков: не больше заданного числа точек за постоянное число запросов"""
+
+    def setUp(self):
+        super().setUp()
+        create_movements(DATASET_SIZES[1], self.statuses, self.subcategories)
+
+    def test_bucket_width(self):
+        start = date(2015, 1, 1)
+        self.assertEqual(choose_bucket(start, date(2015, 1, 31), 100), Bucket('day', 1))
+        self.assertEqual(choose_bucket(start, date(2015, 6, 30), 100).size, 7)
+        self.assertEqual(choose_bucket(start, date(2024, 12, 31), 100), Bucket('month', 3))
+        self.assertEqual(choose_bucket(start, date(2024, 12, 31), 5), Bucket('month', 36))
+        for end in (date(2015, 1, 1), date(2016, 2, 29), date(2114, 12, 31)):
+            for points in (1, 7, 50):
+                self.assertLessEqual(choose_bucket(start, end, points).count(start, end), points)
+
+    def test_series_endpoint(self):
+        for after, points in (('2025-01-01', 10), ('1925-01-01', 10), ('1925-01-01', 1000)):
+            with self.assertNumQueries(3):
+                response = self.get(
+                    f'/dds/api/money_movements/series/?points={points}'
+                    f'&created_date_after={after}&created_date_before=2030-12-31'
+                )
+            data = response.json()
+            self.assertLessEqual(len(data['points']), points)
+            self.assertEqual(sum(point['count'] for point in data['points']), DATASET_SIZES[1])
+
+        totals = MoneyMovement.objects.aggregate(total=Sum('amount'))
+        data = self.get('/dds/api/money_movements/series/?points=3').json()
+        self.assertEqual(
+            sum(Decimal(point['income']) + Decimal(point['expense']) for point in data['points']), totals['total'],
+        )
+        income = MoneyMovement.objects.filter(operation_type__name='Пополнение').aggregate(total=Sum('amount'))
+        self.assertEqual(sum(Decimal(point['income']) for point in data['points']), income['total'])
+        self.assertEqual(self.client.get('/dds/api/money_movements/series/?points=0').status_code, 400)
+
+
+class StatisticsTests(PerformanceTestCase):
+    """Квантили и наибольшие суммы из помесячных сводок с ограниченной ошибкой"""
+
+    url = '/dds/api/money_movements/statistics/'
+
+    def setUp(self):
+        super().setUp()
+        create_movements(DATASET_SIZES[1], self.statuses, self.subcategories)
+        create_movements(DATASET_SIZES[1], self.statuses, self.subcategories)
+
+    def assertMatchesExact(self, group, movements):
+        amounts = sorted(movement.amount for movement in movements)
+        self.assertEqual(group['count'], len(amounts))
+        self.assertEqual(Decimal(group['total']), sum(amounts))
+        for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+            exact = amounts[int(q * (len(amounts) - 1))]
+            # Относительная ошибка эскиза плюс округление до копейки
+            self.assertLessEqual(abs(Decimal(group['quantiles'][name]) - exact), exact * Decimal('0.01') + Decimal('0.01'))
+        largest = sorted(movements, key=lambda movement: (movement.amount, movement.pk), reverse=True)[:5]
+        self.assertEqual([item['id'] for item in group['top']], [movement.pk for movement in largest])
+
+    def test_statistics_match_exact_values(self):
+        with self.assertNumQueries(3):
+            data = self.get(f'{self.url}?top=5').json()
+        self.assertMatchesExact(data['groups'][0], list(MoneyMovement.objects.all()))
+
+        data = self.get(f'{self.url}?top=5&group_by=category').json()
+        self.assertEqual(len(data['groups']), Category.objects.count())
+        for group in data['groups']:
+            self.assertMatchesExact(group, list(MoneyMovement.objects.filter(category=group['category'])))
+
+    def test_changes_mark_buckets_stale(self):
+        movement = MoneyMovement.objects.order_by('-amount').first()
+        movement.amount = Decimal('100000.00')
+        movement.save()
+        MoneyMovement.objects.order_by('amount')[0].delete()
+        MoneyMovement.objects.filter(pk__in=list(MoneyMovement.objects.values_list('pk', flat=True)[:10])).update(
+            created_date=timezone.now() - timedelta(days=400),
+        )
+        self.assertTrue(MovementStatsBucket.objects.filter(dirty=True).exists())
+
+        data = self.get(f'{self.url}?top=5&group_by=month').json()
+        self.assertFalse(MovementStatsBucket.objects.filter(dirty=True).exists())
+        for group in data['groups']:
+            month = date.fromisoformat(group['month'])
+            self.assertMatchesExact(group, list(MoneyMovement.objects.filter(created_month=month)))
+        self.assertEqual(sum(group['count'] for group in data['groups']), MoneyMovement.objects.count())
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(f'{self.url}?group_by=status').status_code, 400)
+        self.assertEqual(self.client.get(f'{self.url}?top=1000').status_code, 400)
+        self.assertEqual(self.client.get(f'{self.url}?status={self.statuses[0].pk}').status_code, 400)
+
+
+class FastRenderingTests(PerformanceTestCase):
+    """Быстрая сериализация, рендерер и сжатие дают те же данные, что и стандартный путь DRF"""
+
+    url = '/dds/api/money_movements/'
+
+    def setUp(self):
+        super().setUp()
+        create_movements(DATASET_SIZES[1], self.statuses, self.subcategories)
+        MoneyMovement.objects.filter(pk=MoneyMovement.objects.first().pk).update(comment='Строка\u2028с разделителем')
+
+    def test_serializer_fast_path_matches_drf(self):
+        movements = list(MoneyMovement.objects.select_related('status', 'operation_type', 'category', 'subcategory'))
+        serializer = MoneyMovementSerializer()
+        expected = [serializers.ModelSerializer.to_representation(serializer, obj) for obj in movements]
+        self.assertEqual(MoneyMovementSerializer(movements, many=True).data, expected)
+        with timezone.override('Europe/Moscow'):
+            self.assertEqual(
+                MoneyMovementSerializer(movements[0]).data['created_date'],
+                serializers.DateTimeField().to_representation(movements[0].created_date),
+            )
+
+    def test_renderer_matches_json_renderer(self):
+        data = MoneyMovementSerializer(MoneyMovement.objects.all(), many=True).data
+        payload = {'results': data, 'amount': Decimal('1.50'), 'when': timezone.now(), 'day': date.today(), 2: None}
+        expected = JSONRenderer().render(payload)
+        self.assertEqual(FastJSONRenderer().render(payload), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(payload), expected)
+
+    def test_stdlib_encoder_is_reused(self):
+        default = renderers.encoder_default(FastJSONRenderer.encoder_class)
+        self.assertIs(renderers.encoder_default(FastJSONRenderer.encoder_class), default)
+        encoder = renderers.stdlib_encoder(default)
+        self.assertIs(renderers.stdlib_encoder(default), encoder)
+        self.assertFalse(encoder.check_circular)
+        with mock.patch.object(renderers, 'orjson', None), \
+                mock.patch.object(json.JSONEncoder, 'encode', autospec=True, side_effect=json.JSONEncoder.encode) as encode:
+            FastJSONRenderer().render({'amount': Decimal('1.50')})
+            FastJSONRenderer().render({'amount': Decimal('2.50')})
+        self.assertEqual([call.args[0] for call in encode.call_args_list], [encoder, encoder])
+
+    @mock.patch.object(PageNumberPagination, 'page_size', 100)
+    def test_gzip_compression(self):
+        plain = self.client.get(self.url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        small = self.client.get(f'{self.url}{MoneyMovement.objects.first().pk}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(small.has_header('Content-Encoding'))
+        html = self.client.get('/admin/dds/moneymovement/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(html.has_header('Content-Encoding'))
+
+        stream = self.client.get(self.url, HTTP_ACCEPT='application/x-ndjson', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(stream['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(stream.streaming_content)).splitlines()
+        self.assertEqual(len(lines), DATASET_SIZES[1])
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(negotiate_encoding('*;q=0.5'), negotiate_encoding('br, gzip'))
+        self.assertIsNone(negotiate_encoding('gzip;q=0, identity'))
+        self.assertIsNone(negotiate_encoding(''))
+
+
+class AuditLogTests(PerformanceTestCase):
+    """Журнал изменений: различия до/после из API, админки и массовых операций через буфер"""
+
+    url = '/dds/api/audit_log/'
+
+    def setUp(self):
+        super().setUp()
+        # Без фонового потока: записи сохраняются сбросом буфера в потоке теста
+        patcher = mock.patch.object(audit_log, 'flush_interval', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.subcategory = self.subcategories[0]
+        self.payload = {
+            'status': self.statuses[0].pk,
+            'operation_type': self.subcategory.category.operation_type_id,
+            'category': self.subcategory.category_id,
+            'subcategory': self.subcategory.pk,
+            'amount': '1500.00',
+            'comment': 'Оплата рекламы',
+        }
+
+    def entries(self, **filters):
+        audit_log.flush()
+        return list(MovementAuditEntry.objects.filter(**filters).order_by('id'))
+
+    def test_api_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pk = self.client.post('/dds/api/money_movements/', self.payload, content_type='application/json').json()['id']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f'/dds/api/money_movements/{pk}/', {**self.payload, 'amount': '2000.00'},
+                                       content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content.decode())
+        # Повторное сохранение без изменений в журнал не попадает
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f'/dds/api/money_movements/{pk}/', {**self.payload, 'amount': '2000'},
+                            content_type='application/json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/dds/api/money_movements/{pk}/')
+
+        created, updated, deleted = self.entries(movement_id=pk)
+        self.assertEqual([created.action, updated.action, deleted.action], ['created', 'updated', 'deleted'])
+        self.assertEqual({entry.source for entry in (created, updated, deleted)}, {'api'})
+        self.assertEqual((updated.user_id, updated.username), (self.user.pk, 'admin'))
+        self.assertEqual(list(updated.changes), ['amount'])
+        self.assertEqual([Decimal(value) for value in updated.changes['amount']], [Decimal('1500'), Decimal('2000')])
+        self.assertEqual(created.changes['comment'], [None, 'Оплата рекламы'])
+        self.assertEqual(deleted.changes['comment'], ['Оплата рекламы', None])
+
+    def test_background_flush_by_default(self):
+        with mock.patch.object(sys, 'argv', ['manage.py', 'runserver']):
+            values = runpy.run_path(os.path.join(settings.BASE_DIR, 'dds_project', 'settings.py'))
+        self.assertEqual(values['DDS_AUDIT_FLUSH_INTERVAL'], 1.0)
+
+        # С фоновым потоком запрос только кладет записи в буфер
+        with mock.patch.object(audit_log, 'flush_interval', 1.0), \
+                mock.patch.object(audit_log, '_ensure_started') as ensure_started, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/dds/api/money_movements/', self.payload)
+        self.assertEqual(response.status_code, 201)
+        ensure_started.assert_called_once()
+        self.assertEqual(audit_log.pending(), 1)
+        self.assertFalse(MovementAuditEntry.objects.exists())
+
+    def test_admin_and_bulk_changes(self):
+        create_movements(5, self.statuses, self.subcategories)
+        first, second, *rest = MoneyMovement.objects.order_by('pk')
+        audit_log.clear()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/admin/dds/moneymovement/{first.pk}/delete/', {'post': 'yes'})
+        with self.captureOnCommitCallbacks(execute=True):
+            second.comment = 'Исправлено'
+            MoneyMovement.objects.bulk_update([second], ['comment'])
+        with self.captureOnCommitCallbacks(execute=True):
+            MoneyMovement.objects.filter(pk__in=[movement.pk for movement in rest]).update(amount=Decimal('7.00'))
+
+        self.assertEqual(self.entries(movement_id=first.pk)[0].source, 'admin')
+        self.assertEqual(self.entries(movement_id=second.pk)[0].changes, {'comment': ['Операция 1', 'Исправлено']})
+        # Массовый UPDATE - запись по каждой строке с прежним значением
+        entries = self.entries(action='updated', source='system', movement_id__in=[movement.pk for movement in rest])
+        self.assertEqual(sorted(entry.movement_id for entry in entries), [movement.pk for movement in rest])
+        for entry, movement in zip(sorted(entries, key=lambda entry: entry.movement_id), rest):
+            self.assertEqual(entry.changes, {'amount': [str(movement.amount), '7.00']})
+        self.assertFalse(self.entries(action='bulk'))
+
+    @override_settings(DDS_AUDIT_BATCH_SIZE=2)
+    def test_queryset_update_records_each_row(self):
+        create_movements(5, self.statuses, self.subcategories)
+        movements = list(MoneyMovement.objects.order_by('pk'))
+        audit_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                updated = MoneyMovement.objects.filter(pk__in=[movement.pk for movement in movements]).update(
+                    comment=Concat(F('comment'), Value('!')))
+        self.assertEqual(updated, 5)
+        # Прежние значения - один запрос до UPDATE, новые - порциями после него
+        reads = [query for query in queries if 'AS "pk", "dds_moneymovement"."comment" AS "comment" FROM' in query['sql']]
+        self.assertEqual(len(reads), 1 + 3)
+        entries = self.entries(action='updated')
+        self.assertEqual([entry.movement_id for entry in entries], [movement.pk for movement in movements])
+        self.assertEqual(entries[0].changes, {'comment': [movements[0].comment, movements[0].comment + '!']})
+
+    @override_settings(DDS_AUDIT_BATCH_SIZE=2)
+    def test_bulk_update_reads_previous_values_in_chunks(self):
+        create_movements(5, self.statuses, self.subcategories)
+        movements = list(MoneyMovement.objects.order_by('pk'))
+        audit_log.clear()
+        for movement in movements:
+            movement.comment += ' (исправлено)'
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                MoneyMovement.objects.bulk_update(movements, ['comment'])
+        previous = [query for query in queries if query['sql'].startswith('SELECT') and '"comment"' in query['sql']]
+        self.assertEqual(len(previous), 3)
+        entries = self.entries(action='updated')
+        self.assertEqual([entry.movement_id for entry in entries], [movement.pk for movement in movements])
+        self.assertFalse(self.entries(action='bulk'))
+
+    def test_endpoint_filters(self):
+        create_movements(3, self.statuses, self.subcategories)
+        movement = MoneyMovement.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                movement.comment = f'Правка {i}'
+                movement.save()
+        self.assertEqual(audit_log.pending(), 3)
+
+        with self.assertNumQueries(5):
+            data = self.get(f'{self.url}?movement={movement.pk}&action=updated').json()
+        self.assertEqual(audit_log.pending(), 0)
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['results'][0]['changes'], {'comment': ['Правка 1', 'Правка 2']})
+        self.assertEqual(self.get(f'{self.url}?source=admin').json()['count'], 0)
+
+        self.client.force_login(get_user_model().objects.create_user('user', password='password'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_full_buffer_writes_synchronously(self):
+        with mock.patch.object(audit_log, '_queue', queue.Queue(maxsize=2)):
+            with self.captureOnCommitCallbacks(execute=True):
+                create_movements(5, self.statuses, self.subcategories)
+            self.assertEqual(audit_log.pending(), 2)
+            self.assertEqual(MovementAuditEntry.objects.count(), 3)
+            audit_log.flush()
+        self.assertEqual(MovementAuditEntry.objects.filter(action='created').count(), 5)
+
+
+class TaxonomySyncTests(PerformanceTestCase):
+    """Синхронизация справочников с файлом за постоянное число запросов"""
+
+    def sync(self, tree, *args, suffix='.json'):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, encoding='utf-8', delete=False) as f:
+            if suffix == '.json':
+                json.dump(tree, f, ensure_ascii=False)
+            else:
+                import yaml
+                yaml.safe_dump(tree, f, allow_unicode=True)
+        self.addCleanup(os.remove, f.name)
+        stdout = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('initial', f.name, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_default_data_is_idempotent(self):
+        call_command('initial', stdout=io.StringIO())
+        self.assertEqual(Status.objects.count(), 3)
+        self.assertEqual(Subcategory.objects.filter(category__name='Маркетинг').count(), 3)
+        # Повторный запуск: только чтение справочников
+        with self.assertNumQueries(4):
+            output = io.StringIO()
+            call_command('initial', stdout=output)
+        self.assertIn('Подкатегории: создано 0, изменено 0, удалено 0', output.getvalue())
+
+    def test_sync_renames_moves_and_prunes(self):
+        create_movements(12, self.statuses, self.subcategories)
+        used, moved, unused = self.subcategories[0], self.subcategories[1], self.subcategories[2]
+        MoneyMovement.objects.filter(subcategory=unused).delete()
+        target = Category.objects.exclude(operation_type=moved.category.operation_type).first()
+        version = get_taxonomy_version()
+
+        tree = {
+            'statuses': [status.name for status in self.statuses],
+            'operation_types': [{
+                'name': used.category.operation_type.name,
+                'categories': [
+                    {'name': used.category.name, 'subcategories': [{'id': used.pk, 'name': 'Переименована'}]},
+                ],
+            }, {
+                'name': target.operation_type.name,
+                'description': 'Новое описание',
+                'categories': [
+                    {'name': target.name, 'subcategories': [{'id': moved.pk, 'name': moved.name}, 'Новая']},
+                ],
+            }],
+        }
+        output = self.sync(tree, '--prune', suffix='.yaml')
+
+        used.refresh_from_db()
+        self.assertEqual(used.name, 'Переименована')
+        self.assertEqual(Subcategory.objects.get(pk=moved.pk).category_id, target.pk)
+        # Операции перенесенной подкатегории следуют за ней
+        self.assertFalse(MoneyMovement.objects.filter(subcategory=moved).exclude(category=target).exists())
+        self.assertEqual(summarize_violations()['total'], 0)
+        self.assertTrue(Subcategory.objects.filter(name='Новая', category=target).exists())
+        self.assertFalse(Subcategory.objects.filter(pk=unused.pk).exists())
+        # На остальные подкатегории ссылаются операции (PROTECT) - они и их категории остаются
+        self.assertEqual(Subcategory.objects.count(), len(self.subcategories))
+        self.assertIn('Не удалены, есть операции', output)
+        self.assertEqual(OperationType.objects.get(pk=target.operation_type_id).description, 'Новое описание')
+        self.assertNotEqual(get_taxonomy_version(), version)
+
+        # Повторная синхронизация ничего не меняет
+        self.assertIn('Подкатегории: создано 0, изменено 0, удалено 0', self.sync(tree, '--prune'))
+
+    def test_invalid_files(self):
+        count = Subcategory.objects.count()
+        subcategory = {'name': 'Дубль'}
+        tree = {'operation_types': [{'name': 'Тип', 'categories': [{'name': 'К', 'subcategories': [subcategory] * 2}]}]}
+        with self.assertRaisesMessage(CommandError, 'встречается в файле дважды'):
+            self.sync(tree)
+        with self.assertRaisesMessage(CommandError, 'нет записи с id=0'):
+            self.sync({'statuses': [{'id': 0, 'name': 'Нет'}]})
+        with self.assertRaises(CommandError):
+            self.sync({'statuses': 'Бизнес'})
+        self.assertEqual(Subcategory.objects.count(), count)
+
+
+class SavedReportTests(PerformanceTestCase):
+    """Сохраненные отчеты: материализованные строки пересчитываются только по затронутым группам"""
+
+    url = '/dds/api/reports/'
+
+    def setUp(self):
+        super().setUp()
+        create_movements(DATASET_SIZES[1], self.statuses, self.subcategories)
+        self.operation_type = self.subcategories[0].category.operation_type
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {
+                'name': 'Пополнения по категориям',
+                'filters': {'operation_type': self.operation_type.pk, 'created_date_after': '2000-01-01'},
+                'group_by': ['month', 'category'],
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content.decode())
+        self.report = SavedReport.objects.get(pk=response.json()['id'])
+
+    def expected_rows(self):
+        rows = {}
+        for movement in MoneyMovement.objects.filter(operation_type=self.operation_type):
+            row = rows.setdefault((movement.category_id, movement.created_month), [0, Decimal(0)])
+            row[0] += 1
+            row[1] += movement.amount
+        return {key: tuple(value) for key, value in rows.items()}
+
+    def assertReportFresh(self):
+        actual = {(row.category_id, row.month): (row.count, row.total) for row in self.report.rows.all()}
+        self.assertEqual(actual, self.expected_rows())
+        self.assertFalse(self.report.rows.filter(dirty=True).exists())
+
+    @override_settings(DDS_REPORT_REFRESH_ON_WRITE=True)
+    def test_incremental_refresh_matches_full_computation(self):
+        self.assertReportFresh()
+        in_scope = MoneyMovement.objects.filter(operation_type=self.operation_type)
+        moved = self.subcategories[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            movement = in_scope.first()
+            movement.amount += 1000
+            movement.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            in_scope.filter(pk__in=list(in_scope.values_list('pk', flat=True)[:5])).update(
+                category=moved.category, subcategory=moved, created_date=timezone.now() - timedelta(days=90),
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            in_scope.last().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_movements(10, self.statuses, self.subcategories)
+        self.assertReportFresh()
+
+    def test_only_affected_groups_are_marked(self):
+        refreshed_at = SavedReport.objects.get(pk=self.report.pk).refreshed_at
+        # Операция вне фильтров отчета не затрагивает его
+        outside = MoneyMovement.objects.exclude(operation_type=self.operation_type).first()
+        outside.amount += 1
+        outside.save()
+        self.assertFalse(self.report.rows.filter(dirty=True).exists())
+
+        movement = MoneyMovement.objects.filter(operation_type=self.operation_type).first()
+        movement.amount += 1
+        with self.captureOnCommitCallbacks(execute=True):
+            movement.save()
+        # По умолчанию запись только помечает группу, пересчет - задачей
+        self.assertEqual(list(self.report.rows.filter(dirty=True).values_list('category', 'month')),
+                         [(movement.category_id, movement.created_month)])
+        data = self.get(f'{self.url}{self.report.pk}/').json()
+        self.assertTrue(data['stale'])
+        self.assertEqual(data['refreshed_at'], serializers.DateTimeField().to_representation(refreshed_at))
+
+        job = Job.objects.create(kind='refresh_reports', params={'reports': [self.report.pk]})
+        self.assertEqual(JOB_HANDLERS['refresh_reports'](job, None), 'Пересчитано групп: 1')
+        self.assertReportFresh()
+        self.assertGreater(SavedReport.objects.get(pk=self.report.pk).refreshed_at, refreshed_at)
+
+    def test_writes_schedule_one_refresh_job(self):
+        in_scope = MoneyMovement.objects.filter(operation_type=self.operation_type)
+        for movement in in_scope[:2]:
+            movement.amount += 1
+            with self.captureOnCommitCallbacks(execute=True):
+                movement.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            in_scope.filter(pk__in=list(in_scope.values_list('pk', flat=True)[:3])).update(amount=F('amount') + 1)
+        job = Job.objects.get(kind='refresh_reports')
+        self.assertEqual((job.status, job.params), (Job.State.PENDING, {}))
+        self.assertTrue(self.report.rows.filter(dirty=True).exists())
+
+        self.assertTrue(claim_job(job.pk))
+        JOB_HANDLERS['refresh_reports'](job, JobContext(job))
+        self.assertReportFresh()
+
+        # Задача уже запущена - следующая запись ставит новую
+        with self.captureOnCommitCallbacks(execute=True):
+            create_movements(1, self.statuses, self.subcategories[:1])
+        self.assertEqual(Job.objects.filter(kind='refresh_reports', status=Job.State.PENDING).count(), 1)
+
+    def test_writes_read_current_definitions(self):
+        movement = MoneyMovement.objects.filter(operation_type=self.operation_type).first()
+        with CaptureQueriesContext(connection) as queries:
+            movement.amount += 1
+            movement.save()
+            MoneyMovement.objects.filter(operation_type=self.operation_type).update(amount=F('amount') + 1)
+        # Одно чтение определений на запись
+        self.assertEqual(sum('FROM "dds_savedreport"' in query['sql'] for query in queries), 2)
+
+        # Отчет, созданный без сигналов (как в другом процессе), сразу учитывается записью
+        other = MoneyMovement.objects.exclude(operation_type=self.operation_type).first()
+        report, = SavedReport.objects.bulk_create([SavedReport(name='Все по статусам', filters={}, group_by=['status'])])
+        other.amount += 1
+        other.save()
+        self.assertEqual(list(report.rows.filter(dirty=True).values_list('status', flat=True)), [other.status_id])
+
+    def test_bulk_update_marks_distinct_groups(self):
+        in_scope = MoneyMovement.objects.filter(operation_type=self.operation_type)
+        moved = self.subcategories[1]
+        groups = set(in_scope.values_list('category', 'created_month').distinct())
+        with CaptureQueriesContext(connection) as queries:
+            in_scope.update(category=moved.category, subcategory=moved)
+        # Группы читаются одним запросом DISTINCT до и одним после изменения, без значений каждой строки
+        self.assertEqual(sum('DISTINCT' in query['sql'] and 'dds_moneymovement' in query['sql']
+                             and '"created_day"' in query['sql'] for query in queries), 2)
+        groups |= set(in_scope.values_list('category', 'created_month').distinct())
+        self.assertEqual(set(self.report.rows.filter(dirty=True).values_list('category', 'month')), groups)
+
+        refresh_report(SavedReport.objects.get(pk=self.report.pk))
+        self.assertReportFresh()
+
+    def test_open_report_is_single_read(self):
+        with self.assertNumQueries(4):
+            data = self.get(f'{self.url}{self.report.pk}/').json()
+        self.assertFalse(data['stale'])
+        self.assertEqual(len(data['rows']), len(self.expected_rows()))
+        self.assertEqual(set(data['rows'][0]), {'category', 'month', 'count', 'total'})
+
+        response = self.client.post(f'{self.url}{self.report.pk}/refresh/?full=true')
+        self.assertEqual(response.json()['rows'], data['rows'])
+
+    def test_invalid_definitions(self):
+        for payload in ({'name': 'А', 'group_by': ['comment']}, {'name': 'Б', 'filters': {'category': 0}},
+                        {'name': 'В', 'group_by': ['month', 'month']}):
+            with self.subTest(payload=payload):
+                response = self.client.post(self.url, payload, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+
+class BackupTests(CleanStateMixin, TransactionTestCase):
+    """
+    Онлайн-копирование и снимки БД
+
+    Копирование читает БД отдельным соединением и видит только зафиксированные
+    данные, поэтому тесты работают без общей транзакции TestCase.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.statuses, self.subcategories = create_taxonomy()
+        create_movements(30, self.statuses, self.subcategories)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.enterContext(self.settings(
+            DDS_SNAPSHOT_DIR=os.path.join(self.directory, 'snapshots'), DDS_SNAPSHOT_KEEP=2,
+            MEDIA_ROOT=os.path.join(self.directory, 'media'),
+        ))
+
+    def test_backup_in_steps(self):
+        target = os.path.join(self.directory, 'backup.sqlite3')
+        stdout = io.StringIO()
+        call_command('backup_db', target, '--pages', '4', '--step-delay', '0', stdout=stdout)
+        self.assertIn('МБ/с', stdout.getvalue())
+
+        backup = sqlite3.connect(target)
+        self.addCleanup(backup.close)
+        self.assertEqual(backup.execute('SELECT COUNT(*) FROM dds_moneymovement').fetchone(), (30,))
+        self.assertEqual(backup.execute('PRAGMA journal_mode').fetchone(), ('delete',))
+        self.assertEqual(os.listdir(self.directory), ['backup.sqlite3'])
+
+        with self.assertRaises(CommandError):
+            call_command('backup_db', stdout=stdout)
+
+    def test_restarts_are_limited(self):
+        def write_during_backup(copied, total, restarts):
+            create_movements(1, self.statuses, self.subcategories)
+
+        target = os.path.join(self.directory, 'backup.sqlite3')
+        with self.assertRaisesMessage(BackupError, 'перезапускалось 3 раз'):
+            backup_database(target, pages=1, step_delay=0, max_restarts=2, progress=write_during_backup)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_snapshots_are_rotated_and_read_only(self):
+        for _ in range(3):
+            call_command('backup_db', '--snapshot', stdout=io.StringIO())
+        self.assertEqual(len(list_snapshots()), 2)
+        create_movements(5, self.statuses, self.subcategories)
+
+        with snapshot_database() as alias:
+            self.assertEqual(MoneyMovement.objects.using(alias).count(), 30)
+            with self.assertRaises(OperationalError):
+                MoneyMovement.objects.using(alias).update(comment='')
+        with self.assertRaises(ConnectionDoesNotExist):
+            connections[alias]
+        with self.assertRaises(BackupError):
+            with snapshot_database('missing.sqlite3'):
+                pass
+
+    def test_export_reads_snapshot(self):
+        call_command('backup_db', '--snapshot', stdout=io.StringIO())
+        create_movements(5, self.statuses, self.subcategories)
+        job = Job.objects.create(kind='export_movements', params={'snapshot': 'latest'})
+        self.assertEqual(JOB_HANDLERS['export_movements'](job, JobContext(job)), 'Выгружено записей: 30')
+        with job.result.open('rb') as f:
+            self.assertEqual(len(f.read().decode('utf-8').splitlines()), 31)
+
+
+class ChangesFeedTests(PerformanceTestCase):
+    """Лента изменений: курсор по номеру изменения выдает каждое изменение ровно один раз"""
+
+    url = '/dds/api/money_movements/changes/'
+
+    def sync(self, token=None, limit=3):
+        """Чтение ленты до конца порциями по limit; возвращает изменения [(op, id)] и последний токен"""
+        changes = []
+        while True:
+            params = f'?limit={limit}' + (f'&since={token}' if token else '')
+            data = self.get(self.url + params).json()
+            changes += [(change['op'], change['id']) for change in data['changes']]
+            token = data['next_token'] or token
+            if not data['has_more']:
+                return changes, token
+
+    def test_every_change_is_delivered_once(self):
+        create_movements(7, self.statuses, self.subcategories)
+        ids = sorted(MoneyMovement.objects.values_list('pk', flat=True))
+        # Одним номером помечены все строки bulk_create - порции заканчиваются внутри него
+        changes, token = self.sync()
+        self.assertEqual(changes, [('created', pk) for pk in ids])
+        self.assertEqual(self.sync(token), ([], token))
+
+        edited = MoneyMovement.objects.get(pk=ids[0])
+        edited.comment = 'Исправлено'
+        edited.save()
+        MoneyMovement.objects.get(pk=ids[1]).delete()
+        MoneyMovement.objects.filter(pk__in=ids[2:6]).update(comment='Массово', updated_at=timezone.now())
+        create_movements(1, self.statuses, self.subcategories)
+        created = MoneyMovement.objects.latest('pk').pk
+
+        changes, token = self.sync(token)
+        self.assertEqual(changes, [('updated', ids[0]), ('deleted', ids[1]),
+                                   *(('updated', pk) for pk in ids[2:6]), ('created', created)])
+        self.assertEqual(self.sync(token), ([], token))
+
+    def test_updates_without_updated_at_are_delivered(self):
+        create_movements(4, self.statuses, self.subcategories)
+        ids = sorted(MoneyMovement.objects.values_list('pk', flat=True))
+        _, token = self.sync()
+        before = MoneyMovement.objects.get(pk=ids[0]).updated_at
+
+        # updated_at и change_seq выставляются сами, даже если их не передали
+        MoneyMovement.objects.filter(pk__in=ids[:2]).update(status=self.statuses[1])
+        movement = MoneyMovement.objects.get(pk=ids[3])
+        movement.comment = 'Исправлено'
+        MoneyMovement.objects.bulk_update([movement], ['comment'])
+
+        changes, token = self.sync(token)
+        self.assertEqual(changes, [('updated', ids[0]), ('updated', ids[1]), ('updated', ids[3])])
+        self.assertGreater(MoneyMovement.objects.get(pk=ids[0]).updated_at, before)
+        self.assertEqual(self.sync(token), ([], token))
+
+    def test_late_commit_with_older_clock_is_not_skipped(self):
+        create_movements(3, self.statuses, self.subcategories)
+        _, token = self.sync()
+        # Изменение с меткой времени раньше уже выданных (отстающие часы, долгая транзакция)
+        movement = MoneyMovement.objects.earliest('pk')
+        movement.comment = 'Позже'
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() - timedelta(days=1)):
+            movement.save()
+        self.assertEqual(self.sync(token)[0], [('updated', movement.pk)])
+
+    def test_created_and_updated_in_one_page(self):
+        self.assertEqual(self.sync(), ([], None))
+        create_movements(2, self.statuses, self.subcategories)
+        first, second = MoneyMovement.objects.order_by('pk')
+        token = self.get(f'{self.url}?limit=1').json()['next_token']
+        # Первая запись уже выдана как созданная; изменение после курсора - обновление, вторая еще новая
+        first.save()
+        self.assertEqual(self.sync(token)[0], [('created', second.pk), ('updated', first.pk)])
+
+    def test_invalid_tokens(self):
+        legacy = base64.urlsafe_b64encode(b'{"t":"2024-01-15T10:31:00+00:00","m":1,"d":3}').decode().rstrip('=')
+        negative = base64.urlsafe_b64encode(b'{"s":-1,"m":0,"d":0}').decode().rstrip('=')
+        for query in (f'?since={legacy}', f'?since={negative}', '?since=!!!', '?limit=0', '?limit=x'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(self.url + query).status_code, 400)
+
+
+class MovementStreamTests(PerformanceTestCase):
+    """Поток событий: рассылка подписчикам по фильтрам, сброс очереди медленного клиента, публикация после фиксации"""
+
+    url = '/dds/api/money_movements/stream/'
+
+    async def test_fan_out_respects_filters(self):
+        everything = broker.subscribe()
+        business = broker.subscribe(lambda payload: payload['status'] == 1)
+        self.addCleanup(broker.unsubscribe, everything)
+        self.addCleanup(broker.unsubscribe, business)
+        # Публикация выполняется в потоке запроса, доставка - в цикле событий подписчика
+        await asyncio.to_thread(broker.publish, 'created', {'id': 1, 'status': 1})
+        await asyncio.to_thread(broker.publish, 'updated', {'id': 2, 'status': 2})
+        await asyncio.sleep(0)
+        self.assertEqual(drain(everything.queue), [('created', {'id': 1, 'status': 1}),
+                                                   ('updated', {'id': 2, 'status': 2})])
+        self.assertEqual(drain(business.queue), [('created', {'id': 1, 'status': 1})])
+
+    async def test_slow_client_gets_reset(self):
+        subscription = broker.subscribe(maxsize=2)
+        self.addCleanup(broker.unsubscribe, subscription)
+        for i in range(4):
+            subscription.deliver(('created', {'id': i}))
+        # Третье событие переполнило очередь: накопленное отброшено, клиенту нужна пересинхронизация
+        self.assertEqual(drain(subscription.queue), [('reset', {'dropped': 3}), ('created', {'id': 3})])
+
+    def test_publish_after_commit_only(self):
+        with mock.patch.object(broker, 'has_subscribers', return_value=True), \
+                mock.patch.object(broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    create_movements(1, self.statuses, self.subcategories)
+                    MoneyMovement.objects.get().save()
+                    raise RuntimeError
+            publish.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                create_movements(1, self.statuses, self.subcategories)
+                movement = MoneyMovement.objects.get()
+                pk = movement.pk
+                movement.save()
+                movement.delete()
+        self.assertEqual([(op, payload['id']) for (op, payload), _ in publish.call_args_list],
+                         [('updated', pk), ('deleted', pk)])
+
+    async def test_stream_view(self):
+        status = self.statuses[0]
+        response = await self.async_client.get(self.url, {'status': status.pk})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry: '))
+
+        broker.publish('created', {'id': 1, 'status': status.pk + 1})
+        broker.publish('created', {'id': 2, 'status': status.pk, 'comment': 'Оплата'})
+        chunk = await asyncio.wait_for(anext(stream), timeout=1)
+        self.assertEqual(chunk.decode(), 'event: created\ndata: {"id": 2, "status": %d, "comment": "Оплата"}\n\n'
+                         % status.pk)
+        # Отключение клиента под ASGI отменяет ожидание следующего события - подписка снимается
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertFalse(broker.has_subscribers())
+
+        response = await self.async_client.get(self.url, {'status': 0})
+        self.assertEqual(response.status_code, 400)
+
+
+def drain(events):
+    """Все события, накопленные в очереди подписчика"""
+    items = []
+    while not events.empty():
+        items.append(events.get_nowait())
+    return items
+
+
+class JobRunnerTests(CleanStateMixin, TransactionTestCase):
+    """
+    Фоновые задачи: постановка через API, выполнение воркером, прогресс, отмена и ошибки
+
+    Воркер выполняет задачи в других потоках со своими соединениями, поэтому
+    данные теста должны быть зафиксированы.
+    """
+
+    url = '/dds/api/jobs/'
+
+    def setUp(self):
+        super().setUp()
+        self.statuses, self.subcategories = create_taxonomy()
+        create_movements(30, self.statuses, self.subcategories)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=directory.name))
+
+    def run_worker(self):
+        call_command('run_jobs', '--once', '--pool', 'thread', '--workers', '2', stdout=io.StringIO())
+
+    def test_worker_runs_queued_jobs(self):
+        status = self.statuses[0]
+        response = self.client.post(self.url, {
+            'kind': 'export_movements', 'params': {'filters': {'status': status.pk}},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content.decode())
+        self.assertEqual(response.json()['status'], Job.State.PENDING)
+        export = response.json()['id']
+        broken = Job.objects.create(kind='export_movements', params={'filters': {'status': 0}}).pk
+        self.run_worker()
+
+        data = self.client.get(f'{self.url}{export}/').json()
+        count = MoneyMovement.objects.filter(status=status).count()
+        self.assertEqual((data['status'], data['progress'], data['message']),
+                         (Job.State.SUCCEEDED, 100, f'Выгружено записей: {count}'))
+        response = self.client.get(f'{self.url}{export}/download/')
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0], ','.join(EXPORT_FIELDS))
+        self.assertEqual(len(rows), count + 1)
+
+        broken = Job.objects.get(pk=broken)
+        self.assertEqual(broken.status, Job.State.FAILED)
+        self.assertIn('Некорректные фильтры', broken.error)
+        self.assertIsNotNone(broken.finished_at)
+        self.assertEqual(self.client.get(f'{self.url}{broken.pk}/download/').status_code, 404)
+
+    def test_cancel(self):
+        pending = Job.objects.create(kind='export_movements')
+        self.assertEqual(self.client.post(f'{self.url}{pending.pk}/cancel/').json()['status'], Job.State.CANCELLED)
+
+        def cancelled_while_running(job, context):
+            Job.objects.filter(pk=job.pk).update(cancel_requested=True)
+            context.progress(1, 2)
+            raise AssertionError("Отмена не прервала задачу")
+
+        running = Job.objects.create(kind='cancelled_while_running')
+        with mock.patch.dict(JOB_HANDLERS, cancelled_while_running=cancelled_while_running):
+            self.run_worker()
+        pending.refresh_from_db()
+        running.refresh_from_db()
+        self.assertIsNone(pending.started_at)
+        self.assertEqual((running.status, running.message), (Job.State.CANCELLED, 'Задача отменена'))
+
+    def test_job_is_claimed_once(self):
+        job = Job.objects.create(kind='export_movements')
+        self.assertTrue(claim_job(job.pk))
+        self.assertFalse(claim_job(job.pk))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.State.RUNNING)
+
+    def test_unknown_kind_is_rejected(self):
+        response = self.client.post(self.url, {'kind': 'rm -rf'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('kind', response.json())
+
+
+class NDJSONStreamTests(PerformanceTestCase):
+    """Режим NDJSON: вся отфильтрованная выборка потоком, по записи на строку, в представлении списка"""
+
+    url = '/dds/api/money_movements/'
+
+    def setUp(self):
+        super().setUp()
+        create_movements(DATASET_SIZES[0] * 3, self.statuses, self.subcategories)
+
+    def lines(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_whole_filtered_selection(self):
+        status = self.statuses[0]
+        with self.settings(DDS_NDJSON_CHUNK_SIZE=7):
+            rows = self.lines(f'{self.url}?format=ndjson&status={status.pk}')
+        expected = MoneyMovement.objects.filter(status=status)
+        # Без пагинации: больше записей, чем на странице списка
+        self.assertGreater(len(rows), settings.REST_FRAMEWORK['PAGE_SIZE'])
+        self.assertEqual([row['id'] for row in rows], list(expected.values_list('pk', flat=True)))
+        page = self.get(f'{self.url}?status={status.pk}').json()['results']
+        self.assertEqual(rows[:len(page)], page)
+
+    def test_accept_header(self):
+        rows = self.lines(self.url, HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(len(rows), MoneyMovement.objects.count())
+
+    def test_single_objects_and_errors(self):
+        movement = MoneyMovement.objects.first()
+        response = self.get(f'{self.url}{movement.pk}/?format=ndjson')
+        self.assertEqual(response.content.decode().count('\n'), 1)
+        self.assertEqual(json.loads(response.content)['id'], movement.pk)
+
+        response = self.client.get(f'{self.url}0/?format=ndjson')
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', json.loads(response.content))
+
+
+class SchemaWarmupTests(PerformanceTestCase):
+    """Собранная OpenAPI-схема отдается из файла с ETag; прогрев процесса заполняет кэши"""
+
+    url = '/dds/api/schema/'
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.schema_file = os.path.join(directory.name, 'schema.json')
+        self.enterContext(self.settings(DDS_SCHEMA_FILE=self.schema_file))
+
+    def test_prebuilt_schema(self):
+        # Без собранного файла схема генерируется на лету
+        response = self.get(f'{self.url}?format=json')
+        self.assertNotIn('ETag', response)
+        generated = json.loads(response.content)
+
+        call_command('build_schema', stdout=io.StringIO())
+        with open(self.schema_file, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), generated)
+        response = self.get(f'{self.url}?format=json')
+        self.assertEqual(json.loads(response.content), generated)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(f'{self.url}?format=json', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.get(self.url)['ETag'], etag)
+
+        # Измененный файл перечитывается без перезапуска
+        with open(self.schema_file, 'w', encoding='utf-8') as f:
+            json.dump({**generated, 'info': {'title': 'Другая схема', 'version': '2'}}, f)
+        os.utime(self.schema_file, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        response = self.get(f'{self.url}?format=json')
+        self.assertEqual(json.loads(response.content)['info']['title'], 'Другая схема')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_warm_up(self):
+        call_command('build_schema', stdout=io.StringIO())
+        timings = warm_up()
+        self.assertEqual(set(timings), {'urls', 'serializers', 'taxonomy', 'schema'})
+        with self.assertNumQueries(0):
+            get_taxonomy_tree()
+        self.assertIsNotNone(get_prebuilt_schema())
+
+        # Ошибка шага не прерывает прогрев
+        with mock.patch('dds.taxonomy.get_taxonomy_tree', side_effect=OperationalError), \
+                self.assertLogs('dds.startup', 'ERROR'):
+            self.assertEqual(set(warm_up()), set(timings))
+
+    def test_warm_up_switch(self):
+        for value, enabled in (('1', True), ('0', False)):
+            with self.subTest(value=value), mock.patch.dict(os.environ, {'DDS_WARMUP': value}):
+                self.assertIs(warm_up_enabled(), enabled)
+
+
+class TaxonomyTreeTests(PerformanceTestCase):
+    """Дерево справочников одним запросом: структура, ETag и сброс кэша после изменения справочника"""
+
+    url = '/dds/api/taxonomy/'
+
+    def test_tree(self):
+        tree = self.get(self.url).json()
+        self.assertEqual([status['name'] for status in tree['statuses']], ['Бизнес', 'Личное'])
+        self.assertEqual([op_type['name'] for op_type in tree['operation_types']], ['Пополнение', 'Списание'])
+        categories = tree['operation_types'][1]['categories']
+        self.assertEqual([category['name'] for category in categories], ['Списание 0', 'Списание 1', 'Списание 2'])
+        self.assertEqual(categories[0]['subcategories'], [
+            {'id': sub.pk, 'name': sub.name} for sub in Subcategory.objects.filter(category__name='Списание 0')
+        ])
+
+    def test_conditional_requests(self):
+        response = self.get(self.url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_changes_invalidate_after_commit(self):
+        etag = self.get(self.url)['ETag']
+        category = Category.objects.get(name='Пополнение 0')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            category.name = 'Зарплата'
+            category.save()
+        # До фиксации другие запросы получают прежнее дерево
+        self.assertEqual(self.get(self.url)['ETag'], etag)
+        for callback in callbacks:
+            callback()
+
+        response = self.get(self.url)
+        self.assertNotEqual(response['ETag'], etag)
+        names = [category['name'] for category in response.json()['operation_types'][0]['categories']]
+        self.assertIn('Зарплата', names)
+
+        version = get_taxonomy_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Subcategory.objects.filter(category=category).first().delete()
+        self.assertEqual(get_taxonomy_version(), version + 1)
+        self.assertEqual(len(self.get(self.url).json()['operation_types'][0]['categories'][0]['subcategories']), 1)
+
+
+@override_settings(TIME_ZONE='Europe/Moscow')
+class DateBucketTests(PerformanceTestCase):
+    """Колонки дня и месяца операции: часовой пояс проекта и заполнение при любом способе записи"""
+
+    # 31 января 22:30 UTC - уже 1 февраля по Москве
+    late_evening = datetime(2024, 1, 31, 22, 30, tzinfo=dt_timezone.utc)
+
+    def assertBuckets(self, movement, day):
+        movement.refresh_from_db()
+        self.assertEqual((movement.created_day, movement.created_month), (day, day.replace(day=1)))
+
+    def test_local_day(self):
+        self.assertEqual(date_buckets(self.late_evening), (date(2024, 2, 1), date(2024, 2, 1)))
+        self.assertEqual(date_buckets(datetime(2024, 1, 31, 23, 59)), (date(2024, 1, 31), date(2024, 1, 1)))
+
+    def test_buckets_follow_every_write(self):
+        create_movements(3, self.statuses, self.subcategories)
+        first, second, third = MoneyMovement.objects.order_by('pk')
+        first.created_date = self.late_evening
+        first.save()
+        self.assertBuckets(first, date(2024, 2, 1))
+
+        second.created_date = self.late_evening - timedelta(days=40)
+        MoneyMovement.objects.bulk_update([second], ['created_date'])
+        self.assertBuckets(second, date(2023, 12, 23))
+
+        MoneyMovement.objects.filter(pk=third.pk).update(created_date=self.late_evening + timedelta(days=30))
+        self.assertBuckets(third, date(2024, 3, 2))
+        # Выражение вычисляется в БД - колонки пересчитываются по фактическому значению
+        MoneyMovement.objects.filter(pk=third.pk).update(created_date=F('created_date') - timedelta(days=1))
+        self.assertBuckets(third, date(2024, 3, 1))
+
+    def test_filter_uses_local_days(self):
+        create_movements(2, self.statuses, self.subcategories)
+        inside, outside = MoneyMovement.objects.order_by('pk')
+        inside.created_date = self.late_evening
+        inside.save()
+        outside.created_date = self.late_evening - timedelta(hours=2)  # 23:30 31 января по Москве
+        outside.save()
+        data = self.get('/dds/api/money_movements/?created_date_after=2024-02-01&created_date_before=2024-02-01').json()
+        self.assertEqual([row['id'] for row in data['results']], [inside.pk])
+
+        response = self.get('/admin/dds/moneymovement/?created_day__year=2024&created_day__month=1')
+        self.assertEqual(list(response.context['cl'].result_list), [outside])
+
+
+class LoadTestCommandTests(SimpleTestCase):
+    """Нагрузочный тест: разбор смеси сценариев, отчет и запуск на встроенном сервере"""
+
+    def test_parse_mix(self):
+        self.assertEqual(loadtest.parse_mix('list=3, create'), {'list': 3.0, 'create': 1.0})
+        for mix in ('list=3,upload=1', 'list=x'):
+            with self.subTest(mix=mix), self.assertRaises(CommandError):
+                loadtest.parse_mix(mix)
+
+    def test_report(self):
+        results = {
+            'list': {'latencies': [0.001 * i for i in range(1, 101)], 'queries': [3, 5], 'errors': 2, 'bytes': 5000},
+            'create': {'latencies': [], 'queries': [], 'errors': 4, 'bytes': 0},
+        }
+        options = {'server': 'wsgi', 'concurrency': 2, 'duration': 10, 'rows': 10, 'categories': 1,
+                   'subcategories': 1, 'mix': 'list=1,create=1', 'seed': 1, 'db_profile': 'default',
+                   'write_coalescing': False}
+        report = loadtest.Command.build_report(results, 10.0, options)
+        self.assertEqual((report['total_requests'], report['total_rps']), (100, 10.0))
+        self.assertEqual(report['endpoints']['list']['latency_ms'],
+                         {'mean': 50.5, 'p50': 51.0, 'p90': 90.0, 'p99': 99.0, 'max': 100.0})
+        self.assertEqual(report['endpoints']['list']['sql_queries'], {'mean': 4, 'max': 5})
+        self.assertEqual(report['endpoints']['create']['latency_ms']['p50'], None)
+        self.assertEqual(report['endpoints']['create']['errors'], 4)
+
+    def test_asgi_requires_uvicorn(self):
+        with mock.patch('importlib.util.find_spec', return_value=None), \
+                self.assertRaisesMessage(CommandError, 'pip install uvicorn'):
+            call_command('loadtest', '--server', 'asgi', stdout=io.StringIO())
+
+    def test_run_against_wsgi_server(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'loadtest.json')
+            call_command('loadtest', '--rows', '50', '--categories', '2', '--subcategories', '2',
+                         '--concurrency', '2', '--duration', '1', '--warmup', '0',
+                         '--mix', 'list=1,create=1,taxonomy=1,series=1,statistics=1', '--output', output, stdout=io.StringIO())
+            with open(output, encoding='utf-8') as f:
+                report = json.load(f)
+        self.assertGreater(report['total_requests'], 0)
+        for name, endpoint in report['endpoints'].items():
+            with self.subTest(scenario=name):
+                self.assertEqual(endpoint['errors'], 0)
+                self.assertGreater(endpoint['requests'], 0)
+                # Сервер запущен с DDS_QUERY_COUNT_HEADER: число SQL-запросов известно по каждому сценарию
+                self.assertIsNotNone(endpoint['sql_queries']['mean'])
+
+
+@override_settings(DDS_PROFILING_ENABLED=True, DDS_PROFILE_KEEP=2)
+class ProfilingTests(PerformanceTestCase):
+    """Профилирование по запросу сотрудника: профиль, SQL-запросы, скачивание и хранение"""
+
+    url = '/dds/api/money_movements/'
+
+    def setUp(self):
+        super().setUp()
+        create_movements(5, self.statuses, self.subcategories)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.enterContext(self.settings(DDS_PROFILE_DIR=self.directory))
+
+    def test_profiled_response(self):
+        response = self.get(f'{self.url}?_profile=1')
+        self.assertEqual(response.json()['count'], 5)
+        profile_id = response['X-DDS-Profile-Id']
+        self.assertEqual(sorted(os.listdir(self.directory)), [f'{profile_id}.json', f'{profile_id}.prof'])
+
+        summary = self.get(f'/dds/profiles/{profile_id}.json').json()
+        self.assertEqual((summary['method'], summary['status']), ('GET', 200))
+        self.assertEqual(summary['sql_count'], len(summary['queries']))
+        self.assertTrue(any('dds_moneymovement' in query['sql'] for query in summary['queries']))
+        self.assertTrue(summary['functions'])
+
+        response = self.client.get(f'/dds/profiles/{profile_id}.prof')
+        self.assertIn('attachment', response['Content-Disposition'])
+        b''.join(response.streaming_content)
+        self.assertTrue(pstats.Stats(os.path.join(self.directory, f'{profile_id}.prof')).total_calls)
+
+    def test_summary_mode_and_header(self):
+        data = self.get(self.url, HTTP_X_DDS_PROFILE='summary').json()
+        self.assertEqual(data['path'], self.url)
+        self.assertNotIn('results', data)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, f"{data['profile_id']}.prof")))
+
+    def test_only_staff_is_profiled(self):
+        self.client.force_login(get_user_model().objects.create_user('user', password='password'))
+        response = self.get(f'{self.url}?_profile=1')
+        self.assertNotIn('X-DDS-Profile-Id', response)
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(self.client.get(f'/dds/profiles/{"0" * 32}.json').status_code, 302)
+
+    def test_old_profiles_are_pruned(self):
+        for _ in range(3):
+            self.get(f'{self.url}?_profile=1')
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+        for name in (f'{"0" * 32}.json', f'{"0" * 32}.txt', 'short.json'):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(f'/dds/profiles/{name}').status_code, 404)
+
+
+@override_settings(DDS_SLOW_QUERY_MS=None, DDS_QUERY_COUNT_HEADER=False, DDS_PROFILING_ENABLED=False)
+class SlowQueryLogTests(CleanStateMixin, TransactionTestCase):
+    """
+    Журнал медленных запросов: шаблоны SQL, планы, привязка к представлению и команда slow_queries
+
+    Журнал не сохраняется внутри транзакции, поэтому тесты работают без общей
+    транзакции TestCase; порог 0 делает медленным каждый запрос.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.statuses, self.subcategories = create_taxonomy()
+        create_movements(10, self.statuses, self.subcategories)
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+        audit_log.clear()
+        # Порог снимается до очистки таблиц после теста - запросы очистки в буфер не попадают
+        self.addCleanup(slowlog._buffer.clear)
+        self.enterContext(self.settings(DDS_SLOW_QUERY_MS=0))
+
+    def test_normalize_sql(self):
+        first = slowlog.normalize_sql("SELECT *  FROM t WHERE a = 'it''s' AND b IN (1, 2, 3) AND c = %s")
+        self.assertEqual(first, "SELECT * FROM t WHERE a = ? AND b IN (?...) AND c = ?")
+        second = slowlog.normalize_sql("SELECT * FROM t WHERE a = 'x' AND b IN (4, 5) AND c = %s")
+        self.assertEqual(slowlog.fingerprint_sql(first), slowlog.fingerprint_sql(second))
+
+    def test_request_queries_are_logged_with_view_and_plan(self):
+        self.assertEqual(self.client.get('/dds/api/money_movements/?ordering=-amount').status_code, 200)
+        self.assertFalse(slowlog._buffer)
+
+        query = SlowQuery.objects.filter(sql__contains='ORDER BY "dds_moneymovement"."amount" DESC').get()
+        self.assertEqual(query.view, 'moneymovement-list (GET)')
+        self.assertIn('?', query.sql)
+        self.assertTrue(query.explain)
+
+    def test_same_query_is_grouped(self):
+        for pk in MoneyMovement.objects.values_list('pk', flat=True)[:3]:
+            list(MoneyMovement.objects.filter(pk=pk).values_list('amount'))
+        with transaction.atomic():
+            self.assertEqual(slowlog.flush_slow_queries(), 0)
+        slowlog._buffer.clear()
+        for pk in MoneyMovement.objects.values_list('pk', flat=True)[:3]:
+            list(MoneyMovement.objects.filter(pk=pk).values_list('amount'))
+        self.assertEqual(slowlog.flush_slow_queries(), 4)
+
+        query = SlowQuery.objects.get(sql__contains='WHERE "dds_moneymovement"."id" = ?')
+        self.assertEqual(query.count, 3)
+        self.assertGreaterEqual(query.total_ms, query.max_ms)
+        self.assertIn('SEARCH', query.explain)
+
+    @override_settings(DDS_SLOW_QUERY_MS=10 ** 6)
+    def test_fast_queries_are_skipped(self):
+        list(MoneyMovement.objects.all())
+        self.assertEqual(slowlog.flush_slow_queries(), 0)
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_slow_queries_command(self):
+        list(MoneyMovement.objects.filter(comment__contains='Операция'))
+        stdout = io.StringIO()
+        call_command('slow_queries', '--top', '1', stdout=stdout)
+        self.assertIn('#1:', stdout.getvalue())
+        self.assertIn('План:', stdout.getvalue())
+        self.assertNotIn('#2:', stdout.getvalue())
+
+        stdout = io.StringIO()
+        call_command('slow_queries', '--no-explain', '--order', 'max', '--reset', stdout=stdout)
+        self.assertNotIn('План:', stdout.getvalue())
+        self.assertIn('Журнал очищен', stdout.getvalue())
+        self.assertFalse(SlowQuery.objects.exists())
+
+        stdout = io.StringIO()
+        slowlog._buffer.clear()
+        with self.settings(DDS_SLOW_QUERY_MS=None):
+            call_command('slow_queries', stdout=stdout)
+        self.assertIn('Журнал медленных запросов пуст', stdout.getvalue())
+
+
+class MoneyFieldTests(PerformanceTestCase):
+    """Суммы в копейках: преобразование, округление, границы, NULL и агрегаты"""
+
+    field = MoneyMovement._meta.get_field('amount')
+
+    def create(self, amount):
+        subcategory = self.subcategories[0]
+        return MoneyMovement.objects.create(
+            status=self.statuses[0], operation_type=subcategory.category.operation_type,
+            category=subcategory.category, subcategory=subcategory, amount=amount,
+        )
+
+    def raw_amount(self, movement):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT amount FROM dds_moneymovement WHERE id = %s', [movement.pk])
+            return cursor.fetchone()[0]
+
+    def test_round_trip(self):
+        for amount, minor in (('0.01', 1), ('123.45', 12345), ('1000', 100000), ('9999999999999.99', 999999999999999)):
+            with self.subTest(amount=amount):
+                movement = self.create(Decimal(amount))
+                self.assertEqual(self.raw_amount(movement), minor)
+                self.assertEqual(MoneyMovement.objects.get(pk=movement.pk).amount, Decimal(amount))
+
+    def test_conversion_and_rounding(self):
+        cases = [
+            (Decimal('0.005'), 1), (Decimal('0.004'), 0), (Decimal('-0.005'), -1),
+            ('12.3', 1230), (7, 700), (0.1 + 0.2, 30), (None, None),
+        ]
+        for value, minor in cases:
+            with self.subTest(value=value):
+                self.assertEqual(self.field.to_minor_units(value), minor)
+        self.assertEqual(self.field.from_minor_units(1230), Decimal('12.30'))
+        self.assertEqual(self.field.from_minor_units(2.5), Decimal('0.03'))
+        self.assertIsNone(self.field.from_minor_units(None))
+        with self.assertRaises(ValidationError):
+            self.field.to_minor_units('12,30')
+
+    def test_validation(self):
+        movement = self.create(Decimal('1'))
+        for amount in (Decimal('0.001'), Decimal('10000000000000.00'), Decimal('0')):
+            with self.subTest(amount=amount):
+                movement.amount = amount
+                with self.assertRaises(ValidationError):
+                    movement.full_clean()
+
+    def test_lookups_and_aggregates(self):
+        for amount in ('0.10', '0.10', '0.10', '2.05'):
+            self.create(Decimal(amount))
+        movements = MoneyMovement.objects.all()
+        self.assertEqual(movements.aggregate(total=Sum('amount'))['total'], Decimal('2.35'))
+        self.assertEqual(movements.filter(amount__gte=Decimal('2.05')).count(), 1)
+        self.assertEqual(movements.filter(amount=Decimal('0.1')).count(), 3)
+        self.assertEqual(list(movements.order_by('-amount').values_list('amount', flat=True)[:2]),
+                         [Decimal('2.05'), Decimal('0.10')])
+        # AVG считается в БД над копейками и возвращается округленным до копейки
+        self.assertEqual(movements.aggregate(avg=Avg('amount'))['avg'], Decimal('0.59'))
+        self.assertIsNone(movements.filter(amount__gt=100).aggregate(total=Sum('amount'))['total'])
+
+
+class MoneyMigrationTests(TransactionTestCase):
+    """Миграция 0002: перевод сумм DecimalField в копейки и обратно"""
+
+    before = [('dds', '0001_initial')]
+    after = [('dds', '0002_money_movement_amount_minor_units')]
+
+    def setUp(self):
+        super().setUp()
+        self.executor = MigrationExecutor(connection)
+        leaves = self.executor.loader.graph.leaf_nodes('dds')
+        self.addCleanup(self.migrate, leaves)
+        self.migrate(self.before)
+
+    def migrate(self, targets):
+        self.executor.loader.build_graph()
+        self.executor.migrate(targets)
+        return self.executor.loader.project_state(targets).apps
+
+    def create_movements(self, apps, amounts):
+        Status = apps.get_model('dds', 'Status')
+        OperationType = apps.get_model('dds', 'OperationType')
+        Category = apps.get_model('dds', 'Category')
+        Subcategory = apps.get_model('dds', 'Subcategory')
+        MoneyMovement = apps.get_model('dds', 'MoneyMovement')
+        op_type = OperationType.objects.create(name='Списание')
+        category = Category.objects.create(name='Маркетинг', operation_type=op_type)
+        subcategory = Subcategory.objects.create(name='Реклама', category=category)
+        status = Status.objects.create(name='Бизнес')
+        # Исторические модели без save() приложения: колонки дат заполняются явно
+        created_day, created_month = date_buckets(timezone.now())
+        MoneyMovement.objects.bulk_create([
+            MoneyMovement(status=status, operation_type=op_type, category=category, subcategory=subcategory,
+                          amount=amount, created_date=timezone.now(), created_day=created_day,
+                          created_month=created_month)
+            for amount in amounts
+        ])
+
+    def amounts(self, apps):
+        return list(apps.get_model('dds', 'MoneyMovement').objects.order_by('pk').values_list('amount', flat=True))
+
+    def test_forward_and_backward(self):
+        amounts = [Decimal('0.01'), Decimal('19.99'), Decimal('1234567.80'), Decimal('9999999999999.99')]
+        self.create_movements(self.migrate(self.before), amounts)
+
+        self.assertEqual(self.amounts(self.migrate(self.after)), amounts)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT amount FROM dds_moneymovement ORDER BY id')
+            self.assertEqual([row[0] for row in cursor.fetchall()], [1, 1999, 123456780, 999999999999999])
+
+        self.assertEqual(self.amounts(self.migrate(self.before)), amounts)
+
+
+@override_settings(DDS_SLOW_QUERY_MS=None, DDS_QUERY_COUNT_HEADER=False, DDS_PROFILING_ENABLED=False)
+class WriteCoalescerTests(CleanStateMixin, TransactionTestCase):
+    """
+    Групповая фиксация: порядок, порции, изоляция ошибок и сбой фиксации
+
+    Записи выполняет отдельный поток со своим соединением, поэтому данные
+    теста должны быть зафиксированы.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.coalescer = WriteCoalescer(batch_size=10)
+        self.batches = []
+        commit = self.coalescer._commit
+        self.coalescer._commit = lambda batch: (self.batches.append(len(batch)), commit(batch))
+
+    def submit_blocked(self, *writes):
+        """Постановка записей, пока поток занят первой: все они попадают в одну порцию"""
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        first = self.coalescer.submit(block)
+        started.wait(5)
+        futures = [self.coalescer.submit(func, *args) for func, *args in writes]
+        release.set()
+        first.exception(5)
+        for future in futures:
+            future.exception(5)
+        return futures
+
+    def test_batch_keeps_submission_order(self):
+        order = []
+
+        def create(name):
+            order.append(name)
+            return Status.objects.create(name=name).name
+
+        names = [f'Статус {i}' for i in range(5)]
+        futures = self.submit_blocked(*[(create, name) for name in names])
+        self.assertEqual([future.result() for future in futures], names)
+        self.assertEqual(order, names)
+        self.assertEqual(self.batches, [1, 5])
+        self.assertEqual(list(Status.objects.order_by('pk').values_list('name', flat=True)), names)
+
+    def test_error_is_isolated_to_its_write(self):
+        def fail():
+            Status.objects.create(name='Откатится')
+            raise ValueError('ошибка строки')
+
+        def create():
+            return Status.objects.create(name='Первый')
+
+        futures = self.submit_blocked((fail, ), (create, ), (create, ))
+        self.assertIsInstance(futures[0].exception(), ValueError)
+        self.assertEqual(futures[1].result().name, 'Первый')
+        self.assertIsInstance(futures[2].exception(), IntegrityError)
+        self.assertEqual(list(Status.objects.values_list('name', flat=True)), ['Первый'])
+
+    def test_failed_commit_fails_every_write(self):
+        error = OperationalError('database is locked')
+        with mock.patch.object(type(connections['default']), 'commit', side_effect=error):
+            futures = self.submit_blocked(*[(Status.objects.create, ) for _ in range(2)])
+        for future in futures:
+            self.assertIs(future.exception(), error)
+        self.assertFalse(Status.objects.exists())
+
+    def test_request_context_is_kept(self):
+        token = slowlog.current_view.set('movement-list (POST)')
+        self.addCleanup(slowlog.current_view.reset, token)
+        future = self.coalescer.submit(lambda: (slowlog.current_view.get(), threading.current_thread().name))
+        self.assertEqual(future.result(5), ('movement-list (POST)', 'dds-write-coalescer'))
+
+    @override_settings(DDS_WRITE_COALESCING=True)
+    def test_coalesced_write(self):
+        def thread_name():
+            return threading.current_thread().name
+
+        self.assertEqual(coalesced_write(thread_name), 'dds-write-coalescer')
+        with transaction.atomic():
+            self.assertEqual(coalesced_write(thread_name), threading.current_thread().name)
+        with self.settings(DDS_WRITE_COALESCING=False):
+            self.assertEqual(coalesced_write(thread_name), threading.current_thread().name)
+
+        statuses, subcategories = create_taxonomy()
+        subcategory = subcategories[0]
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.post('/dds/api/money_movements/', {
+            'status': statuses[0].pk, 'operation_type': subcategory.category.operation_type_id,
+            'category': subcategory.category_id, 'subcategory': subcategory.pk, 'amount': '10.50',
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(MoneyMovement.objects.get(pk=response.json()['id']).amount, Decimal('10.50'))
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    """Профиль БД production: прагмы соединения и обслуживание командой sqlite_maintenance"""
+
+    alias = 'sqlite_profile'
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def load_databases(self, profile):
+        with mock.patch.dict(os.environ, {'DDS_DB_PROFILE': profile}):
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'dds_project', 'settings.py'))['DATABASES']
+
+    def open_database(self, profile):
+        """Подключение к временной БД с настройками профиля, зарегистрированное только в текущем потоке"""
+        settings_dict = {**connections.settings['default'], **self.load_databases(profile)['default'],
+                         'NAME': self.path}
+        wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, self.alias)
+        connections[self.alias] = wrapper
+        self.addCleanup(connections.__delitem__, self.alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragmas(self, wrapper):
+        with wrapper.cursor() as cursor:
+            return {
+                name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store')
+            }
+
+    def test_production_profile(self):
+        wrapper = self.open_database('production')
+        self.assertEqual(self.pragmas(wrapper), {
+            'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -65536, 'mmap_size': 268435456, 'temp_store': 2,
+        })
+        self.assertEqual((wrapper.settings_dict['CONN_MAX_AGE'], wrapper.transaction_mode), (600, 'IMMEDIATE'))
+
+    def test_default_profile(self):
+        self.assertEqual(self.load_databases('')['default']['OPTIONS'], {'transaction_mode': 'IMMEDIATE'})
+        self.assertEqual(self.pragmas(self.open_database(''))['journal_mode'], 'delete')
+
+    def maintenance(self, *args):
+        stdout = io.StringIO()
+        call_command('sqlite_maintenance', '--database', self.alias, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_maintenance_checkpoints_wal(self):
+        wrapper = self.open_database('production')
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (value TEXT)')
+            cursor.executemany('INSERT INTO item VALUES (%s)', [('x' * 1000, )] * 100)
+        self.assertGreater(os.path.getsize(f'{self.path}-wal'), 0)
+
+        self.assertIn('контрольная точка PASSIVE', self.maintenance('--checkpoint', 'PASSIVE'))
+        self.assertGreater(os.path.getsize(f'{self.path}-wal'), 0)
+        self.assertIn('контрольная точка TRUNCATE', self.maintenance())
+        self.assertEqual(os.path.getsize(f'{self.path}-wal'), 0)
+
+    def test_maintenance_without_wal(self):
+        self.open_database('')
+        self.assertIn('БД не в режиме WAL', self.maintenance())
+
+    def test_maintenance_requires_sqlite(self):
+        wrapper = self.open_database('')
+        with mock.patch.object(wrapper, 'vendor', 'postgresql'), \
+                self.assertRaisesMessage(CommandError, 'предназначена для SQLite'):
+            self.maintenance()
+
+
+class BatchTests(PerformanceTestCase):
+    """Пакетные запросы: порядок ответов, ошибки подзапросов и атомарность изменений"""
+
+    url = '/dds/api/batch/'
+
+    def setUp(self):
+        super().setUp()
+        create_movements(7, self.statuses, self.subcategories)
+
+    def batch(self, requests, status_code=200, **options):
+        response = self.client.post(self.url, {'requests': requests, **options}, content_type='application/json')
+        self.assertEqual(response.status_code, status_code, response.content)
+        return response.json()
+
+    def movement_body(self, amount='12.50'):
+        subcategory = self.subcategories[0]
+        return {
+            'status': self.statuses[0].pk, 'operation_type': subcategory.category.operation_type_id,
+            'category': subcategory.category_id, 'subcategory': subcategory.pk, 'amount': amount,
+        }
+
+    def test_reads_in_order(self):
+        paths = ['/dds/api/taxonomy/', '/dds/api/money_movements/?page=2', '/dds/api/statuses/']
+        data = self.batch([{'path': path} for path in paths])
+        self.assertTrue(data['committed'])
+        for path, item in zip(paths, data['responses']):
+            with self.subTest(path=path):
+                self.assertEqual(item, {'status': 200, 'body': self.get(path).json()})
+
+    def test_subrequest_errors(self):
+        data = self.batch([
+            {'path': '/dds/api/missing/'},
+            {'method': 'POST', 'path': self.url, 'body': {'requests': []}},
+            {'path': '/dds/api/money_movements/stream/'},
+            {'path': '/dds/api/money_movements/0/'},
+        ], atomic=False)
+        self.assertEqual([item['status'] for item in data['responses']], [404, 400, 400, 404])
+
+    def test_invalid_batch(self):
+        for requests in ([], [{'path': '/admin/'}], [{'path': '/dds/api/statuses/'}] * 51):
+            with self.subTest(size=len(requests)):
+                self.batch(requests, status_code=400)
+
+    def test_atomic_writes(self):
+        data = self.batch([
+            {'method': 'POST', 'path': '/dds/api/money_movements/', 'body': self.movement_body()},
+            {'method': 'POST', 'path': '/dds/api/statuses/', 'body': {'name': 'Новый'}},
+        ])
+        self.assertEqual([item['status'] for item in data['responses']], [201, 201])
+        self.assertTrue(data['committed'])
+        self.assertEqual(MoneyMovement.objects.count(), 8)
+        self.assertTrue(Status.objects.filter(name='Новый').exists())
+
+    def test_atomic_rollback(self):
+        movement = MoneyMovement.objects.earliest('pk')
+        data = self.batch([
+            {'method': 'POST', 'path': '/dds/api/money_movements/', 'body': self.movement_body()},
+            {'method': 'PUT', 'path': f'/dds/api/money_movements/{movement.pk}/',
+             'body': {**self.movement_body(), 'comment': 'Изменено'}},
+            {'method': 'POST', 'path': '/dds/api/money_movements/', 'body': self.movement_body(amount='0')},
+            {'method': 'DELETE', 'path': f'/dds/api/money_movements/{movement.pk}/'},
+        ])
+        self.assertEqual([item['status'] for item in data['responses']], [201, 200, 400, 424])
+        self.assertIn('amount', data['responses'][2]['body'])
+        self.assertFalse(data['committed'])
+        self.assertEqual(MoneyMovement.objects.count(), 7)
+        movement.refresh_from_db()
+        self.assertEqual(movement.comment, 'Операция 0')
+
+    def test_non_atomic_writes(self):
+        data = self.batch([
+            {'method': 'POST', 'path': '/dds/api/money_movements/', 'body': self.movement_body(amount='0')},
+            {'method': 'POST', 'path': '/dds/api/money_movements/', 'body': self.movement_body()},
+        ], atomic=False)
+        self.assertEqual([item['status'] for item in data['responses']], [400, 201])
+        self.assertTrue(data['committed'])
+        self.assertEqual(MoneyMovement.objects.count(), 8)
+
+
+@override_settings(DDS_SLOW_QUERY_MS=None, DDS_QUERY_COUNT_HEADER=False, DDS_PROFILING_ENABLED=False,
+                   DDS_BATCH_WORKERS=3)
+class ParallelBatchTests(CleanStateMixin, TransactionTestCase):
+    """Параллельное чтение в пакете: потоки пула видят только зафиксированные данные"""
+
+    def test_parallel_reads_match_sequential(self):
+        statuses, subcategories = create_taxonomy()
+        create_movements(12, statuses, subcategories)
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+        requests = [{'path': f'/dds/api/money_movements/?page={page}'} for page in (1, 2, 3)]
+        requests.append({'path': '/dds/api/taxonomy/'})
+
+        threads = set()
+        execute = batch.execute_subrequest
+
+        def record_thread(request, item):
+            threads.add(threading.current_thread().name)
+            return execute(request, item)
+
+        responses = {}
+        for parallel in (False, True):
+            with mock.patch.object(batch, 'execute_subrequest', record_thread):
+                response = self.client.post('/dds/api/batch/', {'requests': requests, 'parallel': parallel},
+                                            content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            responses[parallel] = response.json()['responses']
+        self.assertEqual(responses[True], responses[False])
+        self.assertEqual([item['status'] for item in responses[True]], [200] * 4)
+        self.assertIn(len(threads - {threading.current_thread().name}), (2, 3))
+
+
+class FragmentCacheTests(PerformanceTestCase):
+    """Кэш фрагментов списка операций: LRU с пределом в байтах и инвалидация по версиям"""
+
+    url = '/dds/api/money_movements/?ordering=id'
+
+    def results(self):
+        return {row['id']: row for row in self.get(self.url).json()['results']}
+
+    def test_lru_byte_limit(self):
+        cache = FragmentCache(max_bytes=30)
+        item = 'x' * 10  # 12 байт по оценке repr
+        cache.set_many({(1, 'v1', 1): item, (2, 'v1', 1): item})
+        self.assertEqual(cache.get_many([(1, 'v1', 1)]), {(1, 'v1', 1): item})
+        cache.set_many({(3, 'v1', 1): item, (4, 'v1', 1): 'x' * 40})
+        self.assertEqual(set(cache.get_many([(1, 'v1', 1), (2, 'v1', 1), (3, 'v1', 1), (4, 'v1', 1)])),
+                         {(1, 'v1', 1), (3, 'v1', 1)})
+        self.assertEqual(cache.stats(), {'entries': 2, 'bytes': 24, 'hits': 3, 'misses': 2})
+
+        cache.set_many({(1, 'v1', 1): 'y' * 10, (1, 'v2', 1): 'z'})
+        self.assertEqual(cache.stats()['bytes'], 27)
+        cache.discard(1)
+        self.assertEqual(cache.stats()['entries'], 1)
+        self.assertEqual(cache.get_many([(3, 'v1', 1)]), {(3, 'v1', 1): item})
+
+    def test_repeated_page_is_served_from_cache(self):
+        create_movements(5, self.statuses, self.subcategories)
+        before = movement_fragments.stats()
+        first = self.results()
+        stats = movement_fragments.stats()
+        self.assertEqual((stats['entries'], stats['hits'] - before['hits'], stats['misses'] - before['misses']),
+                         (5, 0, 5))
+        self.assertEqual(self.results(), first)
+        self.assertEqual(movement_fragments.stats()['hits'] - stats['hits'], 5)
+
+    def test_saved_movement_is_refreshed(self):
+        create_movements(5, self.statuses, self.subcategories)
+        self.results()
+        movement = MoneyMovement.objects.earliest('pk')
+        movement.comment = 'Изменено'
+        movement.save()
+        self.assertEqual(movement_fragments.stats()['entries'], 4)
+        self.assertEqual(self.results()[movement.pk]['comment'], 'Изменено')
+
+        MoneyMovement.objects.filter(pk=movement.pk).update(comment='Массово', updated_at=timezone.now())
+        self.assertEqual(self.results()[movement.pk]['comment'], 'Массово')
+        movement.delete()
+        self.assertNotIn(movement.pk, self.results())
+
+    def test_taxonomy_change_refreshes_names(self):
+        create_movements(5, self.statuses, self.subcategories)
+        self.results()
+        category = self.subcategories[0].category
+        category.name = 'Переименовано'
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        names = {row['category_name'] for row in self.results().values() if row['category'] == category.pk}
+        self.assertEqual(names, {'Переименовано'})
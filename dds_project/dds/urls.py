@@ -1,14 +1,22 @@
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularRedocView, SpectacularSwaggerView
 from rest_framework import routers
 
 from .autocomplete_views import CategoryAutocomplete, SubcategoryAutocomplete
+from .profiling import profile_download
+from .schema import PrebuiltSpectacularAPIView
+from .stream_views import money_movement_stream
 from .views import (
     StatusViewSet,
     OperationTypeViewSet,
     CategoryViewSet,
     SubcategoryViewSet,
-    MoneyMovementViewSet
+    MoneyMovementViewSet,
+    JobViewSet,
+    AuditLogViewSet,
+    SavedReportViewSet,
+    TaxonomyTreeView,
+    BatchView
 )
 
 router = routers.DefaultRouter()
@@ -17,12 +25,19 @@ router.register(r'operation_types', OperationTypeViewSet)
 router.register(r'categories', CategoryViewSet)
 router.register(r'subcategories', SubcategoryViewSet)
 router.register(r'money_movements', MoneyMovementViewSet)
+router.register(r'jobs', JobViewSet)
+router.register(r'audit_log', AuditLogViewSet)
+router.register(r'reports', SavedReportViewSet)
 
 urlpatterns = [
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', PrebuiltSpectacularAPIView.as_view(), name='schema'),
     path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
     path('api/schema/swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger'),
+    path('api/taxonomy/', TaxonomyTreeView.as_view(), name='taxonomy-tree'),
+    path('api/batch/', BatchView.as_view(), name='batch'),
+    path('api/money_movements/stream/', money_movement_stream, name='money-movement-stream'),
     path('api/', include(router.urls)),
+    path('profiles/<str:profile_id>.<str:fmt>', profile_download, name='profile-download'),
     path('category-autocomplete/', CategoryAutocomplete.as_view(), name='category-autocomplete'),
     path('subcategory-autocomplete/', SubcategoryAutocomplete.as_view(), name='subcategory-autocomplete'),
 ]
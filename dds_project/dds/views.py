@@ -1,17 +1,61 @@
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiResponse, OpenApiExample, OpenApiParameter
-from rest_framework import viewsets, filters
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework import viewsets, filters, mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError, NotFound
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Status, OperationType, Category, Subcategory, MoneyMovement
+from .changes import (
+    ChangesCursor,
+    InvalidChangesToken,
+    get_changes,
+    serialize_tombstone,
+    DEFAULT_CHANGES_LIMIT,
+    MAX_CHANGES_LIMIT,
+)
+from .models import (
+    Status, OperationType, Category, Subcategory, MoneyMovement, MovementAuditEntry, SavedReport, Job,
+)
 from .responses import BAD_REQUEST_RESPONSE, MONEY_MOVEMENT_BAD_REQUEST, NOT_FOUND_RESPONSE
 from .serializers import (
     StatusSerializer,
     OperationTypeSerializer,
     CategorySerializer,
     SubcategorySerializer,
-    MoneyMovementSerializer
+    MoneyMovementSerializer,
+    MovementAuditEntrySerializer,
+    SavedReportSerializer,
+    SavedReportRowSerializer,
+    JobSerializer,
+    BatchRequestSerializer
 )
-from .filters import MoneyMovementFilter
+from .auditlog import audit_log
+from .filters import MoneyMovementFilter, MovementAuditFilter
+from .series import build_series, data_range
+from .stats import STATS_GROUPS, filter_buckets, movement_statistics
+from .fragments import serialize_with_fragments
+from .reports import refresh_report
+from .renderers import NDJSONRenderer, ndjson_line
+from .taxonomy import get_taxonomy_tree
+from .audit import fix_violations, iter_violations, summarize_violations
+from .batch import execute_batch
+from .duplicates import (
+    DUPLICATE_HEADER,
+    DUPLICATE_POLICIES,
+    DuplicateMovement,
+    duplicate_clusters,
+    find_duplicates,
+    fingerprint_of,
+    get_duplicate_policy,
+)
+from .writequeue import coalesced_write
 
 
 @extend_schema_view(
@@ -304,7 +348,9 @@ class SubcategoryViewSet(viewsets.ModelViewSet):
 @extend_schema_view(
     list=extend_schema(
         summary="Получить список операций ДДС",
-        description="Возвращает список операций движения денежных средств с поддержкой фильтрации, поиска и сортировки",
+        description="Возвращает список операций движения денежных средств с поддержкой фильтрации, поиска и сортировки. "
+                    "С заголовком Accept: application/x-ndjson (или format=ndjson) возвращает всю отфильтрованную "
+                    "выборку без пагинации потоком, по одному JSON-объекту на строку.",
         parameters=[
             OpenApiParameter(
                 name='created_date_after',
@@ -390,10 +436,24 @@ class SubcategoryViewSet(viewsets.ModelViewSet):
     ),
     create=extend_schema(
         summary="Создать новую операцию ДДС",
-        description="Создает новую запись о движении денежных средств с проверкой бизнес-правил",
+        description="Создает новую запись о движении денежных средств с проверкой бизнес-правил. "
+                    "Параметр duplicates задает поведение, если операция с такой же датой (день), суммой, "
+                    "справочниками и комментарием уже есть: allow - создать, flag - создать и вернуть "
+                    f"заголовок {DUPLICATE_HEADER}, reject - ответ 409, merge - вернуть существующую запись (200).",
+        parameters=[
+            OpenApiParameter(
+                name='duplicates',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                enum=DUPLICATE_POLICIES,
+                description='Политика для дубликатов (по умолчанию DDS_DUPLICATE_POLICY)'
+            ),
+        ],
         responses={
+            200: MoneyMovementSerializer,
             201: MoneyMovementSerializer,
             400: MONEY_MOVEMENT_BAD_REQUEST,
+            409: OpenApiTypes.OBJECT,
         },
         examples=[
             OpenApiExample(
@@ -458,6 +518,195 @@ class SubcategoryViewSet(viewsets.ModelViewSet):
         },
         tags=['money_movements']
     ),
+    changes=extend_schema(
+        summary="Лента изменений операций ДДС",
+        description="Возвращает созданные, измененные и удаленные операции после переданного токена "
+                    "в порядке фиксации изменений. Для продолжения синхронизации передайте next_token "
+                    "в параметре since следующего запроса.",
+        parameters=[
+            OpenApiParameter(
+                name='since',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Токен из предыдущего ответа (без токена возвращается полная история)'
+            ),
+            OpenApiParameter(
+                name='limit',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description=f'Максимальное количество изменений в ответе (по умолчанию {DEFAULT_CHANGES_LIMIT}, '
+                            f'не более {MAX_CHANGES_LIMIT})'
+            ),
+        ],
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: BAD_REQUEST_RESPONSE,
+        },
+        examples=[
+            OpenApiExample(
+                'Пример ответа',
+                value={
+                    "changes": [
+                        {"op": "updated", "id": 1, "data": {"id": 1, "amount": "1500.00"}},
+                        {"op": "deleted", "id": 7, "data": {"id": 7, "deleted_at": "2024-01-15T10:31:00+00:00"}}
+                    ],
+                    "next_token": "eyJzIjoxMDQyLCJtIjoxLCJkIjozfQ",
+                    "has_more": False
+                },
+                status_codes=['200']
+            )
+        ],
+        tags=['money_movements']
+    ),
+    series=extend_schema(
+        summary="Ряд операций ДДС для графика",
+        description="Возвращает не больше points точек за период created_date_after - created_date_before "
+                    "(по умолчанию - от первой до последней операции выборки): поступления, списания, сальдо "
+                    "и число операций. Ширина интервала (день, неделя, месяц, квартал, полгода, год или "
+                    "несколько лет) подбирается автоматически, поэтому размер ответа не зависит от длины "
+                    "периода. Поддерживает фильтры списка.",
+        parameters=[
+            OpenApiParameter(
+                name='points',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description=f'Максимальное число точек (по умолчанию {settings.DDS_SERIES_DEFAULT_POINTS}, '
+                            f'не более {settings.DDS_SERIES_MAX_POINTS})'
+            ),
+        ],
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: BAD_REQUEST_RESPONSE,
+        },
+        examples=[
+            OpenApiExample(
+                'Пример ответа',
+                value={
+                    "start": "2024-01-01",
+                    "end": "2024-03-31",
+                    "bucket": {"unit": "month", "size": 1},
+                    "points": [
+                        {"start": "2024-01-01", "income": "50000.00", "expense": "12500.00",
+                         "net": "37500.00", "count": 14},
+                    ]
+                },
+                status_codes=['200']
+            )
+        ],
+        tags=['money_movements']
+    ),
+    statistics=extend_schema(
+        summary="Распределение сумм операций ДДС",
+        description="Возвращает число, сумму, приблизительные квантили (медиана, p90, p99) и наибольшие "
+                    "операции по категориям, подкатегориям или месяцам. Ответ собирается из помесячных "
+                    "сводок по подкатегориям, без сортировки операций; относительная ошибка квантилей "
+                    "не больше DDS_STATS_RELATIVE_ACCURACY. Поддерживает фильтры operation_type, category, "
+                    "subcategory и created_date_after/created_date_before (период округляется до месяцев).",
+        parameters=[
+            OpenApiParameter(
+                name='group_by',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                enum=STATS_GROUPS,
+                description='Группировка (по умолчанию - одна группа по всей выборке)'
+            ),
+            OpenApiParameter(
+                name='top',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description=f'Число наибольших операций в группе (по умолчанию 10, не более {settings.DDS_STATS_TOP_K})'
+            ),
+        ],
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: BAD_REQUEST_RESPONSE,
+        },
+        examples=[
+            OpenApiExample(
+                'Пример ответа',
+                value={
+                    "relative_accuracy": 0.01,
+                    "groups": [
+                        {
+                            "category": 3, "count": 1250, "total": "1875000.00",
+                            "quantiles": {"p50": "1210.50", "p90": "3480.00", "p99": "9950.00"},
+                            "top": [{"id": 815, "amount": "48000.00"}]
+                        }
+                    ]
+                },
+                status_codes=['200']
+            )
+        ],
+        tags=['money_movements']
+    ),
+    duplicates=extend_schema(
+        summary="Группы дубликатов операций ДДС",
+        description="Возвращает группы операций с одинаковым содержимым (дата с точностью до дня, сумма, "
+                    "справочники, комментарий без учета регистра и лишних пробелов), крупные группы первыми. "
+                    "Поддерживает фильтры и пагинацию списка.",
+        responses={
+            200: OpenApiTypes.OBJECT,
+        },
+        examples=[
+            OpenApiExample(
+                'Пример группы',
+                value={
+                    "fingerprint": "5f0c6b1e3a6b0d0c9a4f4c5f3d1e2a7b8c9d0e1f",
+                    "count": 2,
+                    "first_id": 15,
+                    "movements": [{"id": 15, "amount": "1500.00"}, {"id": 42, "amount": "1500.00"}]
+                },
+                status_codes=['200']
+            )
+        ],
+        tags=['money_movements']
+    ),
+    audit=[
+        extend_schema(
+            methods=['GET'],
+            summary="Проверить иерархию справочников операций",
+            description="Только для сотрудников. Потоково (NDJSON) возвращает операции, у которых подкатегория "
+                        "не принадлежит категории или категория - типу операции. Поддерживает фильтры списка.",
+            responses={
+                (200, 'application/x-ndjson'): OpenApiTypes.OBJECT,
+                403: OpenApiTypes.OBJECT,
+            },
+            examples=[
+                OpenApiExample(
+                    'Строка ответа',
+                    value={
+                        "id": 15, "operation_type_id": 1, "category_id": 3, "subcategory_id": 8,
+                        "subcategory_category_id": 4, "category_operation_type_id": 1,
+                        "expected_operation_type_id": 2, "problems": ["subcategory_not_in_category"]
+                    },
+                    status_codes=['200']
+                )
+            ],
+            tags=['money_movements']
+        ),
+        extend_schema(
+            methods=['POST'],
+            summary="Исправить иерархию справочников операций",
+            description="Только для сотрудников. Одним запросом UPDATE выставляет категорию и тип операции "
+                        "по подкатегории у всех операций с нарушениями (с учетом фильтров списка).",
+            request=None,
+            responses={
+                200: OpenApiTypes.OBJECT,
+                403: OpenApiTypes.OBJECT,
+            },
+            examples=[
+                OpenApiExample(
+                    'Пример ответа',
+                    value={
+                        "total": 2, "subcategory_not_in_category": 2, "category_not_in_operation_type": 1,
+                        "fixed": 2
+                    },
+                    status_codes=['200']
+                )
+            ],
+            tags=['money_movements']
+        ),
+    ],
 )
 class MoneyMovementViewSet(viewsets.ModelViewSet):
     """
@@ -472,6 +721,7 @@ class MoneyMovementViewSet(viewsets.ModelViewSet):
     search_fields = ['comment', 'subcategory__name', 'category__name']
     ordering_fields = ['created_date', 'amount']
     ordering = ['-created_date']
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
 
     def get_queryset(self):
         """Оптимизация запроса с select_related для уменьшения количества SQL запросов"""
@@ -482,3 +732,507 @@ class MoneyMovementViewSet(viewsets.ModelViewSet):
             'category',
             'subcategory',
         )
+
+    def list(self, request, *args, **kwargs):
+        """Список операций; в режиме NDJSON - потоковая выгрузка всей выборки"""
+        if request.accepted_renderer.format != NDJSONRenderer.format:
+            return self.list_from_fragments()
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+
+        def rows():
+            # Серверный итератор читает выборку порциями, не загружая ее в память целиком
+            for obj in queryset.iterator(chunk_size=settings.DDS_NDJSON_CHUNK_SIZE):
+                yield ndjson_line(serializer.to_representation(obj))
+
+        return StreamingHttpResponse(rows(), content_type=NDJSONRenderer.media_type)
+
+    def list_from_fragments(self):
+        """
+        Страница списка из кэша фрагментов
+
+        Запрос страницы выбирает только ID и updated_at; из БД загружаются и
+        сериализуются лишь записи, которых нет в кэше.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values_list('pk', 'updated_at')
+        page = self.paginate_queryset(rows)
+        data = serialize_with_fragments(
+            page if page is not None else rows,
+            fetch=lambda ids: self.get_queryset().in_bulk(ids),
+            serialize=lambda objects: self.get_serializer(objects, many=True).data,
+        )
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def create(self, request, *args, **kwargs):
+        """Создание операции с проверкой дубликата одним запросом по индексу отпечатка"""
+        try:
+            policy = get_duplicate_policy(request.query_params.get('duplicates'))
+        except ValueError as exc:
+            raise ValidationError({'duplicates': str(exc)})
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        duplicate_of = None
+        if policy != 'allow':
+            fingerprint = fingerprint_of(serializer.validated_data)
+            duplicate_of = find_duplicates([fingerprint]).get(fingerprint)
+        if duplicate_of is not None:
+            if policy == 'reject':
+                raise DuplicateMovement(duplicate_of)
+            if policy == 'merge':
+                existing = self.get_queryset().get(pk=duplicate_of)
+                return Response(self.get_serializer(existing).data, headers={DUPLICATE_HEADER: str(duplicate_of)})
+
+        self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        if duplicate_of is not None:
+            headers[DUPLICATE_HEADER] = str(duplicate_of)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    def perform_create(self, serializer):
+        """Создание операции (при DDS_WRITE_COALESCING - через очередь групповой фиксации)"""
+        coalesced_write(serializer.save)
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request):
+        """Инкрементальная выгрузка изменений для синхронизации клиентов"""
+        try:
+            cursor = ChangesCursor.from_token(request.query_params.get('since'))
+        except InvalidChangesToken as exc:
+            raise ValidationError({'since': str(exc)})
+
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_CHANGES_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_CHANGES_LIMIT:
+            raise ValidationError({'limit': f'Укажите целое число от 1 до {MAX_CHANGES_LIMIT}.'})
+
+        changes, next_cursor, has_more = get_changes(cursor, limit, self.get_queryset())
+        # Один экземпляр сериализатора на всю порцию: поля строятся один раз, а не для каждой записи
+        serializer = self.get_serializer()
+        data = []
+        for op, obj in changes:
+            if op == 'deleted':
+                data.append({'op': op, 'id': obj.movement_id, 'data': serialize_tombstone(obj)})
+            else:
+                data.append({'op': op, 'id': obj.id, 'data': serializer.to_representation(obj)})
+
+        return Response({
+            'changes': data,
+            'next_token': next_cursor.to_token(),
+            'has_more': has_more,
+        })
+
+    @action(detail=False, methods=['get'], url_path='series')
+    def series(self, request):
+        """Агрегированный ряд для графиков с автоматическим выбором ширины интервала"""
+        try:
+            points = int(request.query_params.get('points', settings.DDS_SERIES_DEFAULT_POINTS))
+        except ValueError:
+            points = 0
+        if not 1 <= points <= settings.DDS_SERIES_MAX_POINTS:
+            raise ValidationError({'points': f'Укажите целое число от 1 до {settings.DDS_SERIES_MAX_POINTS}.'})
+
+        queryset = self.filter_queryset(MoneyMovement.objects.all())
+        filterset = MoneyMovementFilter(request.query_params, queryset=queryset)
+        filterset.is_valid()  # Фильтры уже проверены при filter_queryset
+        date_range = filterset.form.cleaned_data.get('created_date')
+        start = date_range.start.date() if date_range and date_range.start else None
+        end = date_range.stop.date() if date_range and date_range.stop else None
+        if start is None or end is None:
+            first, last = data_range(queryset)
+            start, end = start or first, end or last
+        if start is None or end is None or start > end:
+            return Response({'start': start, 'end': end, 'bucket': None, 'points': []})
+        return Response(build_series(queryset, start, end, points))
+
+    @action(detail=False, methods=['get'], url_path='statistics')
+    def statistics(self, request):
+        """Квантили и наибольшие суммы по сводкам распределения"""
+        group_by = request.query_params.get('group_by') or None
+        if group_by is not None and group_by not in STATS_GROUPS:
+            raise ValidationError({'group_by': f'Допустимые значения: {", ".join(STATS_GROUPS)}.'})
+        try:
+            top = int(request.query_params.get('top', 10))
+        except ValueError:
+            top = -1
+        if not 0 <= top <= settings.DDS_STATS_TOP_K:
+            raise ValidationError({'top': f'Укажите целое число от 0 до {settings.DDS_STATS_TOP_K}.'})
+
+        filterset = MoneyMovementFilter(request.query_params, queryset=MoneyMovement.objects.none())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        if filterset.form.cleaned_data.get('status') is not None:
+            raise ValidationError({'status': 'Фильтр по статусу не поддерживается для статистики.'})
+
+        groups = movement_statistics(
+            filter_buckets(filterset.form.cleaned_data), group_by=group_by,
+            quantiles=settings.DDS_STATS_QUANTILES, top=top,
+        )
+        return Response({'relative_accuracy': settings.DDS_STATS_RELATIVE_ACCURACY, 'groups': groups})
+
+    @action(detail=False, methods=['get'], url_path='duplicates')
+    def duplicates(self, request):
+        """Группы операций с одинаковым отпечатком содержимого"""
+        queryset = self.filter_queryset(self.get_queryset())
+        clusters = duplicate_clusters(queryset)
+        page = self.paginate_queryset(clusters)
+        clusters = list(page if page is not None else clusters)
+
+        # Операции всех групп страницы - одним запросом по индексу отпечатка
+        members = {}
+        fingerprints = [cluster['fingerprint'] for cluster in clusters]
+        serializer = self.get_serializer()
+        for obj in queryset.filter(fingerprint__in=fingerprints).order_by('id'):
+            members.setdefault(obj.fingerprint, []).append(serializer.to_representation(obj))
+        data = [{**cluster, 'movements': members.get(cluster['fingerprint'], [])} for cluster in clusters]
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    @action(detail=False, methods=['get', 'post'], url_path='audit', permission_classes=[IsAdminUser])
+    def audit(self, request):
+        """Проверка (GET) и исправление (POST) иерархии справочников у операций"""
+        queryset = self.filter_queryset(MoneyMovement.objects.all())
+        if request.method == 'POST':
+            summary = summarize_violations(queryset)
+            summary['fixed'] = fix_violations(queryset) if summary['total'] else 0
+            return Response(summary)
+        rows = (ndjson_line(row) for row in iter_violations(queryset))
+        return StreamingHttpResponse(rows, content_type=NDJSONRenderer.media_type)
+
+
+class TaxonomyTreeView(APIView):
+    """Дерево справочников: типы операций -> категории -> подкатегории и статусы"""
+
+    @extend_schema(
+        summary="Получить дерево справочников",
+        description="Возвращает все статусы и типы операций с вложенными категориями и подкатегориями "
+                    "одним ответом без пагинации. Ответ кэшируется и поддерживает ETag/If-None-Match.",
+        responses={
+            200: OpenApiTypes.OBJECT,
+        },
+        examples=[
+            OpenApiExample(
+                'Пример ответа',
+                value={
+                    "statuses": [{"id": 1, "name": "Бизнес"}],
+                    "operation_types": [
+                        {
+                            "id": 2,
+                            "name": "Списание",
+                            "categories": [
+                                {"id": 3, "name": "Маркетинг", "subcategories": [{"id": 5, "name": "Avito"}]}
+                            ]
+                        }
+                    ]
+                },
+                status_codes=['200']
+            )
+        ],
+        tags=['taxonomy']
+    )
+    def get(self, request):
+        tree, etag = get_taxonomy_tree()
+        response = get_conditional_response(request, etag=etag) or Response(tree)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class BatchView(APIView):
+    """Пакетный запрос: несколько обращений к API за один HTTP-запрос"""
+
+    @extend_schema(
+        summary="Выполнить пакет запросов",
+        description="Выполняет подзапросы к API внутри процесса и возвращает все ответы в порядке подзапросов. "
+                    "Пакет только из GET-запросов выполняется параллельно (parallel). Пакет с изменениями "
+                    "выполняется по порядку в одной транзакции (atomic): при первой ошибке изменения "
+                    "откатываются, а оставшиеся подзапросы не выполняются (статус 424).",
+        request=BatchRequestSerializer,
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: BAD_REQUEST_RESPONSE,
+        },
+        examples=[
+            OpenApiExample(
+                'Загрузка страницы',
+                value={
+                    "requests": [
+                        {"method": "GET", "path": "/dds/api/taxonomy/"},
+                        {"method": "GET", "path": "/dds/api/money_movements/?category=3&page=1"}
+                    ],
+                    "parallel": True
+                },
+                request_only=True
+            ),
+            OpenApiExample(
+                'Пример ответа',
+                value={
+                    "responses": [
+                        {"status": 200, "body": {"statuses": [], "operation_types": []}},
+                        {"status": 200, "body": {"count": 0, "next": None, "previous": None, "results": []}}
+                    ],
+                    "committed": True
+                },
+                response_only=True,
+                status_codes=['200']
+            )
+        ],
+        tags=['batch']
+    )
+    def post(self, request):
+        serializer = BatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        responses, committed = execute_batch(
+            request._request, data['requests'], parallel=data['parallel'], atomic=data['atomic'],
+        )
+        return Response({'responses': responses, 'committed': committed})
+
+
+@extend_schema_view(
+    list=extend_schema(
+        summary="Получить список фоновых задач",
+        description="Возвращает список фоновых задач (новые сверху)",
+        responses={
+            200: JobSerializer(many=True),
+        },
+        tags=['jobs']
+    ),
+    create=extend_schema(
+        summary="Поставить фоновую задачу",
+        description="Создает задачу, которую выполнит воркер run_jobs. Доступные типы: "
+                    "export_movements (params.filters - фильтры списка операций, params.snapshot - читать снимок БД: "
+                    "имя файла или latest), "
+                    "import_movements (CSV-файл в поле source, params.duplicates - политика для дубликатов: "
+                    "allow, flag, reject или merge), "
+                    "refresh_reports (пересчет сохраненных отчетов: params.reports - ID, params.full).",
+        responses={
+            201: JobSerializer,
+            400: BAD_REQUEST_RESPONSE,
+        },
+        examples=[
+            OpenApiExample(
+                "Выгрузка операций за месяц",
+                value={
+                    "kind": "export_movements",
+                    "params": {"filters": {"created_date_after": "2024-01-01", "created_date_before": "2024-01-31"}}
+                },
+                status_codes=['201']
+            ),
+        ],
+        tags=['jobs']
+    ),
+    retrieve=extend_schema(
+        summary="Получить состояние задачи",
+        description="Возвращает статус и прогресс фоновой задачи",
+        responses={
+            200: JobSerializer,
+            404: NOT_FOUND_RESPONSE,
+        },
+        tags=['jobs']
+    ),
+    cancel=extend_schema(
+        summary="Отменить задачу",
+        description="Ожидающая задача отменяется сразу, выполняющаяся - при ближайшей проверке воркером",
+        request=None,
+        responses={
+            200: JobSerializer,
+            404: NOT_FOUND_RESPONSE,
+        },
+        tags=['jobs']
+    ),
+    download=extend_schema(
+        summary="Скачать результат задачи",
+        description="Возвращает файл, сформированный успешно завершенной задачей",
+        responses={
+            (200, 'application/octet-stream'): OpenApiTypes.BINARY,
+            404: NOT_FOUND_RESPONSE,
+        },
+        tags=['jobs']
+    ),
+)
+class JobViewSet(mixins.CreateModelMixin,
+                 mixins.RetrieveModelMixin,
+                 mixins.ListModelMixin,
+                 viewsets.GenericViewSet):
+    """API для постановки и отслеживания фоновых задач"""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Запрос отмены задачи"""
+        job = self.get_object()
+        if not job.is_finished:
+            Job.objects.filter(pk=job.pk).update(cancel_requested=True)
+            # Ожидающую задачу воркер еще не забрал - отменяем сразу
+            Job.objects.filter(pk=job.pk, status=Job.State.PENDING).update(status=Job.State.CANCELLED)
+            job.refresh_from_db()
+        return Response(self.get_serializer(job).data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Скачивание файла результата"""
+        job = self.get_object()
+        if job.status != Job.State.SUCCEEDED or not job.result:
+            raise NotFound("Результат задачи недоступен.")
+        return FileResponse(job.result.open('rb'), as_attachment=True,
+                            filename=job.result.name.rsplit('/', 1)[-1])
+
+
+@extend_schema_view(
+    list=extend_schema(
+        summary="Получить журнал изменений операций",
+        description="Возвращает изменения операций (новые сверху): кто, когда, из какого источника "
+                    "(api, admin, job:<тип>, system) и какие поля изменил - {поле: [было, стало]}. "
+                    "Фильтры: movement (ID операции), user, action, source, created_at_after/created_at_before. "
+                    "Доступно только администраторам.",
+        responses={
+            200: MovementAuditEntrySerializer(many=True),
+            400: BAD_REQUEST_RESPONSE,
+        },
+        tags=['audit_log']
+    ),
+)
+class AuditLogViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """API журнала изменений операций"""
+    queryset = MovementAuditEntry.objects.all()
+    serializer_class = MovementAuditEntrySerializer
+    permission_classes = [IsAdminUser]
+    filterset_class = MovementAuditFilter
+
+    def list(self, request, *args, **kwargs):
+        # Записи из буфера этого процесса сохраняются сразу, чтобы журнал был полным на момент запроса
+        audit_log.flush()
+        return super().list(request, *args, **kwargs)
+
+
+@extend_schema_view(
+    list=extend_schema(
+        summary="Получить список сохраненных отчетов",
+        description="Возвращает определения отчетов (фильтры и группировка) и время последнего пересчета",
+        responses={
+            200: SavedReportSerializer(many=True),
+        },
+        tags=['reports']
+    ),
+    create=extend_schema(
+        summary="Сохранить отчет",
+        description="Создает отчет и сразу рассчитывает его. filters - параметры фильтров списка операций "
+                    "(status, operation_type, category, subcategory, created_date_after, created_date_before), "
+                    "group_by - измерения: operation_type, category, subcategory, status, month.",
+        responses={
+            201: SavedReportSerializer,
+            400: BAD_REQUEST_RESPONSE,
+        },
+        examples=[
+            OpenApiExample(
+                "Списания по категориям и месяцам за 2024 год",
+                value={
+                    "name": "Расходы 2024",
+                    "filters": {"operation_type": 2, "created_date_after": "2024-01-01",
+                                "created_date_before": "2024-12-31"},
+                    "group_by": ["category", "month"]
+                },
+                request_only=True
+            ),
+        ],
+        tags=['reports']
+    ),
+    retrieve=extend_schema(
+        summary="Открыть сохраненный отчет",
+        description="Возвращает рассчитанные строки отчета одним чтением по индексу. "
+                    "refreshed_at - время последнего пересчета; stale - есть группы, ожидающие пересчета "
+                    "(при DDS_REPORT_REFRESH_ON_WRITE = False).",
+        responses={
+            200: SavedReportSerializer,
+            404: NOT_FOUND_RESPONSE,
+        },
+        tags=['reports']
+    ),
+    update=extend_schema(
+        summary="Изменить сохраненный отчет",
+        description="При изменении фильтров или группировки отчет рассчитывается заново",
+        responses={
+            200: SavedReportSerializer,
+            400: BAD_REQUEST_RESPONSE,
+            404: NOT_FOUND_RESPONSE,
+        },
+        tags=['reports']
+    ),
+    partial_update=extend_schema(
+        summary="Частично изменить сохраненный отчет",
+        description="При изменении фильтров или группировки отчет рассчитывается заново",
+        responses={
+            200: SavedReportSerializer,
+            400: BAD_REQUEST_RESPONSE,
+            404: NOT_FOUND_RESPONSE,
+        },
+        tags=['reports']
+    ),
+    destroy=extend_schema(
+        summary="Удалить сохраненный отчет",
+        responses={
+            204: None,
+            404: NOT_FOUND_RESPONSE,
+        },
+        tags=['reports']
+    ),
+    refresh=extend_schema(
+        summary="Пересчитать сохраненный отчет",
+        description="Пересчитывает устаревшие группы отчета, при ?full=true - отчет целиком",
+        request=None,
+        parameters=[
+            OpenApiParameter(name='full', type=OpenApiTypes.BOOL, location=OpenApiParameter.QUERY,
+                             description="Пересчитать все группы"),
+        ],
+        responses={
+            200: SavedReportSerializer,
+            404: NOT_FOUND_RESPONSE,
+        },
+        tags=['reports']
+    ),
+)
+class SavedReportViewSet(viewsets.ModelViewSet):
+    """API сохраненных отчетов с заранее рассчитанными результатами"""
+    queryset = SavedReport.objects.all()
+    serializer_class = SavedReportSerializer
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['name']
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.report_data(self.get_object()))
+
+    def report_data(self, report):
+        """Определение отчета и его строки"""
+        rows = list(report.rows.order_by('operation_type_id', 'category_id', 'subcategory_id', 'status_id', 'month'))
+        return {
+            **self.get_serializer(report).data,
+            'stale': any(row.dirty for row in rows),
+            'rows': SavedReportRowSerializer(rows, many=True, context={'group_by': report.group_by}).data,
+        }
+
+    def perform_create(self, serializer):
+        refresh_report(serializer.save(), full=True)
+
+    def perform_update(self, serializer):
+        definition = (serializer.instance.filters, serializer.instance.group_by)
+        report = serializer.save()
+        if (report.filters, report.group_by) != definition:
+            refresh_report(report, full=True)
+
+    @action(detail=True, methods=['post'])
+    def refresh(self, request, pk=None):
+        """Пересчет отчета по запросу"""
+        report = self.get_object()
+        refresh_report(report, full=request.query_params.get('full') in ('1', 'true'))
+        return Response(self.report_data(report))
@@ -0,0 +1,69 @@
+import logging
+import os
+import threading
+import time
+
+from django.apps import apps
+from django.db import connection
+
+logger = logging.getLogger('dds.startup')
+
+
+def warm_up():
+    """
+    Прогрев нового процесса перед обслуживанием запросов
+
+    Разрешает URLconf, строит поля сериализаторов, открывает соединение
+    с БД, заполняет кэш дерева справочников и загружает собранную OpenAPI-схему.
+    Возвращает словарь длительностей шагов в секундах.
+    """
+    from django.urls import get_resolver
+    from rest_framework.serializers import Serializer
+
+    from . import serializers
+    from .schema import get_prebuilt_schema
+    from .taxonomy import get_taxonomy_tree
+
+    timings = {}
+
+    def step(name, func):
+        started = time.perf_counter()
+        try:
+            func()
+        except Exception:
+            logger.exception("Ошибка прогрева на шаге %s", name)
+        timings[name] = time.perf_counter() - started
+
+    def compile_serializers():
+        for value in vars(serializers).values():
+            if isinstance(value, type) and issubclass(value, Serializer) and value.__module__ == serializers.__name__:
+                value().fields  # noqa: B018 - построение и кэширование полей
+
+    step('urls', lambda: get_resolver().url_patterns)
+    step('serializers', compile_serializers)
+    step('taxonomy', get_taxonomy_tree)
+    step('schema', get_prebuilt_schema)
+    connection.close()
+    return timings
+
+
+def start_warm_up():
+    """Запуск прогрева в фоне после завершения инициализации приложений"""
+    def run():
+        # ready() вызывается до выставления apps.ready - дожидаемся окончания инициализации
+        while not apps.ready:
+            time.sleep(0.01)
+        started = time.perf_counter()
+        timings = warm_up()
+        logger.info(
+            "Прогрев завершен за %.0f мс (%s)",
+            (time.perf_counter() - started) * 1000,
+            ", ".join(f"{name}: {value * 1000:.0f} мс" for name, value in timings.items()),
+        )
+
+    threading.Thread(target=run, name='dds-warmup', daemon=True).start()
+
+
+def warm_up_enabled():
+    """Прогрев включается переменной окружения DDS_WARMUP (выставляется в wsgi.py/asgi.py)"""
+    return os.environ.get('DDS_WARMUP') == '1'
@@ -0,0 +1,112 @@
+import contextvars
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger('dds.writequeue')
+
+
+class WriteCoalescer:
+    """
+    Групповая фиксация записей для SQLite
+
+    SQLite допускает одного писателя: при параллельных запросах каждая
+    транзакция ждет блокировку, а часть запросов получает "database is locked".
+    Здесь записи выполняет единственный поток: пока фиксируется одна порция,
+    в очереди накапливаются следующие, и они фиксируются одной транзакцией.
+    Каждая запись выполняется в своей точке сохранения, поэтому ошибка одной
+    строки не откатывает остальные, а исключение возвращается ее запросу.
+    Очередь своя в каждом процессе сервера.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        """Постановка записи в очередь; возвращает Future с результатом func(*args)"""
+        future = Future()
+        # Контекст запроса (например, текущее представление для журнала медленных запросов)
+        self._queue.put((future, contextvars.copy_context(), func, args))
+        self._ensure_started()
+        return future
+
+    def execute(self, func, *args):
+        """Выполнение записи через очередь с ожиданием фиксации ее транзакции"""
+        return self.submit(func, *args).result()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='dds-write-coalescer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._commit(batch)
+            except Exception:
+                logger.exception("Сбой потока групповой фиксации")
+
+    def _commit(self, batch):
+        """Выполнение порции записей одной транзакцией (в порядке постановки в очередь)"""
+        close_old_connections()
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for future, context, func, args in batch:
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((context.run(func, *args), None))
+                    except Exception as exc:
+                        outcomes.append((None, exc))
+        except Exception as exc:
+            # Не удалась фиксация всей порции: ошибку получает каждый запрос
+            for future, *_ in batch:
+                future.set_exception(exc)
+            return
+
+        for (future, *_), (result, error) in zip(batch, outcomes):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_write_coalescer():
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = WriteCoalescer(settings.DDS_WRITE_BATCH_SIZE)
+    return _coalescer
+
+
+def coalesced_write(func, *args):
+    """
+    Выполнение записи через очередь групповой фиксации, если она включена
+
+    Внутри открытой транзакции запись выполняется сразу: поток очереди не
+    увидел бы ее незафиксированные данные и ждал бы ее блокировку.
+    """
+    if not settings.DDS_WRITE_COALESCING or connection.in_atomic_block:
+        return func(*args)
+    return get_write_coalescer().execute(func, *args)
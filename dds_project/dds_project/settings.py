@@ -10,11 +10,16 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Запуск тестов (manage.py test)
+TESTING = sys.argv[1:2] == ['test']
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -48,12 +53,17 @@ INSTALLED_APPS = [
 ]
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'dds.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'dds.middleware.AuditContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'dds.middleware.QueryCountMiddleware',
+    'dds.middleware.ProfilingMiddleware',
+    'dds.middleware.SlowQueryMiddleware',
 
 ]
 
@@ -84,6 +94,45 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Пишущая транзакция сразу берет блокировку: фоновая запись журнала изменений и параллельные
+            # запросы не приводят к "database is locked" при повышении блокировки чтения
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# Профиль БД для продакшена (DDS_DB_PROFILE=production): журнал WAL - чтение не ждет запись,
+# прагмы применяются к каждому новому соединению, соединения переиспользуются между запросами
+SQLITE_PRODUCTION_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',  # В режиме WAL безопасно: теряются только несброшенные транзакции при сбое ОС
+    'PRAGMA cache_size=-65536',  # 64 МБ страничного кэша на соединение
+    'PRAGMA mmap_size=268435456',  # 256 МБ файла БД читаются через mmap
+    'PRAGMA temp_store=MEMORY',
+]
+
+if os.environ.get('DDS_DB_PROFILE') == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRODUCTION_PRAGMAS),
+            'timeout': 20,  # Ожидание блокировки записи (busy timeout) в секундах
+            # Пишущая транзакция сразу берет блокировку: без ошибок при повышении блокировки чтения
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# При нескольких процессах укажите общий бэкенд (Redis, Memcached): локальный кэш
+# сбрасывается только в процессе, изменившем данные, остальные обновятся по таймауту.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -124,6 +173,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Файлы, загружаемые и формируемые приложением (входные файлы и результаты фоновых задач)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -132,6 +185,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 5,
+    # Быстрый JSON (orjson, если установлен, иначе закэшированный json) с тем же форматом, что у JSONRenderer
+    "DEFAULT_RENDERER_CLASSES": [
+        "dds.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
     ],
@@ -162,4 +220,96 @@ SPECTACULAR_SETTINGS = {
     """,
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
-}
\ No newline at end of file
+}
+
+
+# Настройки приложения DDS
+
+# Поток событий (SSE): размер очереди на одного клиента и интервал keepalive в секундах
+DDS_STREAM_QUEUE_SIZE = 100
+DDS_STREAM_HEARTBEAT = 15
+
+# Размер порции чтения из БД при потоковой выгрузке списка операций в NDJSON
+DDS_NDJSON_CHUNK_SIZE = 2000
+
+# Файл с собранной OpenAPI-схемой (manage.py build_schema)
+DDS_SCHEMA_FILE = BASE_DIR / 'schema.json'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'dds': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
+# Заголовок X-DDS-Queries с числом SQL-запросов в ответе (включается командой loadtest)
+DDS_QUERY_COUNT_HEADER = False
+
+# Профилирование запросов сотрудников (?_profile=1 или заголовок X-DDS-Profile)
+DDS_PROFILING_ENABLED = True
+DDS_PROFILE_DIR = BASE_DIR / 'profiles'
+DDS_PROFILE_KEEP = 50  # Сколько последних профилей хранить
+
+# Журнал медленных SQL-запросов с планами выполнения (None - отключить)
+DDS_SLOW_QUERY_MS = 100
+
+# Групповая фиксация создания операций: записи выполняет один поток, порциями до DDS_WRITE_BATCH_SIZE
+DDS_WRITE_COALESCING = False
+DDS_WRITE_BATCH_SIZE = 100
+
+# Пакетные запросы (/dds/api/batch/): лимит подзапросов и потоков для параллельного чтения
+DDS_BATCH_MAX_REQUESTS = 50
+DDS_BATCH_WORKERS = 4
+
+# Кэш сериализованных записей списка операций в памяти процесса (LRU), предел в байтах
+DDS_FRAGMENT_CACHE_BYTES = 32 * 1024 * 1024
+
+# Политика для дубликатов операций по умолчанию (allow, flag, reject, merge); переопределяется ?duplicates=
+DDS_DUPLICATE_POLICY = 'allow'
+
+# Ряды для графиков: типы операций (по названию), считающиеся поступлениями; лимит точек в ответе
+DDS_INCOME_OPERATION_TYPES = ['Пополнение']
+DDS_SERIES_DEFAULT_POINTS = 100
+DDS_SERIES_MAX_POINTS = 1000
+
+# Статистика сумм операций: относительная ошибка квантилей, число хранимых наибольших сумм, квантили ответа
+DDS_STATS_RELATIVE_ACCURACY = 0.01
+DDS_STATS_TOP_K = 20
+DDS_STATS_QUANTILES = [0.5, 0.9, 0.99]
+
+# Сжатие ответов API (brotli, если установлен пакет brotli, иначе gzip): порог размера и уровни
+DDS_COMPRESSION_MIN_BYTES = 1024
+DDS_GZIP_LEVEL = 6
+DDS_BROTLI_QUALITY = 5
+
+# Журнал изменений операций: буфер в памяти процесса и размер порции записи
+DDS_AUDIT_ENABLED = True
+DDS_AUDIT_BUFFER_SIZE = 10000
+DDS_AUDIT_BATCH_SIZE = 500
+# Период сброса буфера фоновым потоком, с. None - буфер сохраняется в потоке запроса после ответа
+# (лишний запрос к БД в каждом изменяющем запросе): так в тестах, где фоновый поток писал бы
+# в БД параллельно с транзакцией теста
+DDS_AUDIT_FLUSH_INTERVAL = None if TESTING else 1.0
+
+# Сохраненные отчеты: изменения операций только помечают затронутые группы устаревшими и ставят
+# одну задачу refresh_reports на все изменения до ее запуска (выполняет воркер run_jobs);
+# True - пересчет сразу после фиксации, ценой задержки каждой записи
+DDS_REPORT_REFRESH_ON_WRITE = False
+
+# Резервное копирование SQLite (команда backup_db): страниц за шаг, пауза между шагами в секундах,
+# сколько раз копирование может начаться заново из-за записи в БД
+DDS_BACKUP_PAGES = 1024
+DDS_BACKUP_STEP_DELAY = 0.005
+DDS_BACKUP_MAX_RESTARTS = 10
+# Снимки БД для чтения отчетами и выгрузками (backup_db --snapshot): каталог и сколько последних хранить
+DDS_SNAPSHOT_DIR = BASE_DIR / 'snapshots'
+DDS_SNAPSHOT_KEEP = 3
@@ -7,10 +7,20 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import logging
 import os
+import time
+
+_started = time.perf_counter()
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dds_project.settings')
+# Прогрев кэшей и сериализаторов при старте процесса (см. dds.warmup), DDS_WARMUP=0 отключает
+os.environ.setdefault('DDS_WARMUP', '1')
 
 application = get_wsgi_application()
+
+logging.getLogger('dds.startup').info(
+    "Приложение загружено за %.0f мс", (time.perf_counter() - _started) * 1000
+)